@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+Sensibilidade de precos e risco de custo de uma casa de referencia.
+
+Uso: python3 scripts/analise-risco.py [--layout casa-2-quartos] [--estado SP] [--padrao 3]
+     python3 scripts/analise-risco.py --choque maoObra=10 --choque fundacoesEstruturas.armaduraCA50=15
+     python3 scripts/analise-risco.py --cenarios 200000 --volatilidade materiais:fundacoesEstruturas=0.2
+     python3 scripts/analise-risco.py --saida risco.json
+
+A casa de referencia e um layout da grade (padrao scripts/grade-orcamento.json,
+o primeiro layout) com um tipo de telhado, um tipo de tijolo, um padrao de
+acabamento e uma UF de data/configuracoes.json. Os precos sao os extraidos
+da planilha (data/precos-materiais-casa.json e data/precos-mao-obra-casa.json;
+aceita tambem data/tabelas-*.json) e as quantidades as do relatorio completo
+(ver scripts/risco_orcamento.py).
+
+O relatorio mostra:
+- a elasticidade de cada item e secao (quanto o total sobe, em %, com +1%
+  no preco) e o impacto em R$ de --variacao % no preco;
+- o total com os choques de --choque SELETOR=PCT (ex.: "maoObra=10",
+  "fundacoesEstruturas.armaduraCA50=15", "materiais:pintura=-5"; varios
+  seletores separados por virgula recebem o mesmo choque);
+- faixas de percentis do total em --cenarios sorteios de choques de preco
+  correlacionados por secao (Monte Carlo) e a contribuicao de cada secao ao
+  risco (fracao da variancia do total).
+
+Volatilidade: desvio do log-preco por parcela (--volatilidade
+materiais=0.10, maoObra=0.06) ou por secao ("[parcela:]secao=desvio").
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+try:
+    import numpy as np
+except ImportError:
+    print("ERRO: numpy nao encontrado. Instale com: pip install numpy")
+    sys.exit(1)
+
+from motor_orcamento import (
+    BDI_CASA, Catalogo, Layouts, achatar_arquivo_precos, carregar_grade, resolver_precos_mao_obra,
+)
+from risco_orcamento import (
+    FATOR_AJUSTE_PADRAO, PARCELAS, faixas, matriz_correlacao, montar_modelo, simular,
+    volatilidades_grupos,
+)
+
+# Caminhos
+SCRIPT_DIR = Path(__file__).parent
+DATA_DIR = SCRIPT_DIR.parent / "data"
+CONFIGURACOES_FILE = DATA_DIR / "configuracoes.json"
+PRECOS_MATERIAIS_FILE = DATA_DIR / "precos-materiais-casa.json"
+PRECOS_MAO_OBRA_FILE = DATA_DIR / "precos-mao-obra-casa.json"
+GRADE_FILE = SCRIPT_DIR / "grade-orcamento.json"
+
+VOLATILIDADES_PADRAO = {"materiais": 0.10, "maoObra": 0.06}
+
+def carregar_json(caminho):
+    with open(caminho, encoding="utf-8") as f:
+        return json.load(f)
+
+def par_seletor(texto, conversao):
+    """"SELETOR=VALOR" -> (seletor, valor convertido)"""
+    seletor, sinal, valor = texto.rpartition("=")
+    if not sinal or not seletor:
+        raise argparse.ArgumentTypeError(f"use SELETOR=VALOR: {texto}")
+    try:
+        return seletor.strip(), conversao(valor)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"valor invalido: {texto}") from None
+
+def choque(texto):
+    seletores, pct = par_seletor(texto, lambda v: float(v.strip().rstrip("%")))
+    return [s.strip() for s in seletores.split(",") if s.strip()], pct
+
+def volatilidade(texto):
+    return par_seletor(texto, float)
+
+def reais(valor):
+    return f"R$ {valor:,.2f}".replace(",", "_").replace(".", ",").replace("_", ".")
+
+def preparar(args):
+    """Modelo linear da casa de referencia e a descricao dela"""
+    configuracoes = carregar_json(CONFIGURACOES_FILE)
+    catalogo = Catalogo(configuracoes)
+    grade = carregar_grade(args.grade)
+    nomes = [str(layout.get("nome", i)) for i, layout in enumerate(grade["layouts"])]
+    if args.layout is None:
+        indice = 0
+    elif args.layout in nomes:
+        indice = nomes.index(args.layout)
+    else:
+        raise ValueError(f"layout desconhecido: {args.layout} (disponiveis: {', '.join(nomes)})")
+    layouts = Layouts([grade["layouts"][indice]])
+    g = {nome: valores[0] for nome, valores in vars(layouts).items() if nome != "nomes"}
+
+    telhados, tijolos, padroes, estados = catalogo.selecionar({
+        "tiposTelhado": [args.telhado], "tiposTijolo": [args.tijolo],
+        "padroesAcabamento": [args.padrao], "estados": [args.estado],
+    })
+    materiais = carregar_json(args.precos_materiais)
+    mao_obra = carregar_json(args.precos_mao_obra)
+    precos_mao_obra, _ = resolver_precos_mao_obra(achatar_arquivo_precos(mao_obra), configuracoes)
+    modelo = montar_modelo(
+        g, achatar_arquivo_precos(materiais), materiais.get("fatorAjuste", FATOR_AJUSTE_PADRAO),
+        precos_mao_obra, mao_obra.get("bdiPercentual", BDI_CASA),
+        telhados[0], tijolos[0], padroes[0], estados[0], catalogo.cub_base,
+    )
+    referencia = {
+        "layout": nomes[indice], "area": round(float(g["area"]), 2),
+        "telhado": telhados[0][1], "tijolo": tijolos[0][1], "padrao": padroes[0][1], "estado": estados[0][1],
+    }
+    return modelo, referencia
+
+def sensibilidade(modelo, args):
+    """Elasticidades por item e por secao, ordenadas pelo impacto"""
+    total = modelo.total()
+    elasticidades = modelo.elasticidades()
+    custos = modelo.custos
+    itens = [{
+        "parcela": parcela, "chave": chave, "origem": origem,
+        "quantidadeEfetiva": round(float(q), 4), "preco": float(p), "custo": round(float(c), 2),
+        "elasticidade": round(float(e), 6), "impacto": round(float(c) * args.variacao / 100, 2),
+    } for parcela, chave, origem, q, p, c, e in zip(
+        modelo.parcelas, modelo.chaves, modelo.origens, modelo.q, modelo.p, custos, elasticidades)]
+    itens.sort(key=lambda item: -item["elasticidade"])
+
+    custos_grupo = modelo.por_grupo(custos)
+    secoes = [{
+        "parcela": parcela, "secao": secao, "custo": round(float(c), 2),
+        "elasticidade": round(float(c / total), 6), "impacto": round(float(c) * args.variacao / 100, 2),
+    } for (parcela, secao), c in zip(modelo.grupos, custos_grupo)]
+    secoes.sort(key=lambda secao: -secao["elasticidade"])
+    return itens, secoes
+
+def imprimir_sensibilidade(itens, secoes, args):
+    print(f"\nElasticidades (impacto de +{args.variacao:g}% no preco):")
+    print(f"  {'secao':<34} {'custo':>16} {'elast.':>8} {'impacto':>14}")
+    for secao in secoes:
+        nome = f"{secao['parcela']}:{secao['secao']}"
+        print(f"  {nome:<34} {reais(secao['custo']):>16} {secao['elasticidade']:>8.4f} "
+              f"{reais(secao['impacto']):>14}")
+    print(f"\n  {'item':<58} {'elast.':>8} {'impacto':>14}")
+    for item in itens[:args.top]:
+        nome = f"{item['parcela']}:{item['chave']}"
+        print(f"  {nome:<58} {item['elasticidade']:>8.4f} {reais(item['impacto']):>14}")
+    if len(itens) > args.top:
+        print(f"  ... {len(itens) - args.top} itens com elasticidade menor (--top)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Sensibilidade de precos e risco de custo (Monte Carlo) de uma casa")
+    parser.add_argument("--grade", type=Path, default=GRADE_FILE,
+                        help="JSON com os layouts (padrao: %(default)s)")
+    parser.add_argument("--layout", help="nome do layout da casa de referencia (padrao: o primeiro da grade)")
+    parser.add_argument("--telhado", type=int, default=2, help="id de tiposTelhado (padrao: %(default)s)")
+    parser.add_argument("--tijolo", type=int, default=1, help="id de tiposTijolo (padrao: %(default)s)")
+    parser.add_argument("--padrao", type=int, default=3, help="id de padroesAcabamento (padrao: %(default)s)")
+    parser.add_argument("--estado", default="SP", help="sigla da UF (padrao: %(default)s)")
+    parser.add_argument("--precos-materiais", type=Path, default=PRECOS_MATERIAIS_FILE,
+                        help="precos de materiais da casa extraidos (padrao: %(default)s)")
+    parser.add_argument("--precos-mao-obra", type=Path, default=PRECOS_MAO_OBRA_FILE,
+                        help="precos de mao de obra da casa extraidos (padrao: %(default)s)")
+    parser.add_argument("--variacao", type=float, default=10.0,
+                        help="variacao de preco, em %%, do impacto em R$ (padrao: %(default)s)")
+    parser.add_argument("--top", type=int, default=15,
+                        help="itens mostrados, pela elasticidade (padrao: %(default)s)")
+    parser.add_argument("--choque", type=choque, action="append", default=[], metavar="SELETOR=PCT",
+                        help="cenario deterministico: variacao em %% nos itens do seletor (repetivel)")
+    parser.add_argument("--cenarios", type=int, default=100000,
+                        help="sorteios do Monte Carlo; 0 desliga (padrao: %(default)s)")
+    parser.add_argument("--semente", type=int, default=42, help="semente do Monte Carlo (padrao: %(default)s)")
+    parser.add_argument("--volatilidade", type=volatilidade, action="append", default=[],
+                        metavar="SELETOR=DESVIO",
+                        help="desvio do log-preco por parcela ou secao (padrao: materiais=0.10, maoObra=0.06)")
+    parser.add_argument("--volatilidade-item", type=float, default=0.05,
+                        help="desvio do choque independente de cada item; 0 desliga (padrao: %(default)s)")
+    parser.add_argument("--correlacao-secoes", type=float, default=0.6,
+                        help="correlacao dos choques entre secoes da mesma parcela (padrao: %(default)s)")
+    parser.add_argument("--correlacao-parcelas", type=float, default=0.3,
+                        help="correlacao dos choques entre materiais e mao de obra (padrao: %(default)s)")
+    parser.add_argument("--saida", type=Path, help="grava o resultado completo em JSON")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("Analise de Sensibilidade e Risco")
+    print("=" * 60)
+
+    try:
+        modelo, referencia = preparar(args)
+        total = modelo.total()
+        totais_parcela = [float(modelo.custos[[p == parcela for p in modelo.parcelas]].sum())
+                          for parcela in PARCELAS]
+        print(f"\nCasa: {referencia['layout']} ({referencia['area']} m2), {referencia['telhado']}, "
+              f"{referencia['tijolo']}, {referencia['padrao']}, {referencia['estado']}")
+        print(f"  {len(modelo)} itens em {len(modelo.grupos)} secoes")
+        print(f"  Materiais {reais(totais_parcela[0])} + mao de obra {reais(totais_parcela[1])} "
+              f"= {reais(total)}")
+
+        itens, secoes = sensibilidade(modelo, args)
+        imprimir_sensibilidade(itens, secoes, args)
+        resultado = {"referencia": referencia, "total": round(total, 2),
+                     "materiais": round(totais_parcela[0], 2), "maoObra": round(totais_parcela[1], 2),
+                     "variacao": args.variacao, "secoes": secoes, "itens": itens, "choques": []}
+
+        if args.choque:
+            print("\nChoques:")
+            for seletores, pct in args.choque:
+                novo = modelo.choque([(seletor, pct / 100) for seletor in seletores])
+                print(f"  {','.join(seletores)} {pct:+g}%: {reais(novo)} "
+                      f"({reais(novo - total)}, {(novo / total - 1) * 100:+.2f}%)")
+                resultado["choques"].append({"seletores": seletores, "variacao": pct,
+                                             "total": round(novo, 2), "diferenca": round(novo - total, 2)})
+
+        if args.cenarios > 0:
+            sigma = volatilidades_grupos(modelo, VOLATILIDADES_PADRAO, args.volatilidade)
+            correlacao = matriz_correlacao(modelo, args.correlacao_secoes, args.correlacao_parcelas)
+            inicio = time.perf_counter()
+            totais, contribuicoes = simular(modelo, sigma, correlacao, args.cenarios, args.semente,
+                                            args.volatilidade_item)
+            segundos = time.perf_counter() - inicio
+            bandas = {"total": faixas(totais.sum(axis=1))}
+            for i, parcela in enumerate(PARCELAS):
+                bandas[parcela] = faixas(totais[:, i])
+
+            print(f"\nMonte Carlo: {args.cenarios} cenarios em {segundos:.2f}s "
+                  f"(correlacao {args.correlacao_secoes:g} entre secoes, {args.correlacao_parcelas:g} "
+                  f"entre parcelas; choque por item {args.volatilidade_item:g})")
+            for nome, faixa in bandas.items():
+                percentis = "  ".join(f"{p} {reais(v)}" for p, v in faixa.items() if p.startswith("P"))
+                print(f"  {nome:<10} {percentis}")
+            print(f"  P95/referencia: {(bandas['total']['P95'] / total - 1) * 100:+.2f}%")
+            print("\nContribuicao ao risco (fracao da variancia do total):")
+            ordem = np.argsort(-contribuicoes)
+            for i in ordem[:args.top]:
+                parcela, secao = modelo.grupos[i]
+                print(f"  {parcela + ':' + secao:<34} {contribuicoes[i]:>7.2%}")
+            resultado["monteCarlo"] = {
+                "cenarios": args.cenarios, "semente": args.semente, "segundos": round(segundos, 3),
+                "volatilidades": {f"{p}:{s}": float(v) for (p, s), v in zip(modelo.grupos, sigma)},
+                "volatilidadeItem": args.volatilidade_item,
+                "correlacaoSecoes": args.correlacao_secoes, "correlacaoParcelas": args.correlacao_parcelas,
+                "faixas": bandas,
+                "contribuicoes": {f"{p}:{s}": round(float(c), 6) for (p, s), c in zip(modelo.grupos, contribuicoes)},
+            }
+
+        if args.saida:
+            with open(args.saida, "w", encoding="utf-8") as f:
+                json.dump(resultado, f, ensure_ascii=False, indent=2)
+            print(f"\nResultado: {args.saida}")
+    except (OSError, ValueError, KeyError) as e:
+        print(f"ERRO: {e}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
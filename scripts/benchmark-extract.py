@@ -0,0 +1,447 @@
+#!/usr/bin/env python3
+"""
+Benchmark do extrator de precos (scripts/extract-excel.py) com planilhas sinteticas.
+
+Uso:
+    python3 scripts/benchmark-extract.py [--tamanhos 1000,10000,100000]
+                                         [--saida resultado.json]
+                                         [--comparar base.json [--limite 20]]
+    python3 scripts/benchmark-extract.py --inicializacao [--repeticoes 10]
+    python3 scripts/benchmark-extract.py --leitores [--tamanhos ...] [--planilhas a.xlsx b.xlsx]
+
+Gera planilhas com o mesmo formato das abas reais (codigos na coluna B,
+descricao em C, unidade em F, preco em H; na mao de obra, descricoes na
+coluna B com linhas de secao "Parede"/"Teto"/"Pisos") e mede cada etapa:
+abertura, iteracao das linhas, casamento com os mapeamentos, geracao
+TS/JSON e gravacao dos arquivos. Cada tamanho roda em um processo separado
+para que o pico de memoria (RSS) seja medido isoladamente.
+
+As planilhas ficam em .cache/extract-excel/benchmark e sao reaproveitadas.
+Com --inicializacao mede so a partida do extrator nos comandos que nao leem
+planilha (--help, validate, emit-types): tempo de relogio de cada invocacao
+(mediana de --repeticoes) e, via python -X importtime, os modulos mais caros
+de importar. Se algum desses comandos importar o openpyxl o script sai com
+erro.
+
+Com --leitores as abas registradas de cada planilha (sinteticas de
+--tamanhos e as de --planilhas) sao lidas pelos dois leitores do extrator
+(openpyxl e xml, ver scripts/leitor_xlsx.py): o script mostra o tempo de
+leitura de cada um (melhor de --repeticoes) e confere a paridade linha a
+linha, incluindo o tipo dos valores e os limites detectados. Qualquer
+diferenca faz o script sair com erro.
+
+O resultado em JSON pode ser guardado por commit e comparado com --comparar;
+etapas que pioraram mais que --limite por cento fazem o script sair com erro.
+"""
+
+import argparse
+import importlib.util
+import io
+import json
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from datetime import datetime
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).parent
+EXTRATOR_FILE = SCRIPT_DIR / "extract-excel.py"
+BENCH_DIR = SCRIPT_DIR.parent / ".cache" / "extract-excel" / "benchmark"
+
+TAMANHOS_PADRAO = (1000, 10000, 100000)
+
+# Ordem das etapas no relatorio
+ETAPAS = ("abrir", "iterar", "casar", "gerar", "gravar")
+
+# Comandos do extrator que nao devem abrir planilhas nem importar o openpyxl
+COMANDOS_PARTIDA = {
+    "help": ["--help"],
+    "validate": ["validate"],
+    "emit-types": ["emit-types", "--carimbo", "benchmark"],
+}
+
+def carregar_extrator():
+    """Importa scripts/extract-excel.py como modulo"""
+    spec = importlib.util.spec_from_file_location("extract_excel", EXTRATOR_FILE)
+    modulo = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(modulo)
+    return modulo
+
+def pico_rss_kb():
+    """Pico de RSS do processo em KB (ru_maxrss e em bytes no macOS)"""
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico // 1024 if sys.platform == "darwin" else pico
+
+def gerar_planilha_sintetica(caminho, linhas, extrator, semente=42):
+    """Cria uma planilha com as abas ORCAMENTO/MAO DE OBRA com ~linhas linhas cada"""
+    from openpyxl import Workbook
+
+    aleatorio = random.Random(semente)
+    wb = Workbook(write_only=True)
+
+    # Abas que o extrator deve ignorar
+    for nome in ("QUESTIONÁRIO", "RESUMO"):
+        ws = wb.create_sheet(nome)
+        for i in range(200):
+            ws.append([f"campo {i}", i * 1.5])
+
+    ws = wb.create_sheet("ORÇAMENTO - CASA")
+    for _ in range(4):
+        ws.append([])
+    ws.append([None, "ITEM", "DESCRIÇÃO", None, None, "UN", None, "PREÇO UNITÁRIO"])
+    ws.append([])
+    secao, item = 1, 0
+    for _ in range(linhas):
+        item += 1
+        if item > 40:
+            secao, item = secao % 13 + 1, 1
+            ws.append([None, f"3.{secao}", f"SECAO {secao}"])
+            continue
+        codigo = f"3.{secao}.{item}"
+        ws.append([None, codigo, f"Item {codigo}", None, None, "m²", None,
+                   round(aleatorio.uniform(5, 900), 4)])
+
+    ws = wb.create_sheet("MÃO DE OBRA - CASA")
+    for _ in range(4):
+        ws.append([])
+    ws.append([None, "DESCRIÇÃO", None, None, None, "UN", None, "PREÇO UNITÁRIO"])
+    ws.append([])
+    registro = next(r for r in extrator.registro_abas() if r.aba == "MÃO DE OBRA - CASA")
+    chaves = list(registro.itens)
+    for i in range(linhas):
+        sorteio = aleatorio.random()
+        if i % 500 == 0:
+            ws.append([None, ("Parede", "Teto", "Pisos")[(i // 500) % 3]])
+        elif sorteio < 0.05:
+            ws.append([None, "Revestimento cerâmico 60x60", None, None, None, "m²", None,
+                       round(aleatorio.uniform(5, 300), 2)])
+        elif sorteio < 0.5:
+            descricao = aleatorio.choice(chaves).capitalize() + " conforme projeto"
+            ws.append([None, descricao, None, None, None, "un", None, round(aleatorio.uniform(5, 300), 2)])
+        else:
+            ws.append([None, f"Servico complementar {i}", None, None, None, "un", None,
+                       round(aleatorio.uniform(5, 300), 2)])
+
+    wb.save(caminho)
+
+def planilha_sintetica(linhas, extrator):
+    caminho = BENCH_DIR / f"sintetica-{linhas}.xlsx"
+    if not caminho.exists():
+        BENCH_DIR.mkdir(parents=True, exist_ok=True)
+        print(f"Gerando planilha sintetica com {linhas} linhas...", file=sys.stderr)
+        gerar_planilha_sintetica(caminho, linhas, extrator)
+    return caminho
+
+def medir_tamanho(linhas):
+    """Executa as etapas para um tamanho e retorna o resultado (roda no processo filho)"""
+    extrator = carregar_extrator()
+    caminho = planilha_sintetica(linhas, extrator)
+    etapas = {}
+
+    def medir(nome, funcao):
+        inicio, inicio_cpu = time.perf_counter(), time.process_time()
+        resultado = funcao()
+        etapas[nome] = {
+            "segundos": round(time.perf_counter() - inicio, 6),
+            "cpu_segundos": round(time.process_time() - inicio_cpu, 6),
+            "rss_kb": pico_rss_kb(),
+        }
+        return resultado
+
+    wb = medir("abrir", lambda: extrator.abrir_workbook(caminho))
+    try:
+        def iterar():
+            abas = {}
+            for registro in extrator.registro_abas():
+                nome = registro.nome_na_planilha(wb.sheetnames)
+                if nome is not None:
+                    abas[registro.aba] = list(extrator.iterar_linhas(
+                        wb[nome], registro.linha_inicial, extras=registro.extras))
+            return abas
+        abas = medir("iterar", iterar)
+    finally:
+        wb.close()
+
+    def casar():
+        resultados, detalhes = {}, {}
+        with redirect_stdout(io.StringIO()):
+            for registro in extrator.registro_abas():
+                aba = registro.aba
+                detalhes[aba] = {}
+                resultados[aba] = registro.extrator(abas[aba], detalhes[aba]) if aba in abas else {}
+        return resultados, detalhes
+    resultados, detalhes = medir("casar", casar)
+
+    with tempfile.TemporaryDirectory() as destino:
+        destino = Path(destino)
+        saidas = medir("gerar", lambda: extrator.gerar_saidas(
+            resultados, destino, formatos=extrator.FORMATOS, detalhes=detalhes, destino_json=destino))
+
+        def gravar():
+            for caminho_saida, conteudo in saidas:
+                extrator.escrever_se_mudou(caminho_saida, conteudo)
+        medir("gravar", gravar)
+
+    return {
+        "linhas": linhas,
+        "linhas_lidas": sum(len(v) for v in abas.values()),
+        "itens": {aba: extrator.contar_itens(precos) for aba, precos in resultados.items()},
+        "etapas": etapas,
+        "total_segundos": round(sum(e["segundos"] for e in etapas.values()), 6),
+        "pico_rss_kb": pico_rss_kb(),
+    }
+
+def ler_abas(extrator, caminho, leitor):
+    """{aba: (linhas, limites)} das abas registradas, lidas pelo leitor"""
+    fonte = extrator.LEITORES[leitor](caminho)
+    try:
+        abas = {}
+        for registro in extrator.registro_abas():
+            nome = registro.nome_na_planilha(fonte.sheetnames)
+            if nome is not None:
+                limites = {}
+                linhas = list(fonte.linhas(nome, registro.linha_inicial, extras=registro.extras,
+                                           limites=limites))
+                abas[registro.aba] = (linhas, limites)
+        return abas
+    finally:
+        fonte.close()
+
+def divergencias_leitores(referencia, leitura):
+    """Descricao das diferencas entre duas leituras (vazia se identicas)"""
+    problemas = []
+    for aba in sorted(set(referencia) | set(leitura)):
+        if aba not in referencia or aba not in leitura:
+            problemas.append(f"{aba}: aba lida por so um dos leitores")
+            continue
+        (linhas_ref, limites_ref), (linhas, limites) = referencia[aba], leitura[aba]
+        if limites != limites_ref:
+            problemas.append(f"{aba}: limites {limites} != {limites_ref}")
+        # repr compara tambem os tipos (1 != 1.0 no hash incremental)
+        for esperada, obtida in zip(linhas_ref, linhas):
+            if repr(esperada) != repr(obtida):
+                problemas.append(f"{aba}: {obtida!r} != {esperada!r}")
+                break
+        if len(linhas) != len(linhas_ref):
+            problemas.append(f"{aba}: {len(linhas)} linhas != {len(linhas_ref)}")
+    return problemas
+
+def comparar_leitores(caminho, repeticoes):
+    """Tempo de leitura de cada leitor e paridade com o openpyxl
+
+    Planilhas que nao abrem (zip invalido, por exemplo) precisam falhar com o
+    mesmo tipo de erro nos dois leitores.
+    """
+    extrator = carregar_extrator()
+    tempos, leituras, erros = {}, {}, {}
+    for leitor in extrator.LEITORES:
+        medicoes = []
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            try:
+                leituras[leitor] = ler_abas(extrator, caminho, leitor)
+            except Exception as e:
+                erros[leitor] = type(e).__name__
+                break
+            medicoes.append(time.perf_counter() - inicio)
+        if medicoes:
+            tempos[leitor] = round(min(medicoes), 6)
+    divergencias = {}
+    for leitor in extrator.LEITORES:
+        if leitor == "openpyxl":
+            continue
+        if erros.get(leitor) != erros.get("openpyxl"):
+            divergencias[leitor] = [f"erro {erros.get(leitor)} != {erros.get('openpyxl')}"]
+        else:
+            divergencias[leitor] = divergencias_leitores(leituras.get("openpyxl", {}), leituras.get(leitor, {}))
+    return {
+        "planilha": str(caminho),
+        "linhas_lidas": sum(len(linhas) for linhas, _ in leituras.get("openpyxl", {}).values()),
+        "segundos": tempos,
+        "erros": erros,
+        "divergencias": divergencias,
+    }
+
+def ler_importtime(saida):
+    """Linhas de -X importtime: [(modulo, proprio_us, acumulado_us, nivel)]"""
+    modulos = []
+    for linha in saida.splitlines():
+        if not linha.startswith("import time:") or "self [us]" in linha:
+            continue
+        proprio, acumulado, nome = linha[len("import time:"):].split("|")
+        # O nome vem indentado 2 espacos por nivel, apos o espaco do separador
+        modulos.append((nome.strip(), int(proprio), int(acumulado), (len(nome) - len(nome.lstrip()) - 1) // 2))
+    return modulos
+
+def medir_inicializacao(repeticoes):
+    """Tempo de partida dos comandos que nao leem planilha"""
+    resultados = {}
+    with tempfile.TemporaryDirectory() as destino:
+        for nome, argumentos in COMANDOS_PARTIDA.items():
+            if nome == "emit-types":
+                argumentos = argumentos + ["--destino", destino]
+            comando = [sys.executable, str(EXTRATOR_FILE), *argumentos]
+            tempos = []
+            for _ in range(repeticoes):
+                inicio = time.perf_counter()
+                subprocess.run(comando, capture_output=True, check=True)
+                tempos.append(time.perf_counter() - inicio)
+            execucao = subprocess.run([sys.executable, "-X", "importtime", *comando[1:]],
+                                      capture_output=True, text=True, check=True)
+            modulos = ler_importtime(execucao.stderr)
+            # Nivel 0 = importados diretamente (o acumulado inclui as dependencias)
+            diretos = sorted((m for m in modulos if m[3] == 0), key=lambda m: -m[2])
+            resultados[nome] = {
+                "mediana_segundos": round(statistics.median(tempos), 6),
+                "minimo_segundos": round(min(tempos), 6),
+                "imports_segundos": round(sum(m[1] for m in modulos) / 1e6, 6),
+                "modulos": len(modulos),
+                "mais_caros": [{"modulo": m[0], "acumulado_us": m[2]} for m in diretos[:5]],
+                "openpyxl": any(m[0] == "openpyxl" for m in modulos),
+            }
+    return resultados
+
+def versao_git():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=SCRIPT_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def comparar(atual, base, limite):
+    """Imprime a variacao por etapa e retorna as regressoes acima do limite (%)"""
+    por_tamanho = {r["linhas"]: r for r in base["resultados"]}
+    regressoes = []
+    print(f"\nComparacao com {base.get('commit') or 'base'} (limite {limite:.0f}%)")
+    for resultado in atual["resultados"]:
+        anterior = por_tamanho.get(resultado["linhas"])
+        if not anterior:
+            continue
+        for etapa in ETAPAS + ("total",):
+            if etapa == "total":
+                antes, depois = anterior["total_segundos"], resultado["total_segundos"]
+            else:
+                antes = anterior["etapas"][etapa]["segundos"]
+                depois = resultado["etapas"][etapa]["segundos"]
+            variacao = (depois - antes) / antes * 100 if antes else 0.0
+            marca = ""
+            # Ignora ruido em etapas muito curtas
+            if variacao > limite and depois - antes > 0.005:
+                regressoes.append((resultado["linhas"], etapa, variacao))
+                marca = "  <-- regressao"
+            print(f"  {resultado['linhas']:>7} {etapa:<7} {antes:9.4f}s -> {depois:9.4f}s "
+                  f"({variacao:+6.1f}%){marca}")
+    return regressoes
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do extrator de precos com planilhas sinteticas")
+    parser.add_argument("--tamanhos", default=",".join(str(t) for t in TAMANHOS_PADRAO),
+                        help="linhas por aba, separadas por virgula (padrao: %(default)s)")
+    parser.add_argument("--saida", type=Path, help="grava o resultado em JSON neste arquivo")
+    parser.add_argument("--comparar", type=Path, help="resultado JSON anterior para comparacao")
+    parser.add_argument("--limite", type=float, default=20.0,
+                        help="piora percentual tolerada por etapa em --comparar (padrao: %(default)s)")
+    parser.add_argument("--inicializacao", action="store_true",
+                        help="mede so o tempo de partida dos comandos que nao leem planilha")
+    parser.add_argument("--repeticoes", type=int, default=10,
+                        help="invocacoes por comando em --inicializacao (padrao: %(default)s)")
+    parser.add_argument("--leitores", action="store_true",
+                        help="compara tempo e paridade dos leitores de planilha (openpyxl x xml)")
+    parser.add_argument("--planilhas", type=Path, nargs="+", default=[],
+                        help="planilhas reais incluidas em --leitores")
+    parser.add_argument("--processo-filho", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.leitores:
+        extrator = carregar_extrator()
+        caminhos = [planilha_sintetica(int(t), extrator) for t in args.tamanhos.split(",") if t]
+        resultados = []
+        for caminho in caminhos + args.planilhas:
+            resultado = comparar_leitores(caminho, max(1, min(args.repeticoes, 3)))
+            resultados.append(resultado)
+            base = resultado["segundos"].get("openpyxl")
+            tempos = "  ".join(f"{leitor}={segundos:.3f}s" + (f" ({base / segundos:.1f}x)" if base else "")
+                               for leitor, segundos in resultado["segundos"].items())
+            if resultado["erros"]:
+                tempos = "erro " + ", ".join(f"{leitor}={erro}" for leitor, erro in resultado["erros"].items())
+            problemas = [p for lista in resultado["divergencias"].values() for p in lista]
+            print(f"{caminho.name}: {resultado['linhas_lidas']} linhas  {tempos}  "
+                  f"paridade {'OK' if not problemas else 'DIVERGENTE'}")
+            for problema in problemas:
+                print(f"  {problema}")
+        if args.saida:
+            relatorio = {
+                "commit": versao_git(),
+                "data": datetime.now().isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "leitores": resultados,
+            }
+            args.saida.write_text(json.dumps(relatorio, indent=2) + "\n", encoding="utf-8")
+            print(f"\nResultado gravado em {args.saida}")
+        if any(lista for r in resultados for lista in r["divergencias"].values()):
+            sys.exit(1)
+        return
+
+    if args.inicializacao:
+        resultados = medir_inicializacao(args.repeticoes)
+        for nome, resultado in resultados.items():
+            caros = ", ".join(f"{m['modulo']} {m['acumulado_us'] / 1000:.1f}ms" for m in resultado["mais_caros"])
+            print(f"{nome:<11} mediana={resultado['mediana_segundos'] * 1000:.1f}ms  "
+                  f"imports={resultado['imports_segundos'] * 1000:.1f}ms ({resultado['modulos']} modulos)  "
+                  f"[{caros}]")
+        if args.saida:
+            relatorio = {
+                "commit": versao_git(),
+                "data": datetime.now().isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "inicializacao": resultados,
+            }
+            args.saida.write_text(json.dumps(relatorio, indent=2) + "\n", encoding="utf-8")
+            print(f"\nResultado gravado em {args.saida}")
+        com_openpyxl = [nome for nome, resultado in resultados.items() if resultado["openpyxl"]]
+        if com_openpyxl:
+            print(f"ERRO: openpyxl importado em: {', '.join(com_openpyxl)}")
+            sys.exit(1)
+        return
+
+    if args.processo_filho is not None:
+        print(json.dumps(medir_tamanho(args.processo_filho)))
+        return
+
+    resultados = []
+    for linhas in (int(t) for t in args.tamanhos.split(",")):
+        saida = subprocess.run([sys.executable, __file__, "--processo-filho", str(linhas)],
+                               capture_output=True, text=True)
+        if saida.returncode != 0:
+            print(saida.stderr, file=sys.stderr)
+            sys.exit(1)
+        resultado = json.loads(saida.stdout.strip().splitlines()[-1])
+        resultados.append(resultado)
+        etapas = "  ".join(f"{e}={resultado['etapas'][e]['segundos']:.3f}s" for e in ETAPAS)
+        print(f"{linhas:>7} linhas: {etapas}  total={resultado['total_segundos']:.3f}s  "
+              f"pico RSS={resultado['pico_rss_kb'] / 1024:.1f} MB")
+
+    relatorio = {
+        "commit": versao_git(),
+        "data": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "resultados": resultados,
+    }
+    if args.saida:
+        args.saida.write_text(json.dumps(relatorio, indent=2) + "\n", encoding="utf-8")
+        print(f"\nResultado gravado em {args.saida}")
+
+    if args.comparar:
+        base = json.loads(args.comparar.read_text(encoding="utf-8"))
+        if comparar(relatorio, base, args.limite):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
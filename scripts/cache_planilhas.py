@@ -0,0 +1,212 @@
+"""
+Cache enderecado por conteudo das abas ja lidas de uma planilha.
+
+Usado por scripts/extract-excel.py (--cache): a primeira leitura de uma
+planilha grava as linhas de cada aba extraida; execucoes seguintes (ou
+outras ferramentas) com o mesmo arquivo leem o cache em vez de abrir o XLSX.
+Uma entrada so e usada se o formato (VERSAO_CACHE) e o leiaute das abas
+(nomes, linha_inicial e colunas de mapeamentos-planilha.json) forem os mesmos
+de quando foi gravada; os mapeamentos de itens sao aplicados depois e nao
+entram na conta.
+
+Layout (em .cache/extract-excel/planilhas):
+
+    <sha256 da planilha>/
+        meta.json           {"versao": 2, "sha256": ..., "leiaute": <sha256 do leiaute>,
+                             "abas": {aba: arquivo},
+                             "ausentes": [abas que nao existem na planilha],
+                             "limites": {aba: {"cabecalho", "primeira", "ultima", "secoes"}}}
+        <aba>.json.gz       JSON (gzip) colunar de uma aba:
+                            {"versao": 2, "aba": ...,
+                             "colunas": {"linha": [...], "codigo": [...],
+                                         "descricao": [...], "unidade": [...],
+                                         "preco": [...]}}
+
+As colunas tem o mesmo tamanho; "codigo" e null nas abas sem codigo (ex.: mao
+de obra, onde a descricao fica na coluna B). Os valores sao os das celulas,
+sem conversao (precos podem vir como texto se assim estiverem na planilha).
+Em Node: zlib.gunzipSync + JSON.parse.
+
+O diretorio e limitado por tamanho: ao passar do limite, as entradas usadas
+ha mais tempo (mtime do meta.json, atualizado a cada leitura) sao removidas.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+import unicodedata
+from pathlib import Path
+
+from escrita_atomica import escrever_atomico
+
+VERSAO_CACHE = 2
+COLUNAS = ("linha", "codigo", "descricao", "unidade", "preco")
+
+def _nome_arquivo(aba):
+    texto = unicodedata.normalize("NFKD", aba).encode("ascii", "ignore").decode("ascii")
+    return re.sub(r"[^0-9a-z]+", "-", texto.lower()).strip("-") + ".json.gz"
+
+def ler_aba(diretorio_entrada, aba):
+    """Le as colunas de uma aba do cache: {"linha": [...], "codigo": [...], ...}"""
+    caminho = Path(diretorio_entrada) / _nome_arquivo(aba)
+    with gzip.open(caminho, "rt", encoding="utf-8") as f:
+        return json.load(f)["colunas"]
+
+class CachePlanilhas:
+    """Cache de abas por SHA-256 da planilha, com remocao LRU por tamanho
+
+    leiaute: {aba: {"nomes": [...], "linha_inicial": n, "colunas": {letra: papel}}}, ex.:
+        {"ORÇAMENTO - CASA": {"nomes": ["ORÇAMENTO - CASA", "ORCAMENTO - CASA"], "linha_inicial": 7,
+                              "colunas": {"B": "codigo", "C": "descricao", "F": "unidade", "H": "preco"}}}
+    """
+
+    def __init__(self, diretorio, limite_bytes, leiaute):
+        self.diretorio = Path(diretorio)
+        self.limite_bytes = limite_bytes
+        self.papeis = {aba: dados["colunas"] for aba, dados in leiaute.items()}
+        texto = json.dumps(leiaute, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+        self.assinatura = hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+    def abrir(self, sha256, abas):
+        """Fonte de linhas a partir do cache, ou None se alguma aba nao estiver la"""
+        entrada = self.diretorio / sha256
+        try:
+            with open(entrada / "meta.json", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if meta.get("versao") != VERSAO_CACHE or meta.get("leiaute") != self.assinatura:
+            return None
+        conhecidas = set(meta.get("abas", {})) | set(meta.get("ausentes", []))
+        if not set(abas) <= conhecidas:
+            return None
+        # Marca o uso para a politica LRU
+        os.utime(entrada / "meta.json")
+        return FonteCache(entrada, meta, self.papeis)
+
+    def gravador(self, sha256):
+        return GravadorCache(self.diretorio / sha256, sha256, self.papeis, self.assinatura)
+
+    def verificar(self):
+        """Confere todas as entradas sem usa-las: [(entrada, problema)]"""
+        problemas = []
+        if not self.diretorio.exists():
+            return problemas
+        for entrada in sorted(self.diretorio.iterdir()):
+            if not entrada.is_dir():
+                continue
+            try:
+                with open(entrada / "meta.json", encoding="utf-8") as f:
+                    meta = json.load(f)
+            except (OSError, ValueError) as e:
+                problemas.append((entrada.name, f"meta.json ilegivel: {e}"))
+                continue
+            if meta.get("versao") != VERSAO_CACHE or meta.get("sha256") != entrada.name:
+                problemas.append((entrada.name, "meta.json com versao ou sha256 inesperados"))
+                continue
+            for aba in meta.get("abas", {}):
+                try:
+                    colunas = ler_aba(entrada, aba)
+                except (OSError, ValueError, EOFError, KeyError) as e:
+                    problemas.append((entrada.name, f"aba '{aba}' ilegivel: {e}"))
+                    continue
+                if set(colunas) != set(COLUNAS) or len({len(v) for v in colunas.values()}) > 1:
+                    problemas.append((entrada.name, f"aba '{aba}' com colunas desalinhadas"))
+        return problemas
+
+    def podar(self, preservar=None):
+        """Remove as entradas menos usadas ate o cache caber no limite"""
+        if not self.diretorio.exists():
+            return []
+        entradas = []
+        total = 0
+        for entrada in self.diretorio.iterdir():
+            if not entrada.is_dir():
+                continue
+            try:
+                tamanho = sum(f.stat().st_size for f in entrada.iterdir() if f.is_file())
+                uso = (entrada / "meta.json").stat().st_mtime
+            except OSError:
+                # Entrada incompleta ou sendo removida por outro processo
+                continue
+            entradas.append((uso, tamanho, entrada))
+            total += tamanho
+
+        removidas = []
+        for uso, tamanho, entrada in sorted(entradas):
+            if total <= self.limite_bytes:
+                break
+            if entrada.name == preservar:
+                continue
+            shutil.rmtree(entrada, ignore_errors=True)
+            total -= tamanho
+            removidas.append(entrada.name)
+        return removidas
+
+class FonteCache:
+    """Fonte de linhas equivalente a iterar_linhas, lida do cache"""
+
+    def __init__(self, entrada, meta, papeis):
+        self.entrada = entrada
+        self.meta = meta
+        self.papeis = papeis
+        self.sheetnames = list(meta["abas"])
+
+    def linhas(self, aba, min_row, extras=(), limites=None):
+        colunas = ler_aba(self.entrada, aba)
+        if limites is not None:
+            limites.update(self.meta.get("limites", {}).get(aba, {}))
+        papeis = self.papeis.get(aba, {})
+        vazio = [None] * len(colunas["linha"])
+        selecionadas = [colunas.get(papeis.get(letra), vazio) for letra in ("B", "H") + tuple(extras)]
+        return zip(colunas["linha"], *selecionadas)
+
+    def close(self):
+        pass
+
+class GravadorCache:
+    """Acumula as linhas lidas de cada aba e grava a entrada do cache"""
+
+    def __init__(self, entrada, sha256, papeis, assinatura):
+        self.entrada = entrada
+        self.papeis = papeis
+        self.meta = {"versao": VERSAO_CACHE, "sha256": sha256, "leiaute": assinatura,
+                     "abas": {}, "ausentes": [], "limites": {}}
+
+    def coletar(self, aba, linhas, extras):
+        """Repassa as linhas (linha, B, H, *extras) guardando-as em colunas"""
+        colunas = {nome: [] for nome in COLUNAS}
+        papeis = self.papeis.get(aba, {})
+        destinos = [colunas.get(papeis.get(letra)) for letra in ("B", "H") + tuple(extras)]
+        self._colunas = colunas
+        for linha in linhas:
+            colunas["linha"].append(linha[0])
+            for destino, valor in zip(destinos, linha[1:]):
+                if destino is not None:
+                    destino.append(valor)
+            yield linha
+        # Papeis nao lidos ficam nulos, mantendo as colunas alinhadas
+        for nome in COLUNAS:
+            if len(colunas[nome]) != len(colunas["linha"]):
+                colunas[nome] = [None] * len(colunas["linha"])
+
+    def gravar_aba(self, aba, limites):
+        self.entrada.mkdir(parents=True, exist_ok=True)
+        nome = _nome_arquivo(aba)
+        conteudo = {"versao": VERSAO_CACHE, "aba": aba, "colunas": self._colunas}
+        dados = json.dumps(conteudo, ensure_ascii=False, separators=(",", ":"), default=str)
+        escrever_atomico(self.entrada / nome, gzip.compress(dados.encode("utf-8"), mtime=0))
+        self.meta["abas"][aba] = nome
+        self.meta["limites"][aba] = limites
+
+    def ausente(self, aba):
+        self.meta["ausentes"].append(aba)
+
+    def finalizar(self):
+        """Grava o meta.json por ultimo: so entradas completas sao usadas"""
+        self.entrada.mkdir(parents=True, exist_ok=True)
+        dados = json.dumps(self.meta, ensure_ascii=False, indent=2)
+        escrever_atomico(self.entrada / "meta.json", dados.encode("utf-8"))
@@ -0,0 +1,239 @@
+"""
+Normalizacao e casamento das descricoes da planilha com as chaves do mapeamento.
+
+Usado por scripts/extract-excel.py nas abas com chave "descricao" (mao de obra
+da casa), em que a coluna B traz so o texto do servico, sem codigo.
+
+Normalizacao: casefold, uma passada NFKD (separa acentos e compatibiliza
+caracteres como "º" e espaco nao separavel) e uma tabela de translate que
+descarta os acentos; espacos repetidos viram um so. "Instalação  Elétrica"
+e "instalacao eletrica" ficam iguais, para qualquer acento (inclusive à, õ, ü).
+
+Casamento, em duas etapas:
+
+1. Exato: as chaves contidas na descricao, em uma passada (Aho-Corasick,
+   MatcherDescricoes); a mais longa vence.
+2. Aproximado, so se nenhuma chave estiver contida: cada palavra da chave e
+   comparada com a palavra mais parecida da descricao (coeficiente de Dice
+   dos bigramas de caracteres); a similaridade da chave e a media pesada pelo
+   tamanho das palavras. Palavras com digitos ("25mm", "4x2") e de ate duas
+   letras precisam ser iguais, e nenhuma palavra pode ficar abaixo de
+   SIMILARIDADE_PALAVRA. Vence a chave com maior similaridade a partir do
+   limiar (SIMILARIDADE_MINIMA, ou "similaridade_minima" da aba no mapeamento).
+
+Assim tanto "registro de presao" (como esta no mapeamento) quanto "registro de
+pressao" (planilha corrigida) casam com a mesma chave. As palavras parecidas
+vem de um indice invertido bigrama -> palavras do vocabulario das chaves, sem
+comparar a descricao com todas as chaves.
+
+O resultado de cada descricao distinta e memorizado: catalogos com milhares de
+linhas repetidas casam cada texto uma unica vez (ate LIMITE_MEMO descricoes).
+"""
+
+import re
+import unicodedata
+from collections import deque
+from functools import lru_cache
+
+SIMILARIDADE_MINIMA = 0.8
+SIMILARIDADE_PALAVRA = 0.6
+# Descricoes distintas memorizadas por casador (processos longos: --watch)
+LIMITE_MEMO = 65536
+
+# Marcas de combinacao (acentos) separadas pelo NFKD
+TABELA_ACENTOS = {codigo: None for codigo in range(0x0300, 0x0370)}
+PALAVRA = re.compile(r"\w+(?:[.,]\d+\w*)*")
+
+@lru_cache(maxsize=65536)
+def normalizar_descricao(texto):
+    """Minusculas, sem acentos e com espacos simples, como as chaves do registro"""
+    texto = unicodedata.normalize("NFKD", texto.casefold()).translate(TABELA_ACENTOS)
+    return " ".join(texto.split())
+
+def palavras(texto):
+    """Palavras de um texto normalizado ("1,5mm" e "4x2" ficam inteiras)"""
+    return PALAVRA.findall(texto)
+
+def bigramas(palavra):
+    marcada = f"${palavra}$"
+    return frozenset(marcada[i:i + 2] for i in range(len(marcada) - 1))
+
+def exige_igualdade(palavra):
+    """Numeros, medidas e palavras curtas so casam exatamente"""
+    return len(palavra) <= 2 or any(c.isdigit() for c in palavra)
+
+class MatcherDescricoes:
+    """Automato Aho-Corasick sobre as chaves de um mapeamento de descricoes
+
+    Construido uma unica vez; cada descricao e percorrida em uma so passada,
+    encontrando todas as chaves contidas nela em O(tamanho + ocorrencias),
+    independente do numero de chaves do mapeamento.
+    """
+
+    def __init__(self, chaves):
+        self.chaves = list(chaves)
+        self._transicoes = [{}]
+        self._falha = [0]
+        self._saidas = [()]
+
+        # Trie das chaves
+        for indice, chave in enumerate(self.chaves):
+            estado = 0
+            for caractere in chave:
+                proximo = self._transicoes[estado].get(caractere)
+                if proximo is None:
+                    proximo = len(self._transicoes)
+                    self._transicoes[estado][caractere] = proximo
+                    self._transicoes.append({})
+                    self._falha.append(0)
+                    self._saidas.append(())
+                estado = proximo
+            self._saidas[estado] += (indice,)
+
+        # Links de falha em largura (BFS)
+        fila = deque(self._transicoes[0].values())
+        while fila:
+            estado = fila.popleft()
+            for caractere, proximo in self._transicoes[estado].items():
+                fila.append(proximo)
+                falha = self._falha[estado]
+                while falha and caractere not in self._transicoes[falha]:
+                    falha = self._falha[falha]
+                destino = self._transicoes[falha].get(caractere, 0)
+                self._falha[proximo] = destino if destino != proximo else 0
+                self._saidas[proximo] += self._saidas[self._falha[proximo]]
+
+    def encontrar(self, texto):
+        """Retorna os indices das chaves contidas no texto, sem repeticao"""
+        transicoes, falha, saidas = self._transicoes, self._falha, self._saidas
+        estado = 0
+        encontrados = []
+        for caractere in texto:
+            while estado and caractere not in transicoes[estado]:
+                estado = falha[estado]
+            estado = transicoes[estado].get(caractere, 0)
+            for indice in saidas[estado]:
+                if indice not in encontrados:
+                    encontrados.append(indice)
+        return encontrados
+
+    def melhor(self, texto):
+        """Escolhe a chave mais longa contida no texto
+
+        Retorna (chave, concorrentes). concorrentes lista as demais chaves
+        encontradas que nao fazem parte da escolhida (empate de tamanho ou
+        ocorrencias independentes) e indica uma linha ambigua.
+        """
+        encontrados = self.encontrar(texto)
+        if not encontrados:
+            return None, []
+        # max() mantem a primeira chave em caso de empate (ordem do mapeamento)
+        escolhida = self.chaves[max(sorted(encontrados), key=lambda i: len(self.chaves[i]))]
+        concorrentes = [
+            self.chaves[i] for i in encontrados
+            if self.chaves[i] != escolhida and self.chaves[i] not in escolhida
+        ]
+        return escolhida, concorrentes
+
+class IndiceNgramas:
+    """Indice de bigramas das palavras das chaves, para o casamento aproximado"""
+
+    def __init__(self, chaves, limiar=SIMILARIDADE_MINIMA):
+        self.chaves = list(chaves)
+        self.limiar = limiar
+        self.palavras_chaves = [palavras(chave) for chave in self.chaves]
+        self.vocabulario = sorted({p for lista in self.palavras_chaves for p in lista})
+        self._bigramas = [bigramas(p) for p in self.vocabulario]
+        self._chaves_por_palavra = {}
+        for indice, lista in enumerate(self.palavras_chaves):
+            for palavra in set(lista):
+                self._chaves_por_palavra.setdefault(palavra, []).append(indice)
+        self._por_bigrama = {}
+        for indice, (palavra, grupo) in enumerate(zip(self.vocabulario, self._bigramas)):
+            if exige_igualdade(palavra):
+                continue
+            for bigrama in grupo:
+                self._por_bigrama.setdefault(bigrama, []).append(indice)
+        self._similares = {}
+
+    def similares(self, palavra):
+        """{palavra do vocabulario: similaridade} das palavras parecidas (memorizado)"""
+        encontradas = self._similares.get(palavra)
+        if encontradas is not None:
+            return encontradas
+        if exige_igualdade(palavra):
+            encontradas = {palavra: 1.0}
+        else:
+            grupo = bigramas(palavra)
+            comuns = {}
+            for bigrama in grupo:
+                for indice in self._por_bigrama.get(bigrama, ()):
+                    comuns[indice] = comuns.get(indice, 0) + 1
+            encontradas = {}
+            for indice, n in comuns.items():
+                similaridade = 2 * n / (len(grupo) + len(self._bigramas[indice]))
+                if similaridade >= SIMILARIDADE_PALAVRA:
+                    encontradas[self.vocabulario[indice]] = similaridade
+        self._similares[palavra] = encontradas
+        return encontradas
+
+    def candidatos(self, texto):
+        """[(similaridade, indice da chave)] a partir do limiar, da mais parecida para a menos"""
+        melhores = {}
+        for palavra in palavras(texto):
+            for parecida, similaridade in self.similares(palavra).items():
+                if similaridade > melhores.get(parecida, 0.0):
+                    melhores[parecida] = similaridade
+        # So as chaves com alguma palavra parecida; todas as palavras precisam de uma
+        indices = sorted({i for palavra in melhores for i in self._chaves_por_palavra.get(palavra, ())})
+        resultado = []
+        for indice in indices:
+            lista = self.palavras_chaves[indice]
+            pesos = total = 0.0
+            for palavra in lista:
+                similaridade = melhores.get(palavra, 0.0)
+                if similaridade == 0.0:
+                    break
+                total += similaridade * len(palavra)
+                pesos += len(palavra)
+            else:
+                if total / pesos >= self.limiar:
+                    resultado.append((round(total / pesos, 4), indice))
+        resultado.sort(key=lambda item: (-item[0], -len(self.chaves[item[1]]), item[1]))
+        return resultado
+
+class CasadorDescricoes:
+    """Casamento exato (Aho-Corasick) com recurso ao aproximado, memorizado por descricao"""
+
+    def __init__(self, chaves, limiar=SIMILARIDADE_MINIMA):
+        self.exato = MatcherDescricoes(chaves)
+        self.aproximado = IndiceNgramas(chaves, limiar) if limiar < 1 else None
+        self._memo = {}
+
+    def melhor(self, texto):
+        """(chave, concorrentes, similaridade) para uma descricao normalizada
+
+        similaridade e 1.0 no casamento exato; (None, [], 0.0) sem casamento.
+        """
+        resultado = self._memo.get(texto)
+        if resultado is None:
+            resultado = self._casar(texto)
+            if len(self._memo) >= LIMITE_MEMO:
+                self._memo.clear()
+            self._memo[texto] = resultado
+        return resultado
+
+    def _casar(self, texto):
+        chave, concorrentes = self.exato.melhor(texto)
+        if chave is not None:
+            return chave, concorrentes, 1.0
+        if self.aproximado is None:
+            return None, [], 0.0
+        candidatos = self.aproximado.candidatos(texto)
+        if not candidatos:
+            return None, [], 0.0
+        similaridade, indice = candidatos[0]
+        chaves = self.aproximado.chaves
+        # Empate de similaridade com outra chave: linha ambigua, como no exato
+        concorrentes = [chaves[i] for s, i in candidatos[1:] if s == similaridade]
+        return chaves[indice], concorrentes, similaridade
@@ -0,0 +1,131 @@
+"""
+Diferencas de precos entre duas extracoes.
+
+Usado por scripts/extract-excel.py: a cada extracao os precos de cada aba
+ficam guardados em um snapshot (.cache/extract-excel/ultima-extracao.json) e a
+extracao seguinte e comparada com ele. Com --diff ARQUIVO o resultado e
+gravado em JSON, para que consumidores (respostas da API, orcamentos
+pre-calculados) invalidem so as secoes afetadas. O comando diff do extrator
+compara dois snapshots ou dois ArquivoPrecos quaisquer.
+
+Snapshot:
+
+    {"versao": 1,
+     "planilha": "monte-sua-casa-simulacao.xlsx",
+     "abas": {"materiais-casa": [["alvenaria.blocoCeramico", 1.2], ...], ...}}
+
+As chaves ("secao.campo" ou "secao.subsecao.campo") ficam ordenadas por
+bytes, como no snapshot .bin; itens com preco 0 nao entram (tambem nao sao
+publicados).
+
+Diff:
+
+    {"versao": 1,
+     "anterior": "planilha-antiga.xlsx", "atual": "planilha-nova.xlsx",
+     "abas": {"mao-obra-casa": {
+         "adicionados": [{"chave": ..., "preco": ...}],
+         "removidos":   [{"chave": ..., "preco": ...}],
+         "alterados":   [{"chave": ..., "anterior": ..., "atual": ..., "variacaoPercentual": 12.5}],
+         "secoes": ["cobertura", "revestimentos.parede"]}},
+     "secoesAfetadas": {"mao-obra-casa": ["cobertura", ...]}}
+
+Abas sem mudancas nao aparecem. "secoes" e a chave sem o campo (secao ou
+secao.subsecao). Como as duas listas estao ordenadas, a comparacao e um
+merge em uma unica passada: linear no tamanho do catalogo.
+"""
+
+import json
+
+VERSAO_SNAPSHOT = 1
+
+def ordenar_itens(itens):
+    """[(chave, preco)] ordenado por bytes da chave"""
+    return sorted(itens, key=lambda item: item[0].encode("utf-8"))
+
+def montar_snapshot(planilha, abas):
+    """abas: {tipo: [(chave, preco)]}"""
+    return {
+        "versao": VERSAO_SNAPSHOT,
+        "planilha": planilha,
+        "abas": {tipo: [list(item) for item in ordenar_itens(itens)] for tipo, itens in sorted(abas.items())},
+    }
+
+def snapshot_de_arquivo(dados, nome):
+    """Snapshot a partir de um snapshot ou de um ArquivoPrecos (data/precos-*.json)"""
+    if "abas" in dados:
+        return dados
+    itens = []
+    for secao, conteudo in (dados.get("secoes") or {}).items():
+        for campo, item in (conteudo.get("itens") or {}).items():
+            itens.append((f"{secao}.{campo}", item["preco"]))
+        for subsecao, sub in (conteudo.get("subSecoes") or {}).items():
+            for campo, item in (sub.get("itens") or {}).items():
+                itens.append((f"{secao}.{subsecao}.{campo}", item["preco"]))
+    return montar_snapshot(nome, {dados.get("tipo", nome): [item for item in itens if item[1] > 0]})
+
+def secao_da_chave(chave):
+    return chave.rsplit(".", 1)[0]
+
+def comparar_itens(anteriores, atuais):
+    """Compara duas listas [(chave, preco)] ordenadas por bytes da chave"""
+    adicionados, removidos, alterados = [], [], []
+    chaves_anteriores = [chave.encode("utf-8") for chave, _ in anteriores]
+    chaves_atuais = [chave.encode("utf-8") for chave, _ in atuais]
+    i = j = 0
+    while i < len(anteriores) or j < len(atuais):
+        if j == len(atuais) or (i < len(anteriores) and chaves_anteriores[i] < chaves_atuais[j]):
+            chave, preco = anteriores[i]
+            removidos.append({"chave": chave, "preco": preco})
+            i += 1
+        elif i == len(anteriores) or chaves_atuais[j] < chaves_anteriores[i]:
+            chave, preco = atuais[j]
+            adicionados.append({"chave": chave, "preco": preco})
+            j += 1
+        else:
+            chave, anterior = anteriores[i]
+            atual = atuais[j][1]
+            if atual != anterior:
+                variacao = round((atual - anterior) / anterior * 100, 2) if anterior else None
+                alterados.append({"chave": chave, "anterior": anterior, "atual": atual,
+                                  "variacaoPercentual": variacao})
+            i += 1
+            j += 1
+
+    secoes = sorted({secao_da_chave(item["chave"]) for item in adicionados + removidos + alterados})
+    return {"adicionados": adicionados, "removidos": removidos, "alterados": alterados, "secoes": secoes}
+
+def comparar_snapshots(anterior, atual):
+    """Diff (formato acima) entre dois snapshots; anterior pode ser None"""
+    anterior = anterior or {"abas": {}}
+    abas = {}
+    for tipo in sorted(set(anterior["abas"]) | set(atual["abas"])):
+        diff = comparar_itens(anterior["abas"].get(tipo, []), atual["abas"].get(tipo, []))
+        if diff["secoes"]:
+            abas[tipo] = diff
+    return {
+        "versao": VERSAO_SNAPSHOT,
+        "anterior": anterior.get("planilha"),
+        "atual": atual.get("planilha"),
+        "abas": abas,
+        "secoesAfetadas": {tipo: diff["secoes"] for tipo, diff in abas.items()},
+    }
+
+def resumir_diff(diff, limite=20):
+    """Linhas de texto com a contagem de mudancas por aba e ate limite precos alterados"""
+    if not diff["abas"]:
+        return ["Nenhuma mudanca de preco em relacao a extracao anterior."]
+    linhas = []
+    for tipo, mudancas in diff["abas"].items():
+        linhas.append(f"{tipo}: {len(mudancas['adicionados'])} adicionado(s), "
+                      f"{len(mudancas['removidos'])} removido(s), "
+                      f"{len(mudancas['alterados'])} com preco alterado")
+        for item in mudancas["alterados"][:limite]:
+            variacao = item["variacaoPercentual"]
+            texto = f"{variacao:+.2f}%" if variacao is not None else "novo preco"
+            linhas.append(f"  {item['chave']}: {item['anterior']} -> {item['atual']} ({texto})")
+        if len(mudancas["alterados"]) > limite:
+            linhas.append(f"  ... e mais {len(mudancas['alterados']) - limite}")
+    return linhas
+
+def serializar(dados):
+    return json.dumps(dados, indent=2, ensure_ascii=False) + "\n"
@@ -0,0 +1,37 @@
+"""
+Gravacao atomica dos arquivos gerados pelos scripts de extracao.
+
+Usado por scripts/extract-excel.py (saidas), scripts/cache_planilhas.py e
+scripts/respostas_api.py. O arquivo e escrito em um temporario no mesmo
+diretorio, sincronizado em disco e renomeado sobre o destino: leitores (o
+servidor, outras ferramentas) nunca veem meio arquivo. As permissoes sao as
+de um arquivo criado com open(): as do arquivo substituido ou 0666 menos a
+umask.
+"""
+
+import os
+import tempfile
+
+def escrever_atomico(caminho, dados):
+    """Grava bytes via arquivo temporario + rename"""
+    fd, temporario = tempfile.mkstemp(dir=caminho.parent, prefix=f".{caminho.name}.", suffix=".tmp")
+    try:
+        # mkstemp cria com 0600; mantem as permissoes de um arquivo criado com open()
+        try:
+            modo = caminho.stat().st_mode & 0o777
+        except OSError:
+            umask = os.umask(0)
+            os.umask(umask)
+            modo = 0o666 & ~umask
+        os.fchmod(fd, modo)
+        with os.fdopen(fd, "wb") as f:
+            f.write(dados)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporario, caminho)
+    except BaseException:
+        try:
+            os.unlink(temporario)
+        except OSError:
+            pass
+        raise
@@ -3,7 +3,13 @@
 Script para extrair precos do arquivo Excel e gerar arquivos TypeScript.
 Baseado na planilha "monte-sua-casa-simulacao.xlsx"
 
-Uso: python3 scripts/extract-excel.py
+Uso: python3 scripts/extract-excel.py [extract] [opcoes]
+     python3 scripts/extract-excel.py validate | diff | emit-types | historico | serve
+     python3 scripts/extract-excel.py COMANDO --help
+
+Sem comando, o padrao e extract. As abas lidas e os mapeamentos de
+codigo/descricao para campos ficam em scripts/mapeamentos-planilha.json; as
+opcoes de cada comando estao no --help.
 
 Este script le o arquivo Excel e gera:
 - src/lib/prices/orcamento-casa.ts (materiais da casa)
@@ -11,22 +17,33 @@ Este script le o arquivo Excel e gera:
 - src/lib/prices/types.ts (interfaces comuns)
 """
 
+import argparse
+import importlib.util
+import io
+import json
 import os
+import re
 import sys
+import time
+from contextlib import redirect_stdout
+from functools import cache, wraps
 from pathlib import Path
 from datetime import datetime
 
-try:
-    from openpyxl import load_workbook
-except ImportError:
-    print("ERRO: openpyxl nao encontrado. Instale com: pip install openpyxl")
-    sys.exit(1)
+from descricoes_planilha import SIMILARIDADE_MINIMA, CasadorDescricoes, normalizar_descricao
 
 # Caminhos
 SCRIPT_DIR = Path(__file__).parent
 PROJECT_ROOT = SCRIPT_DIR.parent.parent
 EXCEL_FILE = PROJECT_ROOT / "monte-sua-casa-simulacao.xlsx"
 PRICES_DIR = SCRIPT_DIR.parent / "src" / "lib" / "prices"
+CACHE_DIR = SCRIPT_DIR.parent / ".cache" / "extract-excel"
+DATA_DIR = SCRIPT_DIR.parent / "data"
+MAPEAMENTOS_FILE = SCRIPT_DIR / "mapeamentos-planilha.json"
+CONFIGURACOES_FILE = DATA_DIR / "configuracoes.json"
+STATIC_DATA_FILE = SCRIPT_DIR.parent / "src" / "lib" / "static-data.ts"
+SNAPSHOT_FILE = CACHE_DIR / "ultima-extracao.json"
+HISTORICO_FILE = DATA_DIR / "historico-precos.sqlite"
 
 # Constantes da planilha
 FATOR_AJUSTE_MATERIAIS = 0.0079  # 0.79%
@@ -47,360 +64,466 @@ def safe_str(value, default=""):
         return default
     return str(value).strip()
 
-def extract_orcamento_casa(ws):
-    """Extrai dados da aba ORCAMENTO - CASA"""
-
-    # Estrutura para armazenar os precos
-    precos = {
-        "movimentoTerra": {},
-        "baldrameAlvenaria": {},
-        "fundacoesEstruturas": {},
-        "esquadriasFerragens": {},
-        "cobertura": {},
-        "revestimentos": {
-            "parede": {},
-            "teto": {},
-            "pisos": {}
-        },
-        "instalacaoHidraulica": {},
-        "instalacaoSanitaria": {},
-        "instalacaoEletrica": {},
-        "gasGlp": {},
-        "pintura": {},
-        "churrasqueira": {},
-        "limpezaObra": {}
-    }
-
-    # Mapeamento de codigos para campos TypeScript
-    mapeamento = {
-        # 3.1 MOVIMENTO DE TERRA
-        "3.1.1": ("movimentoTerra", "escavacaoValasBaldrame", None),
-        "3.1.2": ("movimentoTerra", "escavacaoFundacao60x60", None),
-        "3.1.3": ("movimentoTerra", "reterroCompactacao", None),
-        "3.1.4": ("movimentoTerra", "espalhamentoBase", None),
-        "3.1.5": ("movimentoTerra", "apiloamentoFundoVala", None),
-
-        # 3.2 BALDRAME E ALVENARIA
-        "3.2.1": ("baldrameAlvenaria", "alvenariaPedraArgamassada", None),
-        "3.2.2": ("baldrameAlvenaria", "cintaConcretoArmado", None),
-        "3.2.3": ("baldrameAlvenaria", "impermeabilizacaoBaldrame", None),
-        "3.2.4": ("baldrameAlvenaria", "alvenariaTijoloFurado", None),
-
-        # 3.3 FUNDACOES E ESTRUTURAS
-        "3.3.1": ("fundacoesEstruturas", "concretoPilaresVigas", None),
-        "3.3.2": ("fundacoesEstruturas", "formaDesforma", None),
-        "3.3.3": ("fundacoesEstruturas", "armaduraCA50", None),
-        "3.3.4": ("fundacoesEstruturas", "lancamentoConcreto", None),
-        "3.3.5": ("fundacoesEstruturas", "lajePrefabricada", None),
-
-        # 3.4 ESQUADRIAS E FERRAGENS
-        "3.4.1": ("esquadriasFerragens", "portaEntradaDecorativa", None),
-        "3.4.2": ("esquadriasFerragens", "portaMadeiraLei", None),
-        "3.4.3": ("esquadriasFerragens", "janelaAluminio", None),  # Aluminio e vidro
-        "3.4.4": ("esquadriasFerragens", "cobogoAntiChuva", None),
-
-        # 3.5 COBERTURA
-        "3.5.1": ("cobertura", "cobertaPadrao", None),
-
-        # 3.6.1 REVESTIMENTOS - PAREDE
-        "3.6.1.1": ("revestimentos", "chapiscoCimentoAreia", "parede"),
-        "3.6.1.2": ("revestimentos", "rebocoCimentoAreia", "parede"),
-        "3.6.1.3": ("revestimentos", "embocoCimentoAreia", "parede"),
-        "3.6.1.4": ("revestimentos", "revestimentoCeramico", "parede"),
-        "3.6.1.13": ("revestimentos", "rejuntamentoPorcelanato", "parede"),
-        "3.6.1.14": ("revestimentos", "bancadaCozinhaPorcelanato", "parede"),
-
-        # 3.6.2 REVESTIMENTOS - TETO
-        "3.6.2.1": ("revestimentos", "gessoConvencionalForro", "teto"),
-
-        # 3.6.3 REVESTIMENTOS - PISOS
-        "3.6.3.1": ("revestimentos", "concretoNaoEstruturalLastro", "pisos"),
-        "3.6.3.2": ("revestimentos", "regularizacaoBase", "pisos"),
-        "3.6.3.3": ("revestimentos", "revestimentoCeramico", "pisos"),
-        "3.6.3.28": ("revestimentos", "rejuntamentoPorcelanato", "pisos"),
-        "3.6.3.29": ("revestimentos", "soleirasGranito", "pisos"),
-
-        # 3.7 INSTALACAO HIDRAULICA
-        "3.7.1": ("instalacaoHidraulica", "tuboPVC50mm", None),
-        "3.7.2": ("instalacaoHidraulica", "tuboPVC32mm", None),
-        "3.7.3": ("instalacaoHidraulica", "tuboPVC25mm", None),
-        "3.7.4": ("instalacaoHidraulica", "caixaDagua1500L", None),
-        "3.7.5": ("instalacaoHidraulica", "flange2pol", None),
-        "3.7.6": ("instalacaoHidraulica", "flange1pol", None),
-        "3.7.7": ("instalacaoHidraulica", "registroGaveta", None),
-        "3.7.8": ("instalacaoHidraulica", "registroGavetaCanopla", None),
-        "3.7.9": ("instalacaoHidraulica", "registroPressaoChuveiro", None),
-        "3.7.10": ("instalacaoHidraulica", "boiaMecanica", None),
-        "3.7.11": ("instalacaoHidraulica", "torneiraMetal", None),
-        "3.7.12": ("instalacaoHidraulica", "bancadaGranitoLavatorio", None),
-        "3.7.13": ("instalacaoHidraulica", "baciaSanitaria", None),
-        "3.7.14": ("instalacaoHidraulica", "chuveiroArticulado", None),
-        "3.7.15": ("instalacaoHidraulica", "bancadaGranitoCozinha", None),
-        "3.7.17": ("instalacaoHidraulica", "tanqueInox", None),
-
-        # 3.8 INSTALACAO SANITARIA
-        "3.8.1": ("instalacaoSanitaria", "caixaInspecao60x60", None),
-        "3.8.2": ("instalacaoSanitaria", "tuboPVCEsgoto100mm", None),
-        "3.8.3": ("instalacaoSanitaria", "tuboPVCEsgoto75mm", None),
-        "3.8.5": ("instalacaoSanitaria", "tuboPVCEsgoto50mm", None),
-        "3.8.6": ("instalacaoSanitaria", "raloSifonado", None),
-
-        # 3.9 INSTALACAO ELETRICA
-        "3.9.1": ("instalacaoEletrica", "quadroDistribuicao12", None),
-        "3.9.2": ("instalacaoEletrica", "eletrodutoRigido32mm", None),
-        "3.9.3": ("instalacaoEletrica", "eletrodutoFlexivel", None),
-        "3.9.4": ("instalacaoEletrica", "caixaLigacaoPVC4x4", None),
-        "3.9.5": ("instalacaoEletrica", "caixaLigacaoPVC4x2", None),
-        "3.9.6": ("instalacaoEletrica", "caboIsoladoPVC1_5mm", None),
-        "3.9.7": ("instalacaoEletrica", "caboIsoladoPVC2_5mm", None),
-        "3.9.8": ("instalacaoEletrica", "caboIsoladoPVC4mm", None),
-        "3.9.9": ("instalacaoEletrica", "caboIsoladoPVC10mm", None),
-        "3.9.10": ("instalacaoEletrica", "disjuntor15A", None),
-        "3.9.11": ("instalacaoEletrica", "disjuntor20A", None),
-        "3.9.12": ("instalacaoEletrica", "disjuntor32A", None),
-        "3.9.13": ("instalacaoEletrica", "disjuntor50A", None),
-        "3.9.14": ("instalacaoEletrica", "hasteCobre", None),
-        "3.9.15": ("instalacaoEletrica", "interruptorTriplo", None),
-        "3.9.16": ("instalacaoEletrica", "interruptorDuplo", None),
-        "3.9.18": ("instalacaoEletrica", "interruptorCampainha", None),
-        "3.9.19": ("instalacaoEletrica", "tomadaTripla", None),
-        "3.9.20": ("instalacaoEletrica", "pontoLogica", None),
-        "3.9.21": ("instalacaoEletrica", "pontoTV", None),
-        "3.9.22": ("instalacaoEletrica", "luminariaLED", None),
-
-        # 3.10 GAS GLP
-        "3.10.1": ("gasGlp", "tuboCobre15mm", None),
-        "3.10.2": ("gasGlp", "testeEstanqueidade", None),
-
-        # 3.11 PINTURA
-        "3.11.2": ("pintura", "texturaExterna", None),
-        "3.11.4": ("pintura", "emassamento", None),
-        "3.11.5": ("pintura", "pinturaLatexPVA", None),
-        "3.11.6": ("pintura", "seladorMadeira", None),
-        "3.11.7": ("pintura", "esmalteSintetico", None),
-
-        # 3.12 CHURRASQUEIRA
-        "3.12.1": ("churrasqueira", "churrasqueiraMediaPorte", None),
-
-        # 3.13 LIMPEZA DA OBRA
-        "3.13.1": ("limpezaObra", "containers", None),
-        "3.13.2": ("limpezaObra", "transporteHorizontal", None),
-        "3.13.3": ("limpezaObra", "limpezaGeral", None),
-    }
+class Instrumentacao:
+    """Coleta de metricas opcional (--metricas)
 
-    # Percorre as linhas da planilha
-    for row in ws.iter_rows(min_row=7, max_row=150):
-        codigo = safe_str(row[1].value)  # Coluna B (indice 1)
-        preco_base = safe_float(row[7].value)  # Coluna H (indice 7)
+    Registra tempo de relogio e de CPU de cada etapa, linhas lidas e itens
+    extraidos por aba, chaves do mapeamento sem correspondencia, bytes por
+    secao dos arquivos TypeScript e pico de memoria. Os eventos sao emitidos
+    como linhas JSON ou em um textfile no formato do Prometheus.
+    """
 
-        if codigo in mapeamento and preco_base > 0:
-            secao, campo, subsecao = mapeamento[codigo]
+    def __init__(self):
+        self.eventos = []
+        self.planilha = None
+
+    def executar(self, nome, funcao, args, kwargs, mapeamento, conta_linhas):
+        contador = [0]
+        if conta_linhas and args:
+            args = (self._contar(args[0], contador),) + tuple(args[1:])
+        inicio, inicio_cpu = time.perf_counter(), time.process_time()
+        resultado = funcao(*args, **kwargs)
+        evento = {
+            "evento": "etapa",
+            "etapa": nome,
+            "planilha": self.planilha,
+            "segundos": round(time.perf_counter() - inicio, 6),
+            "cpu_segundos": round(time.process_time() - inicio_cpu, 6),
+        }
+        if conta_linhas:
+            evento["linhas_lidas"] = contador[0]
+            evento["itens_extraidos"] = contar_itens(resultado)
+        if mapeamento is not None:
+            evento["chaves_sem_correspondencia"] = chaves_sem_correspondencia(mapeamento, resultado)
+        self.eventos.append(evento)
+        return resultado
+
+    @staticmethod
+    def _contar(linhas, contador):
+        for linha in linhas:
+            contador[0] += 1
+            yield linha
+
+    def registrar_tamanhos(self, tamanhos):
+        """tamanhos: {arquivo .ts: {secao: bytes}} (ver gerar_saidas)"""
+        for arquivo, secoes in tamanhos.items():
+            for secao, total in secoes.items():
+                self.eventos.append({"evento": "tamanho", "planilha": self.planilha, "arquivo": arquivo,
+                                     "secao": secao, "bytes": total})
+
+    def finalizar(self):
+        self.eventos.append({"evento": "resumo", "planilha": self.planilha, "pico_rss_kb": pico_rss_kb()})
+
+    def como_jsonl(self):
+        return "".join(json.dumps(e, ensure_ascii=False) + "\n" for e in self.eventos)
+
+    def como_prometheus(self):
+        """Textfile para o node_exporter (textfile collector)"""
+        def rotulos(**valores):
+            pares = [f'{k}="{v}"' for k, v in valores.items() if v is not None]
+            return "{" + ",".join(pares) + "}" if pares else ""
+
+        linhas = []
+        metricas = [
+            ("extrator_etapa_segundos", "gauge", "Tempo de relogio por etapa"),
+            ("extrator_etapa_cpu_segundos", "gauge", "Tempo de CPU por etapa"),
+            ("extrator_linhas_lidas", "gauge", "Linhas lidas por aba"),
+            ("extrator_itens_extraidos", "gauge", "Itens com preco extraidos por aba"),
+            ("extrator_chaves_sem_correspondencia", "gauge", "Chaves do mapeamento sem item na planilha"),
+            ("extrator_pico_rss_bytes", "gauge", "Pico de memoria residente"),
+            ("extrator_ts_secao_bytes", "gauge", "Bytes emitidos por secao nos arquivos TypeScript"),
+        ]
+        # Etapas repetidas (ex.: um JSON por aba) sao somadas: cada serie deve ser unica
+        valores = {nome: {} for nome, _, _ in metricas}
+
+        def somar(nome, r, valor):
+            valores[nome][r] = valores[nome].get(r, 0) + valor
+
+        for e in self.eventos:
+            if e["evento"] == "etapa":
+                r = rotulos(etapa=e["etapa"], planilha=e["planilha"])
+                somar("extrator_etapa_segundos", r, e["segundos"])
+                somar("extrator_etapa_cpu_segundos", r, e["cpu_segundos"])
+                if "linhas_lidas" in e:
+                    somar("extrator_linhas_lidas", r, e["linhas_lidas"])
+                    somar("extrator_itens_extraidos", r, e["itens_extraidos"])
+                if "chaves_sem_correspondencia" in e:
+                    somar("extrator_chaves_sem_correspondencia", r, len(e["chaves_sem_correspondencia"]))
+            elif e["evento"] == "tamanho":
+                somar("extrator_ts_secao_bytes",
+                      rotulos(arquivo=e["arquivo"], secao=e["secao"], planilha=e["planilha"]), e["bytes"])
+            elif e["evento"] == "resumo" and e["pico_rss_kb"] is not None:
+                somar("extrator_pico_rss_bytes", rotulos(planilha=e["planilha"]), e["pico_rss_kb"] * 1024)
+        for nome, tipo, ajuda in metricas:
+            if valores[nome]:
+                linhas.append(f"# HELP {nome} {ajuda}")
+                linhas.append(f"# TYPE {nome} {tipo}")
+                linhas += [f"{nome}{r} {round(v, 6)}" for r, v in valores[nome].items()]
+        return "\n".join(linhas) + "\n"
+
+# Instrumentacao ativa; None (padrao) executa as etapas sem nenhum custo extra
+_instrumentacao = None
+
+def ativar_instrumentacao():
+    global _instrumentacao
+    _instrumentacao = Instrumentacao()
+    return _instrumentacao
+
+def medido(nome=None, mapeamento=None, conta_linhas=False):
+    """Decorador que mede a etapa quando a instrumentacao esta ativa
+
+    Nao altera argumentos nem retorno; conta_linhas conta as linhas consumidas
+    do iteravel passado como primeiro argumento.
+    """
+    def decorador(funcao):
+        nome_etapa = nome or funcao.__name__
+
+        @wraps(funcao)
+        def envolvida(*args, **kwargs):
+            if _instrumentacao is None:
+                return funcao(*args, **kwargs)
+            return _instrumentacao.executar(nome_etapa, funcao, args, kwargs, mapeamento, conta_linhas)
+        return envolvida
+    return decorador
+
+def pico_rss_kb():
+    """Pico de memoria residente do processo em KB (None fora de sistemas Unix)"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # No macOS ru_maxrss vem em bytes
+    return pico // 1024 if sys.platform == "darwin" else pico
+
+def chaves_sem_correspondencia(mapeamento, precos):
+    """Chaves do mapeamento cujo campo nao recebeu preco"""
+    faltando = []
+    for chave, (secao, campo, subsecao) in mapeamento.items():
+        destino = precos.get(secao, {})
+        if subsecao:
+            destino = destino.get(subsecao, {})
+        if not destino.get(campo):
+            faltando.append(chave)
+    return faltando
+
+@medido("load_workbook")
+def abrir_workbook(caminho):
+    """Abre a planilha em modo somente leitura (as abas sao lidas sob demanda)"""
+    # Importado aqui: comandos que nao abrem planilhas nao pagam o import do openpyxl
+    from openpyxl import load_workbook
 
-            if subsecao:
-                if secao == "revestimentos":
-                    precos[secao][subsecao][campo] = preco_base
-            else:
-                precos[secao][campo] = preco_base
+    return load_workbook(caminho, read_only=True, data_only=True)
+
+# Textos que identificam a linha de cabecalho nas colunas B/H
+MARCADORES_CABECALHO = ("DESCRI", "PRECO", "PREÇO", "UNITARIO", "UNITÁRIO", "CODIGO", "CÓDIGO")
+# Linhas do topo da aba em que o cabecalho e procurado
+LIMITE_BUSCA_CABECALHO = 30
+
+def eh_cabecalho(coluna_b, coluna_h):
+    """Indica se a linha e o cabecalho da tabela (ex.: "ITEM" / "PREÇO UNITÁRIO")"""
+    for valor in (coluna_b, coluna_h):
+        if isinstance(valor, str):
+            texto = valor.strip().upper()
+            if texto == "ITEM" or any(marcador in texto for marcador in MARCADORES_CABECALHO):
+                return True
+    return False
+
+def iterar_linhas(ws, min_row, max_row=None, extras=(), limites=None, formulas=None):
+    """Percorre a aba em streaming retornando (linha, coluna B, coluna H, *extras)
+
+    Usa values_only para nao materializar objetos de celula; apenas as
+    colunas B..H (ou ate a ultima coluna extra pedida, ex.: ("C", "F"))
+    sao decodificadas. O intervalo de dados e os limites vem de
+    delimitar_linhas. formulas recebe as linhas numeradas e completa as
+    formulas sem valor em cache (FontePlanilha).
+    """
+    from openpyxl.utils import column_index_from_string
+
+    indices_extras = [column_index_from_string(coluna) - 2 for coluna in extras]
+    max_col = max([8] + [indice + 2 for indice in indices_extras])
+    linhas = ws.iter_rows(min_row=1, max_row=max_row, min_col=2, max_col=max_col, values_only=True)
+    numeradas = ((numero, valores[0], valores[6], *(valores[i] for i in indices_extras))
+                 for numero, valores in enumerate(linhas, start=1))
+    if formulas is not None:
+        numeradas = formulas(numeradas)
+    return delimitar_linhas(numeradas, min_row, limites)
+
+def delimitar_linhas(linhas, min_row, limites=None):
+    """Filtra as linhas (linha, coluna B, coluna H, *extras) de uma aba, em ordem
+
+    O intervalo de dados e descoberto na mesma passada: os dados comecam logo
+    apos a linha de cabecalho (ou em min_row, se nenhum cabecalho for
+    encontrado) e vao ate a ultima linha gravada na aba, sem limite fixo.
+    Linhas com B e H vazias nao sao repassadas ao extrator. Se limites for
+    um dict, recebe a linha do cabecalho, a primeira e a ultima linha com
+    dados e as linhas de secao (texto em B sem preco em H).
+    """
+    if limites is None:
+        limites = {}
+    limites.update({"cabecalho": None, "primeira": None, "ultima": None, "secoes": []})
+
+    inicio = None
+    for linha in linhas:
+        numero, coluna_b, coluna_h = linha[0], linha[1], linha[2]
+        vazia_b = coluna_b is None or coluna_b == ""
+        vazia_h = coluna_h is None or coluna_h == ""
+
+        if inicio is None:
+            # Procura o cabecalho ate a primeira linha de dados
+            if numero <= LIMITE_BUSCA_CABECALHO and eh_cabecalho(coluna_b, coluna_h):
+                limites["cabecalho"] = numero
+                inicio = numero + 1
+                continue
+            if numero < min_row or (vazia_b and vazia_h):
+                continue
+            inicio = min_row
+
+        if vazia_b and vazia_h:
+            continue
 
-    return precos
+        if limites["primeira"] is None:
+            limites["primeira"] = numero
+        limites["ultima"] = numero
+        if not vazia_b and vazia_h and isinstance(coluna_b, str):
+            limites["secoes"].append((numero, coluna_b.strip()))
 
-def extract_mao_obra_casa(ws):
-    """Extrai dados da aba MAO DE OBRA - CASA
+        yield linha
 
-    Estrutura desta aba e diferente: usa descricao direta na coluna B
-    em vez de codigos numericos como 3.1.1
-    """
+def chave_plana(secao, campo, subsecao=None):
+    """Chave "secao.campo" ou "secao.subsecao.campo" (snapshots, tabelas e validacao)"""
+    return f"{secao}.{subsecao}.{campo}" if subsecao else f"{secao}.{campo}"
 
-    precos = {
-        "movimentoTerra": {},
-        "baldrameAlvenaria": {},
-        "fundacoesEstruturas": {},
-        "esquadriasFerragens": {},
-        "cobertura": {},
-        "revestimentos": {
-            "parede": {},
-            "teto": {},
-            "pisos": {}
-        },
-        "instalacaoHidraulica": {},
-        "instalacaoSanitaria": {},
-        "instalacaoEletrica": {},
-        "gasGlp": {},
-        "pintura": {},
-        "churrasqueira": {},
-        "limpezaObra": {}
-    }
+class RegistroAba:
+    """Mapeamento de uma aba da planilha, compilado de mapeamentos-planilha.json
 
-    # Mapeamento de descricoes para campos TypeScript
-    # Normalizado para lowercase e sem acentos para comparacao
-    mapeamento_mo = {
-        # 3.1 MOVIMENTO DE TERRA
-        "escavacao manual de valas": ("movimentoTerra", "escavacaoValasBaldrame", None),
-        "escavacao manual de fundacao": ("movimentoTerra", "escavacaoFundacao60x60", None),
-        "reterro manual": ("movimentoTerra", "reterroCompactacao", None),
-        "espalhamento e adensamento": ("movimentoTerra", "espalhamentoBase", None),
-        "apiloamento de fundo": ("movimentoTerra", "apiloamentoFundoVala", None),
-
-        # 3.2 BALDRAME E ALVENARIA
-        "alvenaria de pedra argamassada": ("baldrameAlvenaria", "alvenariaPedraArgamassada", None),
-        "cinta em concreto armado": ("baldrameAlvenaria", "cintaConcretoArmado", None),
-        "impermeabilizacao de baldrame": ("baldrameAlvenaria", "impermeabilizacaoBaldrame", None),
-        "alvenaria em tijolo furado": ("baldrameAlvenaria", "alvenariaTijoloFurado", None),
-
-        # 3.3 FUNDACOES E ESTRUTURAS
-        "concreto em pilares": ("fundacoesEstruturas", "concretoPilaresVigas", None),
-        "forma e desforma": ("fundacoesEstruturas", "formaDesforma", None),
-        "armadura ca 50": ("fundacoesEstruturas", "armaduraCA50", None),
-        "lancamento e aplicacao": ("fundacoesEstruturas", "lancamentoConcreto", None),
-        "lajes pre-fabricada": ("fundacoesEstruturas", "lajePrefabricada", None),
-
-        # 3.4 ESQUADRIAS E FERRAGENS
-        "porta de entrada decorativa": ("esquadriasFerragens", "portaEntradaDecorativa", None),
-        "porta de madeira de lei": ("esquadriasFerragens", "portaMadeiraLei", None),
-        "esquadria de aluminio": ("esquadriasFerragens", "janelaAluminio", None),
-        "cobogo": ("esquadriasFerragens", "cobogoAntiChuva", None),
-
-        # 3.5 COBERTURA
-        "coberta de acordo com briefing": ("cobertura", "cobertaPadrao", None),
-
-        # 3.6.1 REVESTIMENTOS - PAREDE
-        "chapisco traco cimento e areia": ("revestimentos", "chapiscoCimentoAreia", "parede"),
-        "reboco cimento e areia": ("revestimentos", "rebocoCimentoAreia", "parede"),
-        "emboco cimento e areia": ("revestimentos", "embocoCimentoAreia", "parede"),
-        "bancada da cozinha": ("revestimentos", "bancadaCozinhaPorcelanato", "parede"),
-
-        # 3.6.2 REVESTIMENTOS - TETO
-        "gesso convencional para forro": ("revestimentos", "gessoConvencionalForro", "teto"),
-
-        # 3.6.3 REVESTIMENTOS - PISOS
-        "concreto nao estrutural": ("revestimentos", "concretoNaoEstruturalLastro", "pisos"),
-        "regularizacao de base": ("revestimentos", "regularizacaoBase", "pisos"),
-        "soleiras de granito": ("revestimentos", "soleirasGranito", "pisos"),
-
-        # 3.7 INSTALACAO HIDRAULICA
-        "tubo soldavel em pvc 25mm": ("instalacaoHidraulica", "tuboPVC25mm", None),
-        "tubo soldavel em pvc 32mm": ("instalacaoHidraulica", "tuboPVC32mm", None),
-        "tubo soldavel em pvc 50mm": ("instalacaoHidraulica", "tuboPVC50mm", None),
-        "caixa d'agua": ("instalacaoHidraulica", "caixaDagua1500L", None),
-        "flange 2": ("instalacaoHidraulica", "flange2pol", None),
-        "flange de 1": ("instalacaoHidraulica", "flange1pol", None),
-        "registro bruto de gaveta": ("instalacaoHidraulica", "registroGaveta", None),
-        "registro de gaveta c/ canopla": ("instalacaoHidraulica", "registroGavetaCanopla", None),
-        "registro de presao para chuveiro": ("instalacaoHidraulica", "registroPressaoChuveiro", None),
-        "boia mecanica": ("instalacaoHidraulica", "boiaMecanica", None),
-        "torneira para jardim": ("instalacaoHidraulica", "torneiraMetal", None),
-        "bancada de granito para lavatorio": ("instalacaoHidraulica", "bancadaGranitoLavatorio", None),
-        "bacia sanitaria": ("instalacaoHidraulica", "baciaSanitaria", None),
-        "ducha higienica": ("instalacaoHidraulica", "duchaHigienica", None),
-        "chuveiro articulado": ("instalacaoHidraulica", "chuveiroArticulado", None),
-        "bancada em granito p/ pia de cozinha": ("instalacaoHidraulica", "bancadaGranitoCozinha", None),
-        "tanque de inox": ("instalacaoHidraulica", "tanqueInox", None),
-
-        # 3.8 INSTALACAO SANITARIA
-        "caixa de inspecao em alvenaria": ("instalacaoSanitaria", "caixaInspecao60x60", None),
-        "tubo e conexao em pvc para esgoto 100mm": ("instalacaoSanitaria", "tuboPVCEsgoto100mm", None),
-        "tubo e conexao em pvc para esgoto 75mm": ("instalacaoSanitaria", "tuboPVCEsgoto75mm", None),
-        "tubo e conexao em pvc para esgoto 50mm": ("instalacaoSanitaria", "tuboPVCEsgoto50mm", None),
-        "ralo sofonado": ("instalacaoSanitaria", "raloSifonado", None),
-
-        # 3.9 INSTALACAO ELETRICA
-        "quadro de distribuicao": ("instalacaoEletrica", "quadroDistribuicao12", None),
-        "eletroduto rigido": ("instalacaoEletrica", "eletrodutoRigido32mm", None),
-        "eletroduto flexivel": ("instalacaoEletrica", "eletrodutoFlexivel", None),
-        "caixa de ligacao em pvc rigido 4x4": ("instalacaoEletrica", "caixaLigacaoPVC4x4", None),
-        "caixa de ligacao em pvc rigido 4x2": ("instalacaoEletrica", "caixaLigacaoPVC4x2", None),
-        "cabo isolado pvc, 750 v, - 1,5mm": ("instalacaoEletrica", "caboIsoladoPVC1_5mm", None),
-        "cabo isolado pvc, 750 v, - 2,5mm": ("instalacaoEletrica", "caboIsoladoPVC2_5mm", None),
-        "cabo isolado pvc, 750 v, - 4,0mm": ("instalacaoEletrica", "caboIsoladoPVC4mm", None),
-        "cabo isolado pvc, 750 v, - 10": ("instalacaoEletrica", "caboIsoladoPVC10mm", None),
-        "disjuntores 15a": ("instalacaoEletrica", "disjuntor15A", None),
-        "disjuntor 20a": ("instalacaoEletrica", "disjuntor20A", None),
-        "disjuntores 32a": ("instalacaoEletrica", "disjuntor32A", None),
-        "disjuntor de 50a": ("instalacaoEletrica", "disjuntor50A", None),
-        "haste de cobre": ("instalacaoEletrica", "hasteCobre", None),
-        "interruptor triplo": ("instalacaoEletrica", "interruptorTriplo", None),
-        "interruptor duplo": ("instalacaoEletrica", "interruptorDuplo", None),
-        "interruptos para capainha": ("instalacaoEletrica", "interruptorCampainha", None),
-        "tomada tripla": ("instalacaoEletrica", "tomadaTripla", None),
-        "ponto de logica": ("instalacaoEletrica", "pontoLogica", None),
-        "ponto de televisao": ("instalacaoEletrica", "pontoTV", None),
-        "luminaria de led": ("instalacaoEletrica", "luminariaLED", None),
-
-        # 3.10 GAS GLP
-        "tubo de cobre d=15mm": ("gasGlp", "tuboCobre15mm", None),
-        "teste de estanqueidade": ("gasGlp", "testeEstanqueidade", None),
-
-        # 3.11 PINTURA
-        "textura duas demaos externa": ("pintura", "texturaExterna", None),
-        "emassamento duas demaos": ("pintura", "emassamento", None),
-        "latex interno duas demaos": ("pintura", "pinturaLatexPVA", None),
-        "selador em madeira": ("pintura", "seladorMadeira", None),
-        "esmalte sintetico duas demaos": ("pintura", "esmalteSintetico", None),
-
-        # 3.12 CHURRASQUEIRA
-        "churrasqueira medio porte": ("churrasqueira", "churrasqueiraMediaPorte", None),
-
-        # 3.13 LIMPEZA DA OBRA
-        "transporte horizontal": ("limpezaObra", "transporteHorizontal", None),
-        "limpeza geral": ("limpezaObra", "limpezaGeral", None),
-    }
+    itens: {chave: (secao, campo, subsecao)}. Em abas com chave "codigo" a
+    chave e o codigo da coluna B (ex.: "3.1.1"), consultado direto no dict;
+    com chave "descricao" e um trecho da descricao normalizada, procurado por
+    um CasadorDescricoes construido aqui, uma unica vez (exato e, sem chave
+    contida na descricao, aproximado a partir de "similaridade_minima").
+    obrigatorias: chaves planas que a validacao cobra mesmo sem estarem
+    publicadas em data/ (ver carregar_indice_esperado).
+    """
 
-    # Seção atual para tratar revestimentos ceramico e rejuntamento
-    secao_revestimento_atual = None
+    def __init__(self, dados, origem):
+        self.aba = dados["aba"]
+        self.nomes = (self.aba, *dados.get("nomes_alternativos", []))
+        # Rotulo sem acentos usado nas mensagens
+        self.rotulo = self.nomes[1] if len(self.nomes) > 1 else self.aba
+        self.tipo = dados["tipo"]
+        self.arquivo = dados["arquivo"]
+        self.linha_inicial = dados.get("linha_inicial", 7)
+        self.chave = dados["chave"]
+        self.colunas = dados["colunas"]
+        self.bdi_percentual = dados.get("bdi_percentual", BDI_PERCENTUAL)
+        self.secoes = dados["secoes"]
+        self.subsecoes = dados.get("subsecoes", {})
+
+        def erro(mensagem):
+            return ValueError(f"{origem}: aba '{self.aba}': {mensagem}")
+
+        if self.chave not in ("codigo", "descricao"):
+            raise erro(f"chave desconhecida '{self.chave}' (use codigo ou descricao)")
+        if self.colunas.get("B") != self.chave or self.colunas.get("H") != "preco":
+            raise erro(f"a coluna B deve ser '{self.chave}' e a coluna H 'preco'")
+
+        self.itens = {}
+        for chave, destino in dados["itens"].items():
+            secao, campo, subsecao = (list(destino) + [None])[:3]
+            if secao not in self.secoes:
+                raise erro(f"item '{chave}' usa secao desconhecida '{secao}'")
+            if bool(subsecao) != (secao in self.subsecoes) or \
+                    (subsecao and subsecao not in self.subsecoes[secao]):
+                raise erro(f"item '{chave}' usa subsecao invalida '{subsecao}' em '{secao}'")
+            if self.chave == "descricao":
+                chave = normalizar_descricao(chave)
+            self.itens[chave] = (secao, campo, subsecao)
+        # Chaves "secao.campo"/"secao.subsecao.campo" que a planilha deve trazer
+        # mesmo antes de publicadas (opt-in: nem todo destino existe em toda planilha)
+        self.obrigatorias = frozenset(dados.get("obrigatorias", []))
+        invalidas = sorted(chave for chave in self.obrigatorias
+                           if chave.split(".", 1)[0] not in self.secoes)
+        if invalidas:
+            raise erro(f"obrigatorias com secao desconhecida: {', '.join(invalidas)}")
+
+        # Colunas lidas apenas para a saida JSON: descricao (se nao for a B) e
+        # unidade, cada uma opcional; _posicao_extra diz onde cada papel vem nas linhas
+        letras = {papel: letra for letra, papel in self.colunas.items()
+                  if papel in ("descricao", "unidade") and letra != "B"}
+        papeis = [papel for papel in ("descricao", "unidade") if papel in letras]
+        self.extras = tuple(letras[papel] for papel in papeis)
+        self._posicao_extra = {papel: indice for indice, papel in enumerate(papeis)}
+
+        similaridade_minima = dados.get("similaridade_minima", SIMILARIDADE_MINIMA)
+        if not 0 < similaridade_minima <= 1:
+            raise erro(f"similaridade_minima deve estar entre 0 e 1 (recebido {similaridade_minima})")
+        self.matcher = CasadorDescricoes(self.itens, similaridade_minima) if self.chave == "descricao" else None
+
+        # Itens que dependem da subsecao corrente (linhas "Parede"/"Teto"/"Pisos")
+        por_subsecao = dados.get("itens_por_subsecao") or {}
+        self.secao_marcadores = por_subsecao.get("secao")
+        self.marcadores = {normalizar_descricao(k): v for k, v in por_subsecao.get("marcadores", {}).items()}
+        itens_subsecao = {normalizar_descricao(k): v for k, v in por_subsecao.get("itens", {}).items()}
+        self.itens_subsecao = itens_subsecao
+        self.matcher_subsecao = CasadorDescricoes(itens_subsecao, similaridade_minima) if itens_subsecao else None
+        if por_subsecao and set(self.marcadores.values()) - set(self.subsecoes.get(self.secao_marcadores, {})):
+            raise erro("itens_por_subsecao usa subsecoes que nao existem na secao")
+
+        self.extrator = medido(f"extract:{self.tipo}", mapeamento=self.itens, conta_linhas=True)(self.extrair)
+
+    def nome_na_planilha(self, sheetnames):
+        """Nome com que a aba aparece na planilha (com ou sem acentos), ou None"""
+        return next((nome for nome in self.nomes if nome in sheetnames), None)
+
+    def estrutura_vazia(self):
+        return {
+            secao: {sub: {} for sub in self.subsecoes[secao]} if secao in self.subsecoes else {}
+            for secao in self.secoes
+        }
+
+    def extrair(self, linhas, detalhes=None, diagnostico=None):
+        """Extrai os precos das linhas (linha, coluna B, coluna H, *extras)
+
+        As linhas vem de iterar_linhas. Se detalhes for um dict, recebe
+        (descricao, unidade) de cada item extraido, indexado por
+        (secao, subsecao, campo). Se diagnostico for um dict, recebe
+        "zerados" (chaves mapeadas cujas linhas tem preco <= 0),
+        "nao_mapeados" ([(linha, texto)] com preco e sem mapeamento),
+        "aproximados" ([(linha, texto, chave, similaridade)] casados sem a
+        chave exata) e "ambiguos" ([(linha, texto, chave, concorrentes)]).
+        """
+        if diagnostico is not None:
+            diagnostico.update(zerados=set(), nao_mapeados=[], aproximados=[], ambiguos=[])
+        if self.chave == "codigo":
+            return self._extrair_por_codigo(linhas, detalhes, diagnostico)
+        return self._extrair_por_descricao(linhas, detalhes, diagnostico)
+
+    def _extra(self, extras, papel):
+        """Valor da coluna extra com esse papel, ou "" se o mapeamento nao a declara"""
+        indice = self._posicao_extra.get(papel)
+        return "" if indice is None else safe_str(extras[indice])
+
+    def _extrair_por_codigo(self, linhas, detalhes, diagnostico=None):
+        precos = self.estrutura_vazia()
+        itens = self.itens
+
+        for linha, coluna_b, coluna_h, *extras in linhas:
+            codigo = safe_str(coluna_b)  # Coluna B
+            preco_base = safe_float(coluna_h)  # Coluna H
+
+            if codigo in itens and preco_base > 0:
+                secao, campo, subsecao = itens[codigo]
+                if subsecao:
+                    precos[secao][subsecao][campo] = preco_base
+                else:
+                    precos[secao][campo] = preco_base
 
-    # Percorre as linhas
-    for row in ws.iter_rows(min_row=7, max_row=120):
-        descricao_original = safe_str(row[1].value)  # Coluna B
-        preco = safe_float(row[7].value)  # Coluna H (preco unitario)
+                if detalhes is not None and extras:
+                    detalhes[(secao, subsecao, campo)] = (self._extra(extras, "descricao"),
+                                                          self._extra(extras, "unidade"))
+            elif diagnostico is not None and codigo:
+                if codigo in itens:
+                    secao, campo, subsecao = itens[codigo]
+                    diagnostico["zerados"].add(chave_plana(secao, campo, subsecao))
+                elif preco_base > 0:
+                    diagnostico["nao_mapeados"].append((linha, codigo))
 
-        if not descricao_original:
-            continue
+        return precos
 
-        # Normaliza descricao para comparacao
-        descricao = descricao_original.lower()
-        descricao = descricao.replace('ã', 'a').replace('á', 'a').replace('â', 'a')
-        descricao = descricao.replace('é', 'e').replace('ê', 'e')
-        descricao = descricao.replace('í', 'i')
-        descricao = descricao.replace('ó', 'o').replace('ô', 'o')
-        descricao = descricao.replace('ú', 'u')
-        descricao = descricao.replace('ç', 'c')
-
-        # Detecta secao de revestimento
-        if descricao == "parede":
-            secao_revestimento_atual = "parede"
-            continue
-        elif descricao == "teto":
-            secao_revestimento_atual = "teto"
-            continue
-        elif descricao == "pisos":
-            secao_revestimento_atual = "pisos"
-            continue
+    def _extrair_por_descricao(self, linhas, detalhes, diagnostico=None):
+        """Abas com a descricao direta na coluna B, sem codigos (ex.: mao de obra)
 
-        # Trata revestimento ceramico e rejuntamento baseado na secao atual
-        if "revestimento ceramico" in descricao and secao_revestimento_atual and preco > 0:
-            precos["revestimentos"][secao_revestimento_atual]["revestimentoCeramico"] = preco
-            continue
-        if "rejuntamento para porcelanato" in descricao and secao_revestimento_atual and preco > 0:
-            precos["revestimentos"][secao_revestimento_atual]["rejuntamentoPorcelanato"] = preco
-            continue
+        A unidade, quando pedida, vem como coluna extra.
+        """
+        precos = self.estrutura_vazia()
 
-        # Procura correspondencia no mapeamento
-        if preco > 0:
-            for chave, valor in mapeamento_mo.items():
-                if chave in descricao:
-                    secao, campo, subsecao = valor
-                    if subsecao:
-                        precos[secao][subsecao][campo] = preco
-                    else:
-                        precos[secao][campo] = preco
-                    break
+        # Subsecao corrente, para itens como revestimento ceramico e rejuntamento
+        subsecao_atual = None
 
-    return precos
+        def registrar(secao, subsecao, campo, valor, chave, similaridade):
+            if similaridade < 1 and diagnostico is not None:
+                diagnostico["aproximados"].append((linha, descricao_original, chave, similaridade))
+            if subsecao:
+                precos[secao][subsecao][campo] = valor
+            else:
+                precos[secao][campo] = valor
+            if detalhes is not None and extras:
+                detalhes[(secao, subsecao, campo)] = (descricao_original, self._extra(extras, "unidade"))
+
+        for linha, coluna_b, coluna_h, *extras in linhas:
+            descricao_original = safe_str(coluna_b)  # Coluna B
+            preco = safe_float(coluna_h)  # Coluna H (preco unitario)
+
+            if not descricao_original:
+                continue
+
+            # Normaliza descricao para comparacao
+            descricao = normalizar_descricao(descricao_original)
+
+            # Detecta subsecao (linhas "Parede", "Teto", "Pisos")
+            if descricao in self.marcadores:
+                subsecao_atual = self.marcadores[descricao]
+                continue
+
+            if preco <= 0:
+                # So o casamento exato: o aproximado fica para as linhas com preco
+                if diagnostico is not None:
+                    chave, _ = self.matcher.exato.melhor(descricao)
+                    if chave is not None:
+                        secao, campo, subsecao = self.itens[chave]
+                        diagnostico["zerados"].add(chave_plana(secao, campo, subsecao))
+                continue
+
+            # Itens que dependem da subsecao corrente
+            if self.matcher_subsecao is not None and subsecao_atual:
+                chave, _, similaridade = self.matcher_subsecao.melhor(descricao)
+                if chave is not None:
+                    registrar(self.secao_marcadores, subsecao_atual, self.itens_subsecao[chave], preco,
+                              chave, similaridade)
+                    continue
+
+            # Procura correspondencia no mapeamento (chave mais longa vence)
+            chave, concorrentes, similaridade = self.matcher.melhor(descricao)
+            if chave is None:
+                if diagnostico is not None:
+                    diagnostico["nao_mapeados"].append((linha, descricao_original))
+                continue
+            if concorrentes and diagnostico is not None:
+                diagnostico["ambiguos"].append((linha, descricao_original, chave, concorrentes))
+            secao, campo, subsecao = self.itens[chave]
+            registrar(secao, subsecao, campo, preco, chave, similaridade)
+
+        return precos
+
+def carregar_registro(caminho):
+    """Le e compila o registro de mapeamentos: [RegistroAba], na ordem do arquivo"""
+    with open(caminho, encoding="utf-8") as f:
+        dados = json.load(f)
+    registro = [RegistroAba(aba, caminho.name) for aba in dados["abas"]]
+    vistos = set()
+    for aba in registro:
+        repetidos = vistos & set(aba.nomes)
+        if repetidos:
+            raise ValueError(f"{caminho.name}: aba registrada mais de uma vez: {', '.join(sorted(repetidos))}")
+        vistos |= set(aba.nomes)
+    return registro
+
+def linha_geracao(carimbo=None):
+    """Linha de cabecalho dos arquivos gerados
+
+    Sem carimbo usa a data atual; no modo incremental recebe um carimbo
+    derivado do conteudo, para que o arquivo so mude quando os dados mudam.
+    """
+    if carimbo is None:
+        return f"// Data de geracao: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+    return f"// {carimbo}"
 
-def generate_types_ts():
+@medido()
+def generate_types_ts(carimbo=None):
     """Gera o arquivo types.ts com interfaces comuns"""
     return f'''// Tipos e interfaces para precos - Gerado automaticamente
-// Data de geracao: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
+{linha_geracao(carimbo)}
 // Fonte: monte-sua-casa-simulacao.xlsx
 
 /**
@@ -473,31 +596,84 @@ export interface PrecosMaoObra {{
 }}
 '''
 
-def generate_orcamento_casa_ts(precos):
-    """Gera o arquivo orcamento-casa.ts com os precos extraidos"""
+def nome_constante_secao(constante, secao):
+    """PRECOS_MATERIAIS_CASA + movimentoTerra -> PRECOS_MATERIAIS_CASA_MOVIMENTO_TERRA"""
+    return f"{constante}_{re.sub(r'(?<=[a-z0-9])(?=[A-Z])', '_', secao).upper()}"
+
+def formatar_preco(valor, casas):
+    """Preco arredondado em casas decimais, na forma mais curta (37 em vez de 37.0)"""
+    valor = round(valor, casas)
+    return str(int(valor)) if valor.is_integer() else repr(valor)
+
+def emitir_precos_ts(precos, constante, interface, compacto=None, tamanhos=None):
+    """Corpo TypeScript da constante de precos: (declaracoes por secao, objeto)
 
-    sections = []
-    for section_name, section_data in precos.items():
-        if isinstance(section_data, dict) and any(isinstance(v, dict) for v in section_data.values()):
-            # Secao com sub-secoes (revestimentos)
-            subsections = []
-            for sub_name, sub_data in section_data.items():
-                sub_items = [f"      {k}: {v}," for k, v in sub_data.items() if v > 0]
-                if sub_items:
-                    subsections.append(f"    {sub_name}: {{\n" + "\n".join(sub_items) + "\n    },")
+    Sem compacto reproduz o literal aninhado de sempre, na ordem do registro.
+    compacto = {"casas": N, "json_parse": bool} ordena as chaves, arredonda
+    os precos em N casas e exporta cada secao em uma constante propria
+    (importar uma secao nao traz as demais para o bundle); com json_parse
+    cada secao vira JSON.parse('...'), mais rapido de analisar no V8 que um
+    literal grande. Se tamanhos for um dict, recebe os bytes emitidos por secao.
+    """
+    if not compacto:
+        sections = []
+        for section_name, section_data in precos.items():
+            if isinstance(section_data, dict) and any(isinstance(v, dict) for v in section_data.values()):
+                # Secao com sub-secoes (revestimentos)
+                subsections = []
+                for sub_name, sub_data in section_data.items():
+                    sub_items = [f"      {k}: {v}," for k, v in sub_data.items() if v > 0]
+                    if sub_items:
+                        subsections.append(f"    {sub_name}: {{\n" + "\n".join(sub_items) + "\n    },")
+                    else:
+                        subsections.append(f"    {sub_name}: {{}},")
+                sections.append(f"  {section_name}: {{\n" + "\n".join(subsections) + "\n  },")
+            else:
+                # Secao simples
+                items = [f"    {k}: {v}," for k, v in section_data.items() if v > 0]
+                if items:
+                    sections.append(f"  {section_name}: {{\n" + "\n".join(items) + "\n  },")
                 else:
-                    subsections.append(f"    {sub_name}: {{}},")
-            sections.append(f"  {section_name}: {{\n" + "\n".join(subsections) + "\n  },")
+                    sections.append(f"  {section_name}: {{}},")
+            if tamanhos is not None:
+                tamanhos[section_name] = len(sections[-1].encode("utf-8")) + 1
+        return "", f"export const {constante}: {interface} = {{\n" + "\n".join(sections) + "\n};"
+
+    casas = compacto.get("casas", 4)
+
+    def valores(dados):
+        if any(isinstance(v, dict) for v in dados.values()):
+            return {k: valores(v) for k, v in sorted(dados.items())}
+        return {k: float(formatar_preco(v, casas)) for k, v in sorted(dados.items()) if v > 0}
+
+    def literal(dados):
+        if dados and isinstance(next(iter(dados.values())), dict):
+            return "{" + ", ".join(f"{k}: {literal(v)}" for k, v in dados.items()) + "}"
+        return "{" + ", ".join(f"{k}: {formatar_preco(v, casas)}" for k, v in dados.items()) + "}"
+
+    declaracoes, campos = [], []
+    for secao in sorted(precos):
+        nome = nome_constante_secao(constante, secao)
+        dados = valores(precos[secao])
+        if compacto.get("json_parse"):
+            texto = json.dumps(dados, separators=(",", ":")).replace("\\", "\\\\").replace("'", "\\'")
+            valor = f"JSON.parse('{texto}')"
         else:
-            # Secao simples
-            items = [f"    {k}: {v}," for k, v in section_data.items() if v > 0]
-            if items:
-                sections.append(f"  {section_name}: {{\n" + "\n".join(items) + "\n  },")
-            else:
-                sections.append(f"  {section_name}: {{}},")
+            valor = literal(dados)
+        declaracoes.append(f"export const {nome}: {interface}['{secao}'] = {valor};")
+        campos.append(f"  {secao}: {nome},")
+        if tamanhos is not None:
+            tamanhos[secao] = len(declaracoes[-1].encode("utf-8")) + 1
+    objeto = f"export const {constante}: {interface} = {{\n" + "\n".join(campos) + "\n};"
+    return "\n".join(declaracoes) + "\n\n", objeto
+
+@medido()
+def generate_orcamento_casa_ts(precos, carimbo=None, compacto=None, tamanhos=None):
+    """Gera o arquivo orcamento-casa.ts com os precos extraidos"""
+    declaracoes, objeto = emitir_precos_ts(precos, "PRECOS_MATERIAIS_CASA", "PrecosMateriais", compacto, tamanhos)
 
     return f'''// Precos de materiais da Casa - Extraido automaticamente do Excel
-// Data de geracao: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
+{linha_geracao(carimbo)}
 // Fonte: monte-sua-casa-simulacao.xlsx - Aba "ORCAMENTO - CASA"
 //
 // IMPORTANTE: Este arquivo e gerado automaticamente pelo script extract-excel.py
@@ -505,41 +681,23 @@ def generate_orcamento_casa_ts(precos):
 
 import {{ PrecosMateriais }} from './types';
 
-/**
+{declaracoes}/**
  * Precos base de materiais da casa (sem ajuste)
  * O fator de ajuste (0.79%) deve ser aplicado ao usar estes precos
  */
-export const PRECOS_MATERIAIS_CASA: PrecosMateriais = {{
-{chr(10).join(sections)}
-}};
+{objeto}
 
 // Exporta tipos
 export * from './types';
 '''
 
-def generate_mao_obra_casa_ts(precos):
+@medido()
+def generate_mao_obra_casa_ts(precos, carimbo=None, compacto=None, tamanhos=None):
     """Gera o arquivo mao-obra-casa.ts com os precos extraidos"""
-
-    sections = []
-    for section_name, section_data in precos.items():
-        if isinstance(section_data, dict) and any(isinstance(v, dict) for v in section_data.values()):
-            subsections = []
-            for sub_name, sub_data in section_data.items():
-                sub_items = [f"      {k}: {v}," for k, v in sub_data.items() if v > 0]
-                if sub_items:
-                    subsections.append(f"    {sub_name}: {{\n" + "\n".join(sub_items) + "\n    },")
-                else:
-                    subsections.append(f"    {sub_name}: {{}},")
-            sections.append(f"  {section_name}: {{\n" + "\n".join(subsections) + "\n  },")
-        else:
-            items = [f"    {k}: {v}," for k, v in section_data.items() if v > 0]
-            if items:
-                sections.append(f"  {section_name}: {{\n" + "\n".join(items) + "\n  },")
-            else:
-                sections.append(f"  {section_name}: {{}},")
+    declaracoes, objeto = emitir_precos_ts(precos, "PRECOS_MAO_OBRA_CASA", "PrecosMaoObra", compacto, tamanhos)
 
     return f'''// Precos de mao de obra da Casa - Extraido automaticamente do Excel
-// Data de geracao: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
+{linha_geracao(carimbo)}
 // Fonte: monte-sua-casa-simulacao.xlsx - Aba "MAO DE OBRA - CASA"
 //
 // IMPORTANTE: Este arquivo e gerado automaticamente pelo script extract-excel.py
@@ -553,32 +711,1077 @@ import {{ PrecosMaoObra }} from './types';
  */
 export const BDI_PERCENTUAL = {BDI_PERCENTUAL};
 
-/**
+{declaracoes}/**
  * Precos de mao de obra da casa
  */
-export const PRECOS_MAO_OBRA_CASA: PrecosMaoObra = {{
-{chr(10).join(sections)}
-}};
+{objeto}
 
 // Exporta tipos
 export * from './types';
 '''
 
-def generate_index_ts():
+@medido()
+def generate_index_ts(carimbo=None):
     """Gera o arquivo index.ts que exporta tudo"""
     return f'''// Exportacoes centralizadas de precos
-// Data de geracao: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
+{linha_geracao(carimbo)}
 
 export * from './types';
 export * from './orcamento-casa';
 export * from './mao-obra-casa';
 '''
 
-def main():
+@cache
+def registro_abas():
+    """Abas lidas da planilha, com seus mapeamentos (scripts/mapeamentos-planilha.json)
+
+    Carregadas uma unica vez, no primeiro uso: comandos que nao leem a planilha
+    nao pagam a compilacao. Para extrair abas adicionais basta registra-las
+    nesse arquivo; as demais abas da planilha nunca sao carregadas.
+    """
+    return carregar_registro(MAPEAMENTOS_FILE)
+
+def leiaute_abas():
+    """Nomes, linha inicial e papel das colunas de cada aba, para o cache de planilhas
+
+    Mudar o leiaute invalida as entradas do cache (cache_planilhas.py).
+    """
+    return {
+        registro.aba: {"nomes": list(registro.nomes), "linha_inicial": registro.linha_inicial,
+                       "colunas": registro.colunas}
+        for registro in registro_abas()
+    }
+
+# Formatos de saida aceitos por --formato
+FORMATOS = ("ts", "json", "bin", "tabelas", "api")
+
+def contar_itens(precos):
+    """Conta itens com preco > 0, incluindo sub-secoes"""
+    count = 0
+    for dados in precos.values():
+        if isinstance(dados, dict):
+            if any(isinstance(v, dict) for v in dados.values()):
+                for sub in dados.values():
+                    count += len([v for v in sub.values() if v > 0])
+            else:
+                count += len([v for v in dados.values() if v > 0])
+    return count
+
+def sha256_arquivo(caminho):
+    """Hash SHA-256 do arquivo, lido em blocos"""
+    import hashlib
+
+    hasher = hashlib.sha256()
+    with open(caminho, "rb") as f:
+        for bloco in iter(lambda: f.read(1 << 20), b""):
+            hasher.update(bloco)
+    return hasher.hexdigest()
+
+def sha256_bytes(dados):
+    """Hash SHA-256 (hex) de bytes"""
+    import hashlib
+
+    return hashlib.sha256(dados).hexdigest()
+
+def iterar_com_hash(linhas, hasher):
+    """Repassa as linhas atualizando o hash com os valores das celulas"""
+    for linha in linhas:
+        hasher.update(repr(linha).encode("utf-8"))
+        yield linha
+
+def completar_formulas(linhas, aba, colunas, avaliador, buscar=False):
+    """Troca as formulas sem valor em cache das linhas pelo valor calculado
+
+    Com o leitor xml as celulas ja vem marcadas (Formula). Com o openpyxl
+    (buscar=True), que so ve None nessas celulas, as linhas com texto em B e
+    sem preco em H sao conferidas nas celulas da aba lidas do XML (uma vez
+    por aba). Ao final da aba mostra quantas formulas foram calculadas e as
+    que falharam.
+    """
+    from formulas_planilha import Formula, indice_coluna
+
+    indices = [indice_coluna(coluna) for coluna in colunas]
+    calculadas, falhas = avaliador.calculadas, len(avaliador.falhas)
+    for linha in linhas:
+        if buscar and linha[2] is None and linha[1] is not None and linha[1] != "":
+            conteudos = [avaliador.conteudo(aba, linha[0], indice) if valor is None else valor
+                         for indice, valor in zip(indices, linha[1:])]
+            linha = (linha[0], *(conteudo if isinstance(conteudo, Formula) else valor
+                                 for conteudo, valor in zip(conteudos, linha[1:])))
+        if any(isinstance(valor, Formula) for valor in linha[1:]):
+            linha = (linha[0], *(avaliador.valor(aba, linha[0], indice, valor) if isinstance(valor, Formula)
+                                 else valor for indice, valor in zip(indices, linha[1:])))
+        yield linha
+
+    if avaliador.calculadas > calculadas:
+        print(f"  Formulas sem valor em cache calculadas: {avaliador.calculadas - calculadas}")
+    for aba_falha, celula, motivo in avaliador.falhas[falhas:falhas + 5]:
+        print(f"  AVISO: formula nao calculada em {aba_falha}!{celula}: {motivo}")
+    if len(avaliador.falhas) - falhas > 5:
+        print(f"  ... e mais {len(avaliador.falhas) - falhas - 5} formulas nao calculadas")
+
+class FontePlanilha:
+    """Fonte de linhas lidas da planilha com openpyxl (modo somente leitura)
+
+    As formulas sem valor em cache (planilhas salvas por scripts) sao lidas
+    do XML por um LeitorXlsx, so nas abas em que aparecem.
+    """
+
+    def __init__(self, caminho):
+        from formulas_planilha import AvaliadorFormulas
+
+        self.caminho = caminho
+        self.wb = abrir_workbook(caminho)
+        self.sheetnames = self.wb.sheetnames
+        self._leitor = None
+        self.avaliador = AvaliadorFormulas(lambda aba: self.leitor.celulas(aba), self.sheetnames)
+
+    @property
+    def leitor(self):
+        if self._leitor is None:
+            from leitor_xlsx import LeitorXlsx
+
+            self._leitor = LeitorXlsx(self.caminho)
+        return self._leitor
+
+    def linhas(self, aba, min_row, extras=(), limites=None):
+        formulas = None
+        if self.leitor.formulas_sem_valor(aba):
+            def formulas(linhas):
+                return completar_formulas(linhas, aba, ("B", "H", *extras), self.avaliador, buscar=True)
+
+        return iterar_linhas(self.wb[aba], min_row, extras=extras, limites=limites, formulas=formulas)
+
+    def close(self):
+        # Em modo somente leitura o arquivo fica aberto ate o close()
+        self.wb.close()
+        if self._leitor is not None:
+            self._leitor.close()
+
+class FonteXml:
+    """Fonte de linhas lida direto do XML da planilha (ver scripts/leitor_xlsx.py)"""
+
+    def __init__(self, caminho):
+        from formulas_planilha import AvaliadorFormulas
+        from leitor_xlsx import LeitorXlsx
+
+        self.leitor = medido("load_workbook")(LeitorXlsx)(caminho)
+        self.sheetnames = self.leitor.sheetnames
+        self.avaliador = AvaliadorFormulas(self.leitor.celulas, self.sheetnames)
+
+    def linhas(self, aba, min_row, extras=(), limites=None):
+        colunas = ("B", "H", *extras)
+        linhas = completar_formulas(self.leitor.linhas(aba, colunas, formulas=True), aba, colunas, self.avaliador)
+        return delimitar_linhas(linhas, min_row, limites)
+
+    def close(self):
+        self.leitor.close()
+
+# Leitores de planilha (--leitor): mesmas linhas e valores, ver scripts/leitor_xlsx.py
+LEITORES = {"openpyxl": FontePlanilha, "xml": FonteXml}
+
+def extrair_abas(fonte, hashes=None, detalhes=None, gravador_cache=None, diagnosticos=None):
+    """Extrai as abas registradas em registro_abas(), retornando {aba: precos}
+
+    Todas as abas sao lidas da mesma fonte, aberta uma unica vez; fonte
+    fornece as linhas de cada aba (FontePlanilha, FonteXml ou cache). Se
+    hashes for um dict, recebe o SHA-256 dos valores lidos de cada aba,
+    calculado na mesma passada da extracao. Se detalhes for um dict, as colunas de
+    descricao/unidade tambem sao lidas e detalhes[aba] recebe
+    {(secao, subsecao, campo): (descricao, unidade)}. Com gravador_cache as
+    linhas lidas sao guardadas no cache de planilhas. Se diagnosticos for um
+    dict, diagnosticos[aba] recebe o diagnostico de RegistroAba.extrair das
+    abas encontradas.
+    """
+    resultados = {}
+    for registro in registro_abas():
+        aba, extrator = registro.aba, registro.extrator
+        print(f"\nExtraindo dados de {registro.rotulo}...")
+        nome = registro.nome_na_planilha(fonte.sheetnames)
+        if nome is not None:
+            ler_detalhes = detalhes is not None or gravador_cache is not None
+            extras = registro.extras if ler_detalhes else ()
+            limites = {}
+            linhas = fonte.linhas(nome, registro.linha_inicial, extras=extras, limites=limites)
+            if gravador_cache is not None:
+                linhas = gravador_cache.coletar(aba, linhas, extras)
+            if hashes is not None:
+                import hashlib
+
+                hasher = hashlib.sha256()
+                linhas = iterar_com_hash(linhas, hasher)
+            if detalhes is not None:
+                detalhes[aba] = {}
+            diagnostico = None
+            if diagnosticos is not None:
+                diagnostico = diagnosticos[aba] = {}
+            precos = extrator(linhas, detalhes[aba] if detalhes is not None else None, diagnostico)
+            if hashes is not None:
+                hashes[aba] = hasher.hexdigest()
+            if gravador_cache is not None:
+                gravador_cache.gravar_aba(aba, limites)
+            if limites["primeira"] is not None:
+                cabecalho = limites["cabecalho"] or "-"
+                print(f"  Linhas de dados: {limites['primeira']}-{limites['ultima']} "
+                      f"(cabecalho: {cabecalho}, linhas de secao: {len(limites['secoes'])})")
+            print(f"  Itens extraidos: {contar_itens(precos)}")
+        else:
+            print(f"  AVISO: Aba '{registro.rotulo}' nao encontrada")
+            precos = {}
+            if hashes is not None:
+                hashes[aba] = None
+            if gravador_cache is not None:
+                gravador_cache.ausente(aba)
+        resultados[aba] = precos
+    return resultados
+
+class ErroValidacao(Exception):
+    """Extracao reprovada na validacao: nenhum arquivo de saida foi gravado"""
+
+def carregar_indice_esperado(destino_json):
+    """{aba: chaves esperadas}: itens do ArquivoPrecos publicado + obrigatorias do registro
+
+    Os itens ja publicados em destino_json sao lidos pelo runtime; uma chave
+    que some da planilha quebraria o orcamento em producao. Destinos do
+    mapeamento que a planilha nunca trouxe so contam se listados em
+    "obrigatorias" (mapeamentos-planilha.json).
+    """
+    from diff_precos import snapshot_de_arquivo
+
+    indice = {}
+    for registro in registro_abas():
+        publicado = carregar_json(destino_json / registro.arquivo)
+        chaves = set(registro.obrigatorias)
+        if isinstance(publicado, dict):
+            for itens in snapshot_de_arquivo(publicado, registro.tipo)["abas"].values():
+                chaves.update(chave for chave, _ in itens)
+        indice[registro.aba] = frozenset(chaves)
+    return indice
+
+def validar_extracao(resultados, diagnosticos, indice, cobertura_minima=100.0):
+    """Confere os precos extraidos de cada aba contra o indice de chaves esperadas
+
+    Retorna {aba: relatorio} so das abas encontradas na planilha (abas
+    ausentes mantem os arquivos atuais). Chaves sem preco > 0 contam como
+    faltantes; a aba e reprovada se a cobertura ficar abaixo de cobertura_minima
+    (0 = so relatorio).
+    """
+    relatorios = {}
+    for registro in registro_abas():
+        aba = registro.aba
+        if aba not in diagnosticos:
+            continue
+        esperadas = indice[aba]
+        extraidas = {chave for chave, _ in achatar_precos(resultados[aba])}
+        zerados = diagnosticos[aba]["zerados"]
+        por_secao, ausentes, com_zero = {}, [], []
+        for chave in sorted(esperadas):
+            secao = chave.split(".", 1)[0]
+            achadas, total = por_secao.get(secao, (0, 0))
+            encontrada = chave in extraidas
+            por_secao[secao] = (achadas + encontrada, total + 1)
+            if not encontrada:
+                (com_zero if chave in zerados else ausentes).append(chave)
+        faltantes = len(ausentes) + len(com_zero)
+        cobertura = 100.0 * (len(esperadas) - faltantes) / len(esperadas) if esperadas else 100.0
+        relatorios[aba] = {
+            "rotulo": registro.rotulo,
+            "esperadas": len(esperadas),
+            "cobertura": round(cobertura, 2),
+            "secoes": por_secao,
+            "ausentes": ausentes,
+            "zerados": com_zero,
+            "nao_mapeados": diagnosticos[aba]["nao_mapeados"],
+            "aproximados": diagnosticos[aba].get("aproximados", []),
+            "ambiguos": diagnosticos[aba].get("ambiguos", []),
+            "aprovada": cobertura >= cobertura_minima,
+        }
+    return relatorios
+
+def imprimir_validacao(relatorios, limite=10):
+    print("\nValidacao (cobertura das chaves esperadas):")
+    for relatorio in relatorios.values():
+        achadas = relatorio["esperadas"] - len(relatorio["ausentes"]) - len(relatorio["zerados"])
+        situacao = "" if relatorio["aprovada"] else "  <-- REPROVADA"
+        print(f"  {relatorio['rotulo']}: {achadas}/{relatorio['esperadas']} "
+              f"({relatorio['cobertura']:.1f}%){situacao}")
+        for secao, (achadas_secao, total) in relatorio["secoes"].items():
+            if achadas_secao < total:
+                print(f"    {secao}: {achadas_secao}/{total}")
+        for titulo, chaves in (("sem linha na planilha", relatorio["ausentes"]),
+                               ("com preco zero", relatorio["zerados"])):
+            if chaves:
+                extra = f" (+{len(chaves) - limite})" if len(chaves) > limite else ""
+                print(f"    {titulo}: {', '.join(chaves[:limite])}{extra}")
+        nao_mapeados = relatorio["nao_mapeados"]
+        if nao_mapeados:
+            exemplos = ", ".join(f"{linha}: {texto[:40]}" for linha, texto in nao_mapeados[:5])
+            print(f"    AVISO: {len(nao_mapeados)} linha(s) com preco sem mapeamento ({exemplos})")
+        for linha, texto, chave, concorrentes in relatorio["ambiguos"][:limite]:
+            print(f"    AVISO: linha {linha} ambigua: '{texto}' -> '{chave}' "
+                  f"(tambem casa com: {', '.join(concorrentes)})")
+        aproximados = relatorio["aproximados"]
+        if aproximados:
+            print(f"    {len(aproximados)} linha(s) casada(s) por similaridade "
+                  "(atualize a chave no mapeamento se a planilha foi corrigida):")
+            for linha, texto, chave, similaridade in aproximados[:limite]:
+                print(f"      linha {linha} '{texto}' -> '{chave}' (similaridade {similaridade:.2f})")
+
+def carregar_manifesto(caminho):
+    """Le o manifesto da ultima extracao (vazio se nao existir ou for invalido)"""
+    try:
+        with open(caminho, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def salvar_manifesto(caminho, manifesto):
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    with open(caminho, "w", encoding="utf-8") as f:
+        json.dump(manifesto, f, indent=2, sort_keys=True, ensure_ascii=False)
+        f.write("\n")
+
+def saidas_intactas(manifesto, formatos):
+    """Confere se os arquivos gerados ainda tem o conteudo registrado no manifesto"""
+    saidas = manifesto.get("saidas") or {}
+    if not saidas or manifesto.get("formatos") != sorted(formatos):
+        return False
+    for nome, hash_esperado in saidas.items():
+        caminho = Path(nome)
+        if not caminho.exists() or sha256_arquivo(caminho) != hash_esperado:
+            return False
+    return True
+
+def manifesto_vigente(manifesto, formatos, hash_mapeamentos, hash_configuracoes, compacto):
+    """Confere tudo que, alem dos dados da planilha, muda as saidas
+
+    Usado pelas duas saidas antecipadas do modo incremental (planilha
+    inalterada e abas inalteradas), para que nao divirjam.
+    """
+    return (saidas_intactas(manifesto, formatos)
+            and manifesto.get("mapeamentos") == hash_mapeamentos
+            and manifesto.get("configuracoes") == hash_configuracoes
+            and manifesto.get("ts") == compacto)
+
+def escrever_se_mudou(caminho, conteudo):
+    """Escreve o arquivo (atomicamente) apenas se o conteudo for diferente do atual"""
+    dados = conteudo if isinstance(conteudo, bytes) else conteudo.encode("utf-8")
+    try:
+        if caminho.read_bytes() == dados:
+            return False
+    except OSError:
+        pass
+    from escrita_atomica import escrever_atomico
+
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    escrever_atomico(caminho, dados)
+    return True
+
+def achatar_precos(precos):
+    """Lista [(chave, preco)] dos itens com preco > 0
+
+    Chaves no formato "secao.campo" ou "secao.subsecao.campo".
+    """
+    itens = []
+    for secao, dados in precos.items():
+        for campo, valor in dados.items():
+            if isinstance(valor, dict):
+                itens += [(f"{secao}.{campo}.{k}", v) for k, v in valor.items() if v > 0]
+            elif valor > 0:
+                itens.append((f"{secao}.{campo}", valor))
+    return itens
+
+def carregar_json(caminho):
+    """Le um arquivo JSON (None se nao existir ou for invalido)"""
+    try:
+        with open(caminho, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def montar_arquivo_precos(precos, detalhes, registro, anterior=None):
+    """Dict ArquivoPrecos (ver src/lib/admin/precos-json.ts)
+
+    Nomes de secoes e subsecoes e o BDI vem do registro da aba. descricao e
+    unidade vem da planilha; quando a celula esta vazia, usa os valores do
+    arquivo anterior. A versao so muda quando as secoes mudam.
+    """
+    secoes_anteriores = (anterior or {}).get("secoes") or {}
+
+    def item(secao, subsecao, campo, preco):
+        if subsecao:
+            itens_anteriores = (((secoes_anteriores.get(secao) or {}).get("subSecoes") or {})
+                                .get(subsecao) or {}).get("itens") or {}
+        else:
+            itens_anteriores = (secoes_anteriores.get(secao) or {}).get("itens") or {}
+        item_anterior = itens_anteriores.get(campo) or {}
+        descricao, unidade = detalhes.get((secao, subsecao, campo), ("", ""))
+        return {
+            "descricao": descricao or item_anterior.get("descricao", ""),
+            "unidade": unidade or item_anterior.get("unidade", ""),
+            # Mesmo formato do JSON.stringify (37 em vez de 37.0)
+            "preco": int(preco) if float(preco).is_integer() else preco,
+        }
+
+    secoes = {}
+    for secao, dados in precos.items():
+        nome = (secoes_anteriores.get(secao) or {}).get("nome") or registro.secoes.get(secao, secao)
+        if any(isinstance(v, dict) for v in dados.values()):
+            sub_secoes = {}
+            for subsecao, sub_dados in dados.items():
+                sub_secoes[subsecao] = {
+                    "nome": registro.subsecoes[secao].get(subsecao, subsecao),
+                    "itens": {k: item(secao, subsecao, k, v) for k, v in sub_dados.items() if v > 0},
+                }
+            secoes[secao] = {"nome": nome, "subSecoes": sub_secoes}
+        else:
+            secoes[secao] = {
+                "nome": nome,
+                "itens": {k: item(secao, None, k, v) for k, v in dados.items() if v > 0},
+            }
+
+    if anterior and anterior.get("secoes") == secoes and anterior.get("versao"):
+        versao = anterior["versao"]
+    else:
+        versao = datetime.now().strftime("%Y-%m-%d")
+
+    arquivo = {"versao": versao, "tipo": registro.tipo}
+    if registro.tipo.startswith("materiais"):
+        arquivo["fatorAjuste"] = FATOR_AJUSTE_MATERIAIS
+    else:
+        arquivo["bdiPercentual"] = registro.bdi_percentual
+    arquivo["secoes"] = secoes
+    return arquivo
+
+@medido()
+def generate_arquivo_precos_json(precos, detalhes, registro, anterior=None):
+    """Gera um arquivo ArquivoPrecos (ver montar_arquivo_precos)"""
+    # Mesmo layout de salvarPrecos (JSON.stringify(dados, null, 2))
+    return json.dumps(montar_arquivo_precos(precos, detalhes, registro, anterior), indent=2, ensure_ascii=False)
+
+def parametros_tabelas():
+    """fatorINCC e [(sigla, cub)] de data/configuracoes.json, usados nas tabelas derivadas"""
+    config = carregar_json(CONFIGURACOES_FILE) or {}
+    fator_incc = config.get("fatorINCC", FATOR_AJUSTE_MATERIAIS)
+    estados = [(estado["sigla"], estado["cub"]) for estado in config.get("estados", []) if estado.get("cub")]
+    return fator_incc, estados
+
+def gerar_saidas(resultados, destino, hashes=None, formatos=("ts",), detalhes=None, destino_json=DATA_DIR,
+                 compacto=None, tamanhos=None):
+    """Monta o conteudo de cada arquivo gerado: [(caminho, conteudo)]
+
+    "ts" gera os arquivos TypeScript em destino; "json" gera os ArquivoPrecos
+    em destino_json, "bin" os snapshots binarios (ver snapshot_precos.py) e
+    "tabelas" os precos derivados por INCC/BDI/UF (ver tabelas_precos.py) ao
+    lado deles. Com hashes (modo incremental) o cabecalho TypeScript traz
+    o hash dos dados de origem em vez da data, tornando a saida deterministica.
+    compacto e repassado a emitir_precos_ts (saida sempre sem data); se
+    tamanhos for um dict, recebe {arquivo .ts: {secao: bytes}}.
+    """
+    saidas = []
+    if "ts" in formatos:
+        if hashes is None and compacto:
+            carimbo_fixo = carimbo_materiais = carimbo_mao_obra = "Gerado por scripts/extract-excel.py"
+        elif hashes is None:
+            carimbo_fixo = carimbo_materiais = carimbo_mao_obra = None
+        else:
+            carimbo_fixo = "Gerado por scripts/extract-excel.py"
+            carimbo_materiais = f"Hash da aba: {(hashes.get('ORÇAMENTO - CASA') or '-')[:16]}"
+            carimbo_mao_obra = f"Hash da aba: {(hashes.get('MÃO DE OBRA - CASA') or '-')[:16]}"
+
+        tamanhos_materiais, tamanhos_mao_obra = {}, {}
+        saidas += [
+            (destino / "types.ts", generate_types_ts(carimbo_fixo)),
+            (destino / "orcamento-casa.ts",
+             generate_orcamento_casa_ts(resultados["ORÇAMENTO - CASA"], carimbo_materiais, compacto,
+                                        tamanhos_materiais)),
+            (destino / "mao-obra-casa.ts",
+             generate_mao_obra_casa_ts(resultados["MÃO DE OBRA - CASA"], carimbo_mao_obra, compacto,
+                                       tamanhos_mao_obra)),
+            (destino / "index.ts", generate_index_ts(carimbo_fixo)),
+        ]
+        if tamanhos is not None:
+            tamanhos.update({"orcamento-casa.ts": tamanhos_materiais, "mao-obra-casa.ts": tamanhos_mao_obra})
+
+    if "json" in formatos:
+        for registro in registro_abas():
+            aba = registro.aba
+            # Aba ausente ou sem itens: mantem o arquivo atual em vez de publicar um vazio
+            if not contar_itens(resultados.get(aba) or {}):
+                continue
+            caminho = destino_json / registro.arquivo
+            conteudo = generate_arquivo_precos_json(
+                resultados[aba], (detalhes or {}).get(aba, {}), registro, carregar_json(caminho)
+            )
+            saidas.append((caminho, conteudo))
+
+    if "bin" in formatos:
+        from snapshot_precos import gerar_snapshot
+
+        for registro in registro_abas():
+            aba = registro.aba
+            if not contar_itens(resultados.get(aba) or {}):
+                continue
+            caminho = destino_json / registro.arquivo.replace(".json", ".bin")
+            saidas.append((caminho, medido("gerar_snapshot")(gerar_snapshot)(achatar_precos(resultados[aba]))))
+
+    if "tabelas" in formatos:
+        from tabelas_precos import gerar_tabelas
+
+        fator_incc, estados = parametros_tabelas()
+        for registro in registro_abas():
+            aba = registro.aba
+            if not contar_itens(resultados.get(aba) or {}):
+                continue
+            bdi = None if registro.tipo.startswith("materiais") else registro.bdi_percentual
+            conteudo = medido("gerar_tabelas")(gerar_tabelas)(
+                achatar_precos(resultados[aba]), registro.tipo, fator_incc, estados, bdi
+            )
+            saidas.append((destino_json / f"tabelas-{registro.tipo}.json", conteudo))
+
+    return saidas
+
+def publicar_respostas_api(destino_json, resumo=None):
+    """Ultima etapa de --formato api: respostas prontas das rotas de catalogo
+
+    Monta as respostas de /api/estados e /api/tipos (de data/configuracoes.json)
+    e de /api/admin/precos?tipo=... (dos ArquivoPrecos ja gravados em
+    destino_json) e grava em destino_json/api (formato em scripts/respostas_api.py).
+    """
+    from respostas_api import corpo_estados, corpo_tipos, gerar_respostas
+
+    respostas = {}
+    config = carregar_json(CONFIGURACOES_FILE)
+    if config:
+        # O mapeamento dos corpos espelha static-data.ts: se ele mudar, a rota remonta
+        origens = (CONFIGURACOES_FILE, STATIC_DATA_FILE)
+        respostas["estados"] = (origens, corpo_estados(config))
+        respostas["tipos"] = (origens, corpo_tipos(config))
+    for registro in registro_abas():
+        caminho = destino_json / registro.arquivo
+        dados = carregar_json(caminho)
+        if dados is not None:
+            respostas[f"precos-{registro.tipo}"] = ((caminho,), dados)
+    escritos = medido("respostas_api")(gerar_respostas)(destino_json / "api", respostas)
+    print(f"\nRespostas da API: {len(respostas)} rotas, {len(escritos)} arquivo(s) atualizado(s) "
+          f"em {destino_json / 'api'}")
+    if resumo is not None:
+        resumo["escritos"] += escritos
+
+def registrar_diff(resumo, snapshot_path, diff_path=None, resultados=None):
+    """Compara os precos extraidos com o snapshot da extracao anterior
+
+    Sem resultados (planilha inalterada) o diff e vazio. Grava o novo
+    snapshot e, com diff_path, o diff em JSON (formato em diff_precos.py).
+    """
+    from diff_precos import VERSAO_SNAPSHOT, comparar_snapshots, montar_snapshot, resumir_diff, serializar
+
+    anterior = carregar_json(snapshot_path)
+    if anterior is not None and anterior.get("versao") != VERSAO_SNAPSHOT:
+        anterior = None
+    if resultados is None:
+        atual = anterior or montar_snapshot(Path(resumo["planilha"]).name, {})
+        diff = comparar_snapshots(atual, atual)
+    else:
+        atual = montar_snapshot(Path(resumo["planilha"]).name, {
+            registro.tipo: achatar_precos(resultados[registro.aba])
+            for registro in registro_abas() if registro.aba in resultados
+        })
+        diff = comparar_snapshots(anterior, atual)
+    resumo["secoesAfetadas"] = diff["secoesAfetadas"]
+
+    if resultados is not None:
+        if anterior is None:
+            print("\nSem extracao anterior para comparar; todos os itens contam como adicionados.")
+        print("\nDiferencas de precos:")
+        for linha in resumir_diff(diff):
+            print(f"  {linha}")
+        escrever_se_mudou(snapshot_path, serializar(atual))
+    if diff_path:
+        escrever_se_mudou(Path(diff_path), serializar(diff))
+
+def registrar_historico(historico_path, vigencia, resultados, excel_file, hash_arquivo=None):
+    """Acrescenta o catalogo de cada aba extraida ao historico (formato em historico_precos.py)"""
+    from historico_precos import HistoricoPrecos
+
+    vigencia = vigencia or datetime.now().strftime("%Y-%m-%d")
+    abas = {registro.tipo: achatar_precos(resultados[registro.aba])
+            for registro in registro_abas() if contar_itens(resultados.get(registro.aba) or {})}
+    Path(historico_path).parent.mkdir(parents=True, exist_ok=True)
+    historico = HistoricoPrecos(historico_path)
+    try:
+        historico.registrar(vigencia, abas, Path(excel_file).name, hash_arquivo or sha256_arquivo(excel_file))
+    finally:
+        historico.close()
+    print(f"\nHistorico: {sum(len(itens) for itens in abas.values())} precos com vigencia {vigencia} "
+          f"em {historico_path}")
+
+def imprimir_tamanhos(tamanhos, maiores=3):
+    """Total de cada .ts e as secoes que mais pesam"""
+    print("\nTamanho por secao (bytes):")
+    for arquivo, secoes in tamanhos.items():
+        ordem = sorted(secoes.items(), key=lambda item: -item[1])[:maiores]
+        print(f"  {arquivo}: {sum(secoes.values())} em {len(secoes)} secoes; maiores: "
+              + ", ".join(f"{secao} {total}" for secao, total in ordem))
+
+def extrair_planilha(excel_file, destino, incremental=False, manifesto_path=None,
+                     formatos=("ts",), destino_json=DATA_DIR, cache=None,
+                     snapshot_path=None, diff_path=None, cobertura_minima=100.0,
+                     historico_path=None, vigencia=None, compacto=None, leitor="openpyxl"):
+    """Extrai uma planilha e grava os arquivos gerados
+
+    formatos escolhe as saidas: "ts" (arquivos TypeScript em destino) e/ou
+    "json" (ArquivoPrecos em destino_json, gravados atomicamente); "api"
+    fecha a extracao com as respostas pre-computadas da API (mesmo sem
+    mudancas na planilha, pois data/configuracoes.json pode ter mudado).
+    No modo incremental consulta o manifesto: se o arquivo e as abas nao
+    mudaram nada e regravado, e apenas arquivos com conteudo novo sao escritos.
+    Com cache (CachePlanilhas) as abas de uma planilha ja lida vem do cache,
+    sem abrir o XLSX. Com snapshot_path os precos sao comparados com os da
+    extracao anterior (ver registrar_diff).
+    Antes de gravar qualquer arquivo a extracao e validada contra o indice
+    de chaves esperadas (ver validar_extracao): abaixo de cobertura_minima
+    levanta ErroValidacao. Com cobertura_minima None a validacao e omitida.
+    Com historico_path os precos extraidos sao acrescentados ao historico
+    (ver registrar_historico), exceto quando nada mudou.
+    compacto (ver emitir_precos_ts) escolhe a emissao compacta dos .ts e
+    leitor a implementacao que le a planilha (LEITORES).
+    Retorna um resumo com os itens por aba e os arquivos escritos.
+    """
+    resumo = {"planilha": str(excel_file), "itens": {}, "escritos": [], "inalterado": False}
+    if _instrumentacao is not None:
+        _instrumentacao.planilha = Path(excel_file).name
+
+    manifesto = {}
+    hash_arquivo = hash_mapeamentos = hash_configuracoes = None
+    if incremental:
+        manifesto = carregar_manifesto(manifesto_path)
+        hash_arquivo = sha256_arquivo(excel_file)
+        # Um item renomeado no registro muda as saidas sem mudar a planilha
+        hash_mapeamentos = sha256_arquivo(MAPEAMENTOS_FILE)
+        # As tabelas derivadas dependem tambem do INCC e dos CUBs
+        if "tabelas" in formatos and CONFIGURACOES_FILE.exists():
+            hash_configuracoes = sha256_arquivo(CONFIGURACOES_FILE)
+        if manifesto.get("arquivo") == hash_arquivo \
+                and manifesto_vigente(manifesto, formatos, hash_mapeamentos, hash_configuracoes, compacto):
+            print("\nPlanilha inalterada desde a ultima extracao (manifesto). Nada a fazer.")
+            resumo["inalterado"] = True
+            if snapshot_path is not None:
+                registrar_diff(resumo, snapshot_path, diff_path)
+            if "api" in formatos:
+                publicar_respostas_api(destino_json, resumo)
+            return resumo
+
+    fonte = gravador_cache = None
+    if cache is not None:
+        hash_arquivo = hash_arquivo or sha256_arquivo(excel_file)
+        fonte = cache.abrir(hash_arquivo, [registro.aba for registro in registro_abas()])
+        if fonte is not None:
+            print(f"\nUsando cache da planilha: {fonte.entrada}")
+        else:
+            gravador_cache = cache.gravador(hash_arquivo)
+
+    if fonte is None:
+        # Abre o workbook em modo streaming
+        print(f"\nCarregando arquivo Excel ({leitor})...")
+        fonte = LEITORES[leitor](excel_file)
+    hashes = {} if incremental else None
+    detalhes = {} if "json" in formatos else None
+    diagnosticos = {} if cobertura_minima is not None else None
+    try:
+        print(f"Abas encontradas: {fonte.sheetnames}")
+        resultados = extrair_abas(fonte, hashes, detalhes, gravador_cache, diagnosticos)
+    finally:
+        fonte.close()
+
+    if gravador_cache is not None:
+        gravador_cache.finalizar()
+        removidas = cache.podar(preservar=hash_arquivo)
+        if removidas:
+            print(f"  Cache: {len(removidas)} entrada(s) antiga(s) removida(s)")
+
+    for aba, precos in resultados.items():
+        resumo["itens"][aba] = contar_itens(precos)
+
+    if diagnosticos is not None:
+        relatorios = validar_extracao(resultados, diagnosticos, carregar_indice_esperado(destino_json),
+                                      cobertura_minima)
+        imprimir_validacao(relatorios)
+        resumo["cobertura"] = {aba: relatorio["cobertura"] for aba, relatorio in relatorios.items()}
+        reprovadas = [relatorio["rotulo"] for relatorio in relatorios.values() if not relatorio["aprovada"]]
+        if reprovadas:
+            raise ErroValidacao(f"cobertura abaixo de {cobertura_minima:g}% em {', '.join(reprovadas)}; "
+                                "nenhum arquivo foi gravado")
+
+    if incremental and manifesto.get("abas") == hashes \
+            and manifesto_vigente(manifesto, formatos, hash_mapeamentos, hash_configuracoes, compacto):
+        print("\nAbas extraidas inalteradas; arquivos gerados mantidos.")
+        manifesto["arquivo"] = hash_arquivo
+        salvar_manifesto(manifesto_path, manifesto)
+        resumo["inalterado"] = True
+        if snapshot_path is not None:
+            registrar_diff(resumo, snapshot_path, diff_path)
+        if "api" in formatos:
+            publicar_respostas_api(destino_json, resumo)
+        return resumo
+
+    # Gera arquivos de saida
+    print("\nGerando arquivos...")
+    saidas = {}
+    tamanhos = {}
+    for caminho, conteudo in gerar_saidas(resultados, destino, hashes, formatos, detalhes, destino_json,
+                                          compacto, tamanhos):
+        if medido(f"escrever:{caminho.name}")(escrever_se_mudou)(caminho, conteudo):
+            resumo["escritos"].append(caminho.name)
+            print(f"  Criado: {caminho}")
+        else:
+            print(f"  Sem alteracoes: {caminho}")
+        dados = conteudo if isinstance(conteudo, bytes) else conteudo.encode("utf-8")
+        saidas[str(caminho)] = sha256_bytes(dados)
+
+    if tamanhos:
+        imprimir_tamanhos(tamanhos)
+        resumo["tamanhos_ts"] = tamanhos
+        if _instrumentacao is not None:
+            _instrumentacao.registrar_tamanhos(tamanhos)
+
+    if snapshot_path is not None:
+        registrar_diff(resumo, snapshot_path, diff_path, resultados)
+
+    if historico_path is not None:
+        registrar_historico(historico_path, vigencia, resultados, excel_file, hash_arquivo)
+
+    # Por ultimo: as respostas da API partem dos arquivos ja gravados
+    if "api" in formatos:
+        publicar_respostas_api(destino_json, resumo)
+
+    if incremental:
+        salvar_manifesto(manifesto_path, {
+            "versao": 1,
+            "arquivo": hash_arquivo,
+            "abas": hashes,
+            "formatos": sorted(formatos),
+            "mapeamentos": hash_mapeamentos,
+            "configuracoes": hash_configuracoes,
+            "ts": compacto,
+            "saidas": saidas,
+        })
+
+    return resumo
+
+def siglas_estados():
+    """Siglas das UFs cadastradas em data/configuracoes.json"""
+    try:
+        with open(CONFIGURACOES_FILE, encoding="utf-8") as f:
+            return {estado["sigla"].lower() for estado in json.load(f)["estados"]}
+    except (OSError, ValueError, KeyError):
+        return set()
+
+def namespace_planilha(caminho, siglas):
+    """Nome do diretorio de saida de uma planilha do lote
+
+    Usa a sigla da UF presente no nome do arquivo (ex.: precos-sp.xlsx -> sp);
+    sem UF reconhecida usa o proprio nome do arquivo normalizado.
+    """
+    tokens = [t for t in re.split(r"[^0-9a-z]+", caminho.stem.lower()) if t]
+    for token in reversed(tokens):
+        if token in siglas:
+            return token
+    return "-".join(tokens) or "planilha"
+
+def listar_planilhas_lote(origem):
+    """Planilhas de um diretorio (*.xlsx) ou de um padrao glob"""
+    if Path(origem).is_dir():
+        candidatos = Path(origem).glob("*.xlsx")
+    else:
+        import glob
+
+        candidatos = (Path(p) for p in glob.glob(origem))
+    # Ignora arquivos de trava do Excel (~$arquivo.xlsx)
+    return sorted(p for p in candidatos if p.is_file() and not p.name.startswith("~$"))
+
+def _extrair_item_lote(excel_file, namespace, incremental, formatos, com_metricas=False, cache=None,
+                      cobertura_minima=100.0, compacto=None, leitor="openpyxl"):
+    """Executa a extracao de uma planilha do lote em um processo do pool
+
+    A saida do console e capturada para nao intercalar os processos; erros sao
+    devolvidos no resumo em vez de propagados, para nao interromper o lote.
+    """
+    log = io.StringIO()
+    instrumentacao = ativar_instrumentacao() if com_metricas else None
+    try:
+        with redirect_stdout(log):
+            resumo = extrair_planilha(
+                excel_file,
+                PRICES_DIR / namespace,
+                incremental,
+                CACHE_DIR / f"manifest-{namespace}.json",
+                formatos,
+                DATA_DIR / namespace,
+                cache,
+                CACHE_DIR / f"ultima-extracao-{namespace}.json",
+                cobertura_minima=cobertura_minima,
+                compacto=compacto,
+                leitor=leitor,
+            )
+        resumo["erro"] = None
+    except Exception:
+        import traceback
+
+        resumo = {"planilha": str(excel_file), "itens": {}, "escritos": [], "inalterado": False,
+                  "erro": traceback.format_exc()}
+    resumo["namespace"] = namespace
+    resumo["log"] = log.getvalue()
+    if instrumentacao is not None:
+        instrumentacao.finalizar()
+        resumo["metricas"] = instrumentacao.eventos
+    return resumo
+
+def extrair_lote(origem, incremental=False, processos=None, formatos=("ts",), cache=None,
+                 cobertura_minima=100.0, compacto=None, leitor="openpyxl"):
+    """Extrai varias planilhas em paralelo, uma saida por UF em src/lib/prices/<uf>/
+    (e data/<uf>/ para a saida JSON)
+
+    Retorna a lista de resumos (na ordem dos arquivos); falhas ficam no campo
+    "erro" do resumo correspondente.
+    """
+    planilhas = listar_planilhas_lote(origem)
+    if not planilhas:
+        print(f"ERRO: Nenhuma planilha encontrada em: {origem}")
+        return []
+
+    siglas = siglas_estados()
+    namespaces = [namespace_planilha(p, siglas) for p in planilhas]
+    repetidos = {n for n in namespaces if namespaces.count(n) > 1}
+    if repetidos:
+        print(f"ERRO: Planilhas com o mesmo destino: {', '.join(sorted(repetidos))}")
+        return []
+
+    if processos is None:
+        try:
+            processos = len(os.sched_getaffinity(0))
+        except AttributeError:
+            processos = os.cpu_count() or 1
+    processos = max(1, min(processos, len(planilhas)))
+
+    print(f"\nPlanilhas no lote: {len(planilhas)} ({processos} processos)")
+    inicio = time.perf_counter()
+    # Importado aqui: multiprocessing so e necessario no modo lote
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=processos) as pool:
+        futuros = [
+            pool.submit(_extrair_item_lote, planilha, namespace, incremental, formatos,
+                        _instrumentacao is not None, cache, cobertura_minima, compacto, leitor)
+            for planilha, namespace in zip(planilhas, namespaces)
+        ]
+        resumos = []
+        for planilha, namespace, futuro in zip(planilhas, namespaces, futuros):
+            try:
+                resumos.append(futuro.result())
+                if _instrumentacao is not None:
+                    _instrumentacao.eventos += resumos[-1].pop("metricas", [])
+            except Exception:
+                import traceback
+
+                # Falha do proprio processo (ex.: morto pelo sistema)
+                resumos.append({"planilha": str(planilha), "namespace": namespace, "itens": {},
+                                "escritos": [], "inalterado": False, "log": "",
+                                "erro": traceback.format_exc()})
+    duracao = time.perf_counter() - inicio
+
+    # Resumo combinado
+    print(f"\n{'UF':<10} {'Materiais':>10} {'Mao obra':>10}  Situacao")
+    for resumo in resumos:
+        itens = resumo["itens"]
+        if resumo["erro"]:
+            situacao = "ERRO: " + resumo["erro"].strip().splitlines()[-1]
+        elif resumo["inalterado"]:
+            situacao = "inalterado"
+        else:
+            situacao = f"{len(resumo['escritos'])} arquivo(s) escrito(s)"
+        # Itens somados por tipo (casa, muro e piscina)
+        totais = {"materiais": "-", "mao-obra": "-"}
+        for registro in registro_abas():
+            if registro.aba in itens:
+                grupo = "materiais" if registro.tipo.startswith("materiais") else "mao-obra"
+                totais[grupo] = (0 if totais[grupo] == "-" else totais[grupo]) + itens[registro.aba]
+        print(f"{resumo['namespace']:<10} {totais['materiais']:>10} {totais['mao-obra']:>10}  {situacao}")
+
+    falhas = [r for r in resumos if r["erro"]]
+    print(f"\nTotal: {len(resumos)} planilha(s), {len(falhas)} falha(s) em {duracao:.1f}s")
+    for resumo in falhas:
+        print(f"\n--- {resumo['planilha']} ---\n{resumo['log']}{resumo['erro']}")
+    return resumos
+
+def emitir_metricas(destino, formato, finalizar=True):
+    """Grava as metricas coletadas (no modo lote cada processo ja finalizou as suas)"""
+    if _instrumentacao is None or not destino:
+        return
+    if finalizar:
+        _instrumentacao.finalizar()
+    conteudo = _instrumentacao.como_prometheus() if formato == "prometheus" else _instrumentacao.como_jsonl()
+    if destino == "-":
+        sys.stderr.write(conteudo)
+    elif formato == "prometheus":
+        from escrita_atomica import escrever_atomico
+
+        # O textfile collector exige substituicao atomica
+        escrever_atomico(Path(destino), conteudo.encode("utf-8"))
+    else:
+        with open(destino, "a", encoding="utf-8") as f:
+            f.write(conteudo)
+
+def vigiar(excel_file, destino, manifesto_path, formatos, cache=None, debounce=1.0,
+           intervalo=0.5, polling=False, metricas=None, metricas_formato="jsonl", diff_path=None,
+           cobertura_minima=100.0, historico_path=None, vigencia=None, compacto=None,
+           leitor="openpyxl"):
+    """Reextrai a planilha (incremental) a cada alteracao, ate Ctrl+C"""
+    from vigia_planilha import assinatura, criar_vigia, planilha_completa
+
+    vigia = criar_vigia(excel_file, polling, intervalo, dependencias=(MAPEAMENTOS_FILE,))
+    print(f"\nVigiando {excel_file} e {MAPEAMENTOS_FILE.name} ({vigia.metodo}, debounce {debounce}s). "
+          "Ctrl+C para sair.")
+    ultima = None
+    registro_carregado = assinatura(MAPEAMENTOS_FILE)
+    try:
+        while True:
+            atual = (assinatura(excel_file), assinatura(MAPEAMENTOS_FILE))
+            if atual[1] != registro_carregado:
+                # Registro editado: recompila os mapeamentos (e o leiaute do cache)
+                print(f"  {MAPEAMENTOS_FILE.name} alterado; recarregando os mapeamentos.")
+                registro_abas.cache_clear()
+                registro_carregado = atual[1]
+                if cache is not None:
+                    from cache_planilhas import CachePlanilhas
+
+                    cache = CachePlanilhas(cache.diretorio, cache.limite_bytes, leiaute_abas())
+            if atual[0] is None:
+                print("  Planilha ausente; aguardando...")
+            elif atual == ultima:
+                pass
+            elif not planilha_completa(excel_file):
+                print("  Planilha incompleta (gravacao em andamento?); aguardando...")
+            else:
+                inicio = time.perf_counter()
+                try:
+                    resumo = extrair_planilha(excel_file, destino, True, manifesto_path, formatos, cache=cache,
+                                              snapshot_path=SNAPSHOT_FILE, diff_path=diff_path,
+                                              cobertura_minima=cobertura_minima,
+                                              historico_path=historico_path, vigencia=vigencia,
+                                              compacto=compacto, leitor=leitor)
+                except ErroValidacao as e:
+                    print(f"ERRO: {e}; aguardando a proxima alteracao.")
+                except Exception:
+                    import traceback
+
+                    # Uma planilha com erro nao encerra o modo watch
+                    traceback.print_exc()
+                    print("ERRO na extracao; aguardando a proxima alteracao.")
+                else:
+                    ultima = atual
+                    print(f"[{datetime.now():%H:%M:%S}] Extracao em {time.perf_counter() - inicio:.2f}s: "
+                          f"{len(resumo['escritos'])} arquivo(s) regravado(s)")
+                if metricas:
+                    emitir_metricas(metricas, metricas_formato)
+                    ativar_instrumentacao()
+
+            vigia.esperar()
+            # Salvar no Excel gera varios eventos (temporario, rename, atributos)
+            while vigia.esperar(debounce):
+                pass
+    except KeyboardInterrupt:
+        print("\nEncerrando modo watch.")
+    finally:
+        vigia.close()
+
+def extrair_upload(conteudo, cobertura_minima=100.0, leitor="openpyxl"):
+    """Extrai uma planilha recebida em memoria (comando serve), sem gravar nada
+
+    Retorna o resultado enviado pelo daemon: o ArquivoPrecos de cada aba
+    encontrada (o mesmo que --formato json gravaria em data/), itens, a
+    cobertura por aba, as abas reprovadas (abaixo de cobertura_minima) e o
+    log da extracao.
+    """
+    log = io.StringIO()
+    with redirect_stdout(log):
+        fonte = LEITORES[leitor](io.BytesIO(conteudo))
+        detalhes, diagnosticos = {}, {}
+        try:
+            resultados = extrair_abas(fonte, detalhes=detalhes, diagnosticos=diagnosticos)
+        finally:
+            fonte.close()
+        relatorios = validar_extracao(resultados, diagnosticos, carregar_indice_esperado(DATA_DIR),
+                                      cobertura_minima)
+        imprimir_validacao(relatorios)
+
+    arquivos = []
+    for registro in registro_abas():
+        if registro.aba not in relatorios:
+            continue
+        precos = resultados[registro.aba]
+        anterior = carregar_json(DATA_DIR / registro.arquivo)
+        arquivos.append({
+            "tipo": registro.tipo,
+            "dados": montar_arquivo_precos(precos, detalhes[registro.aba], registro, anterior),
+            "itensEncontrados": contar_itens(precos),
+        })
+    return {
+        "arquivos": arquivos,
+        "cobertura": {relatorio["rotulo"]: relatorio["cobertura"] for relatorio in relatorios.values()},
+        "reprovadas": [relatorio["rotulo"] for relatorio in relatorios.values() if not relatorio["aprovada"]],
+        "log": log.getvalue(),
+    }
+
+def comando_extract(args, parser):
+    """Extracao da planilha principal, de um lote (--lote) ou continua (--watch)"""
+    if args.watch and args.lote:
+        parser.error("--watch nao pode ser combinado com --lote")
+    if args.diff and args.lote:
+        parser.error("--diff nao pode ser combinado com --lote (cada UF guarda seu snapshot em .cache)")
+    if args.historico and args.lote:
+        parser.error("--historico nao pode ser combinado com --lote")
+    if args.vigencia:
+        try:
+            datetime.strptime(args.vigencia, "%Y-%m-%d")
+        except ValueError:
+            parser.error(f"--vigencia invalida: {args.vigencia} (use AAAA-MM-DD)")
+    if args.leitor == "openpyxl" and importlib.util.find_spec("openpyxl") is None:
+        print("ERRO: openpyxl nao encontrado. Instale com: pip install openpyxl (ou use --leitor xml)")
+        sys.exit(1)
+    cache = None
+    if args.cache:
+        from cache_planilhas import CachePlanilhas
+
+        cache = CachePlanilhas(CACHE_DIR / "planilhas", int(args.cache_limite_mb * 1024 * 1024),
+                               leiaute_abas())
+    if args.metricas:
+        ativar_instrumentacao()
+    compacto = None
+    if args.ts_compacto or args.ts_json_parse:
+        compacto = {"casas": args.ts_casas, "json_parse": args.ts_json_parse}
+    formatos = FORMATOS if args.formato == "todos" else tuple(args.formato.split(","))
+    invalidos = [f for f in formatos if f not in FORMATOS]
+    if invalidos:
+        parser.error(f"formato invalido: {', '.join(invalidos)} (use {', '.join(FORMATOS)} ou todos)")
+    if "tabelas" in formatos and importlib.util.find_spec("numpy") is None:
+        print("ERRO: numpy nao encontrado (necessario para --formato tabelas). Instale com: pip install numpy")
+        sys.exit(1)
+    if "api" in formatos and importlib.util.find_spec("brotli") is None:
+        print("AVISO: brotli nao encontrado; respostas da API so em gzip. Instale com: pip install brotli")
+
     print("=" * 60)
     print("Extrator de Precos do Excel")
     print("=" * 60)
 
+    if args.lote:
+        resumos = extrair_lote(args.lote, args.incremental, args.processos, formatos, cache,
+                               args.cobertura_minima, compacto, args.leitor)
+        emitir_metricas(args.metricas, args.metricas_formato, finalizar=False)
+        if not resumos or any(r["erro"] for r in resumos):
+            sys.exit(1)
+        return
+
     # Verifica se arquivo existe
     if not EXCEL_FILE.exists():
         print(f"ERRO: Arquivo Excel nao encontrado: {EXCEL_FILE}")
@@ -587,85 +1790,317 @@ def main():
     print(f"\nArquivo Excel: {EXCEL_FILE}")
     print(f"Diretorio de saida: {PRICES_DIR}")
 
-    # Cria diretorio se nao existir
-    PRICES_DIR.mkdir(parents=True, exist_ok=True)
-
-    # Carrega o workbook
-    print("\nCarregando arquivo Excel...")
-    wb = load_workbook(EXCEL_FILE, data_only=True)
-
-    print(f"Abas encontradas: {wb.sheetnames}")
+    if args.watch:
+        vigiar(EXCEL_FILE, PRICES_DIR, args.manifesto, formatos, cache, args.debounce,
+               args.intervalo, args.polling, args.metricas, args.metricas_formato, args.diff,
+               args.cobertura_minima, args.historico, args.vigencia, compacto, args.leitor)
+        return
 
-    # Extrai dados do ORCAMENTO - CASA
-    print("\nExtraindo dados de ORCAMENTO - CASA...")
-    if "ORÇAMENTO - CASA" in wb.sheetnames:
-        ws_orcamento = wb["ORÇAMENTO - CASA"]
-        precos_materiais = extract_orcamento_casa(ws_orcamento)
-
-        # Conta itens extraidos
-        count = 0
-        for secao, dados in precos_materiais.items():
-            if isinstance(dados, dict):
-                if any(isinstance(v, dict) for v in dados.values()):
-                    for sub in dados.values():
-                        count += len([v for v in sub.values() if v > 0])
-                else:
-                    count += len([v for v in dados.values() if v > 0])
-        print(f"  Itens extraidos: {count}")
-    else:
-        print("  AVISO: Aba 'ORCAMENTO - CASA' nao encontrada")
-        precos_materiais = {}
-
-    # Extrai dados da MAO DE OBRA - CASA
-    print("\nExtraindo dados de MAO DE OBRA - CASA...")
-    if "MÃO DE OBRA - CASA" in wb.sheetnames:
-        ws_mao_obra = wb["MÃO DE OBRA - CASA"]
-        precos_mao_obra = extract_mao_obra_casa(ws_mao_obra)
-
-        # Conta itens extraidos
-        count = 0
-        for secao, dados in precos_mao_obra.items():
-            if isinstance(dados, dict):
-                if any(isinstance(v, dict) for v in dados.values()):
-                    for sub in dados.values():
-                        count += len([v for v in sub.values() if v > 0])
-                else:
-                    count += len([v for v in dados.values() if v > 0])
-        print(f"  Itens extraidos: {count}")
-    else:
-        print("  AVISO: Aba 'MAO DE OBRA - CASA' nao encontrada")
-        precos_mao_obra = {}
-
-    # Gera arquivos TypeScript
-    print("\nGerando arquivos TypeScript...")
-
-    # types.ts
-    types_file = PRICES_DIR / "types.ts"
-    with open(types_file, "w", encoding="utf-8") as f:
-        f.write(generate_types_ts())
-    print(f"  Criado: {types_file}")
-
-    # orcamento-casa.ts
-    orcamento_file = PRICES_DIR / "orcamento-casa.ts"
-    with open(orcamento_file, "w", encoding="utf-8") as f:
-        f.write(generate_orcamento_casa_ts(precos_materiais))
-    print(f"  Criado: {orcamento_file}")
-
-    # mao-obra-casa.ts
-    mao_obra_file = PRICES_DIR / "mao-obra-casa.ts"
-    with open(mao_obra_file, "w", encoding="utf-8") as f:
-        f.write(generate_mao_obra_casa_ts(precos_mao_obra))
-    print(f"  Criado: {mao_obra_file}")
-
-    # index.ts
-    index_file = PRICES_DIR / "index.ts"
-    with open(index_file, "w", encoding="utf-8") as f:
-        f.write(generate_index_ts())
-    print(f"  Criado: {index_file}")
+    try:
+        extrair_planilha(EXCEL_FILE, PRICES_DIR, args.incremental, args.manifesto, formatos, cache=cache,
+                         snapshot_path=SNAPSHOT_FILE, diff_path=args.diff,
+                         cobertura_minima=args.cobertura_minima, historico_path=args.historico,
+                         vigencia=args.vigencia, compacto=compacto, leitor=args.leitor)
+    except ErroValidacao as e:
+        emitir_metricas(args.metricas, args.metricas_formato)
+        print(f"\nERRO: {e}")
+        sys.exit(1)
+    emitir_metricas(args.metricas, args.metricas_formato)
 
     print("\n" + "=" * 60)
     print("Extracao concluida com sucesso!")
     print("=" * 60)
 
+def comando_validate(args, parser):
+    """Confere mapeamentos, arquivos gerados e cache sem abrir a planilha"""
+    print("=" * 60)
+    print("Validacao do Extrator")
+    print("=" * 60)
+    problemas = []
+
+    # O registro ja foi compilado (e validado) na importacao do modulo
+    print(f"\nMapeamentos: {len(registro_abas())} abas, "
+          f"{sum(len(registro.itens) for registro in registro_abas())} chaves ({MAPEAMENTOS_FILE.name})")
+
+    manifesto = carregar_manifesto(args.manifesto)
+    saidas = manifesto.get("saidas") or {}
+    if not saidas:
+        print(f"Sem manifesto em {args.manifesto}; arquivos gerados nao conferidos "
+              "(extract --incremental grava o manifesto)")
+    for nome, hash_esperado in saidas.items():
+        caminho = Path(nome)
+        if not caminho.exists():
+            problemas.append(f"{nome}: arquivo gerado ausente")
+        elif sha256_arquivo(caminho) != hash_esperado:
+            problemas.append(f"{nome}: conteudo diferente do registrado no manifesto")
+    if saidas:
+        print(f"Arquivos gerados: {len(saidas)} no manifesto")
+
+    for registro in registro_abas():
+        caminho = DATA_DIR / registro.arquivo
+        if not caminho.exists():
+            continue
+        dados = carregar_json(caminho)
+        if not isinstance(dados, dict) or not isinstance(dados.get("secoes"), dict):
+            problemas.append(f"{caminho}: nao e um ArquivoPrecos valido")
+        elif dados.get("tipo") != registro.tipo:
+            problemas.append(f"{caminho}: tipo '{dados.get('tipo')}' (esperado '{registro.tipo}')")
+
+    if args.cache:
+        from cache_planilhas import CachePlanilhas
+
+        cache = CachePlanilhas(CACHE_DIR / "planilhas", 0, leiaute_abas())
+        erros_cache = cache.verificar()
+        problemas += [f"cache {entrada[:12]}: {problema}" for entrada, problema in erros_cache]
+        print(f"Cache de planilhas: {len(erros_cache)} problema(s)")
+
+    for problema in problemas:
+        print(f"  ERRO: {problema}")
+    if problemas:
+        sys.exit(1)
+    print("\nNenhum problema encontrado.")
+
+def comando_diff(args, parser):
+    """Compara dois snapshots de extracao (ou dois ArquivoPrecos)"""
+    from diff_precos import comparar_snapshots, resumir_diff, serializar, snapshot_de_arquivo
+
+    snapshots = []
+    for caminho in (args.anterior, args.atual):
+        dados = carregar_json(caminho)
+        if not isinstance(dados, dict):
+            print(f"ERRO: nao foi possivel ler {caminho}")
+            sys.exit(1)
+        snapshots.append(snapshot_de_arquivo(dados, caminho.name))
+    diff = comparar_snapshots(*snapshots)
+    for linha in resumir_diff(diff, limite=args.limite):
+        print(linha)
+    if args.saida:
+        escrever_se_mudou(args.saida, serializar(diff))
+
+def comando_emit_types(args, parser):
+    """Regrava types.ts e index.ts, que nao dependem da planilha"""
+    for caminho, conteudo in ((args.destino / "types.ts", generate_types_ts(args.carimbo)),
+                              (args.destino / "index.ts", generate_index_ts(args.carimbo))):
+        if escrever_se_mudou(caminho, conteudo):
+            print(f"Criado: {caminho}")
+        else:
+            print(f"Sem alteracoes: {caminho}")
+
+def comando_historico(args, parser):
+    """Consulta o historico: precos vigentes em uma data ou serie de um item"""
+    from historico_precos import HistoricoPrecos
+
+    if not args.arquivo.exists():
+        print(f"ERRO: historico nao encontrado: {args.arquivo} (extract --historico cria o arquivo)")
+        sys.exit(1)
+    historico = HistoricoPrecos(args.arquivo)
+    try:
+        if args.serie:
+            pontos = historico.serie(args.serie, args.aba)
+            if args.json:
+                print(json.dumps([{"aba": aba, "vigencia": vigencia, "preco": preco}
+                                  for aba, vigencia, preco in pontos], ensure_ascii=False))
+            else:
+                for aba, vigencia, preco in pontos:
+                    print(f"{aba:<20} {vigencia}  {preco}")
+            return
+        data = args.em or datetime.now().strftime("%Y-%m-%d")
+        catalogos = {}
+        for aba in [args.aba] if args.aba else historico.abas():
+            vigencia, precos = historico.precos_em(aba, data)
+            if vigencia is not None:
+                catalogos[aba] = {"vigencia": vigencia, "precos": precos}
+        if args.json:
+            print(json.dumps(catalogos, ensure_ascii=False))
+            return
+        for aba, catalogo in catalogos.items():
+            print(f"{aba} (vigencia {catalogo['vigencia']}, {len(catalogo['precos'])} itens)")
+            for chave, preco in catalogo["precos"].items():
+                print(f"  {chave}: {preco}")
+    finally:
+        historico.close()
+
+def comando_serve(args, parser):
+    """Daemon de extracao para o upload do admin (ver scripts/servidor_extracao.py)"""
+    if args.leitor == "openpyxl" and importlib.util.find_spec("openpyxl") is None:
+        print("ERRO: openpyxl nao encontrado. Instale com: pip install openpyxl (ou use --leitor xml)")
+        sys.exit(1)
+    import asyncio
+    from functools import partial
+
+    from servidor_extracao import ServidorExtracao
+
+    servidor = ServidorExtracao(
+        partial(extrair_upload, cobertura_minima=args.cobertura_minima, leitor=args.leitor),
+        processos=args.processos,
+        limite_fila=args.fila,
+        timeout=args.timeout,
+        limite_cache=args.cache_respostas,
+        limite_upload=int(args.limite_upload_mb * 1024 * 1024),
+    )
+
+    def pronto(endereco):
+        print("=" * 60)
+        print("Daemon de Extracao")
+        print("=" * 60)
+        print(f"\nAtendendo em {endereco} ({servidor.processos} processos, fila {servidor.limite_fila}, "
+              f"timeout {servidor.timeout:g}s). Ctrl+C para sair.", flush=True)
+
+    asyncio.run(servidor.servir(args.socket, args.host, args.porta, pronto))
+    print("\nDaemon encerrado.")
+
+COMANDOS = {
+    "extract": comando_extract,
+    "validate": comando_validate,
+    "diff": comando_diff,
+    "emit-types": comando_emit_types,
+    "historico": comando_historico,
+    "serve": comando_serve,
+}
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    # Sem comando (ou so com opcoes) equivale a extract, como antes dos subcomandos
+    if not argv or (argv[0].startswith("-") and argv[0] not in ("-h", "--help")):
+        argv = ["extract", *argv]
+
+    parser = argparse.ArgumentParser(description="Extrai precos do Excel e gera arquivos TypeScript")
+    comandos = parser.add_subparsers(dest="comando", metavar="COMANDO", required=True)
+
+    extract = comandos.add_parser(
+        "extract", help="extrai a planilha e gera os arquivos (padrao)",
+        description="Extrai precos do Excel e gera arquivos TypeScript",
+        epilog="A planilha e lida em streaming, so nas abas registradas em "
+               "scripts/mapeamentos-planilha.json. Descricoes sem chave exata casam com a mais "
+               "parecida acima de um limiar (scripts/descricoes_planilha.py) e formulas sem "
+               "valor em cache sao calculadas (scripts/formulas_planilha.py). Antes de gravar, "
+               "os precos de cada aba sao conferidos contra as chaves esperadas e o relatorio "
+               "de cobertura e impresso. A gravacao e atomica: os arquivos de data/ podem ser "
+               "trocados em producao sem rebuild.")
+    extract.add_argument("--formato", default="ts",
+                         help="lista separada por virgulas: ts (src/lib/prices/*.ts), json "
+                              "(data/precos-*.json, ArquivoPrecos), bin (data/precos-*.bin, snapshot "
+                              "mmap), tabelas (data/tabelas-*.json, precos com INCC/BDI/CUB por UF, "
+                              "requer numpy), api (data/api, respostas prontas de /api/estados, "
+                              "/api/tipos e /api/admin/precos com gzip/brotli e ETag); "
+                              "todos = ts,json,bin,tabelas,api (padrao: %(default)s)")
+    extract.add_argument("--leitor", choices=sorted(LEITORES), default="openpyxl",
+                         help="leitura da planilha: openpyxl ou xml (direto do XML, mais rapido, "
+                              "mesmos valores; ver scripts/leitor_xlsx.py) (padrao: %(default)s)")
+    extract.add_argument("--incremental", action="store_true",
+                         help="so reprocessa se a planilha mudou e so regrava arquivos alterados")
+    extract.add_argument("--manifesto", type=Path, default=CACHE_DIR / "manifest.json",
+                         help="manifesto do modo incremental (padrao: %(default)s)")
+    extract.add_argument("--lote", metavar="DIR_OU_GLOB",
+                         help="extrai varias planilhas (uma por UF) em paralelo para src/lib/prices/<uf>/")
+    extract.add_argument("--processos", type=int, default=None,
+                         help="tamanho do pool no modo --lote (padrao: nucleos disponiveis)")
+    extract.add_argument("--metricas", metavar="ARQUIVO",
+                         help="grava metricas por etapa (tempo, CPU, linhas, memoria); '-' para stderr")
+    extract.add_argument("--metricas-formato", choices=["jsonl", "prometheus"], default="jsonl",
+                         help="jsonl (acrescenta uma linha JSON por evento) ou prometheus "
+                              "(textfile substituido a cada execucao) (padrao: %(default)s)")
+    extract.add_argument("--cache", action="store_true",
+                         help="guarda as abas lidas em .cache/extract-excel/planilhas, por SHA-256 da "
+                              "planilha, e as reaproveita em vez de abrir o XLSX de novo")
+    extract.add_argument("--cache-limite-mb", type=float, default=256,
+                         help="tamanho maximo do cache de planilhas (LRU) (padrao: %(default)s)")
+    extract.add_argument("--diff", metavar="ARQUIVO",
+                         help="grava em JSON os itens adicionados, removidos e com preco alterado "
+                              "em relacao a extracao anterior, e as secoes afetadas")
+    extract.add_argument("--cobertura-minima", type=float, default=100.0, metavar="PCT",
+                         help="cobertura minima das chaves esperadas por aba (itens ja publicados em "
+                              "data/ + \"obrigatorias\" do mapeamento); abaixo dela a extracao sai com "
+                              "erro antes de gravar qualquer arquivo. 0 = so o relatorio "
+                              "(padrao: %(default)s)")
+    extract.add_argument("--historico", nargs="?", const=HISTORICO_FILE, type=Path, metavar="ARQUIVO",
+                         help="acrescenta os precos extraidos ao historico SQLite "
+                              "(padrao: data/historico-precos.sqlite)")
+    extract.add_argument("--vigencia", metavar="AAAA-MM-DD",
+                         help="data de vigencia dos precos no historico (padrao: data da extracao)")
+    extract.add_argument("--ts-compacto", action="store_true",
+                         help="emite os .ts com chaves ordenadas, precos com --ts-casas casas decimais e "
+                              "uma constante exportada por secao (saida deterministica, sem data)")
+    extract.add_argument("--ts-casas", type=int, default=4, metavar="N",
+                         help="casas decimais dos precos em --ts-compacto (padrao: %(default)s)")
+    extract.add_argument("--ts-json-parse", action="store_true",
+                         help="como --ts-compacto, mas cada secao e um JSON.parse('...') "
+                              "(mais rapido de avaliar que um literal de objeto grande)")
+    extract.add_argument("--watch", action="store_true",
+                         help="fica em execucao e reextrai (incremental) a cada alteracao da planilha")
+    extract.add_argument("--debounce", type=float, default=1.0,
+                         help="segundos sem alteracoes antes de reextrair no modo --watch (padrao: %(default)s)")
+    extract.add_argument("--polling", action="store_true",
+                         help="no modo --watch, verifica a planilha periodicamente em vez de usar inotify")
+    extract.add_argument("--intervalo", type=float, default=0.5,
+                         help="intervalo do --polling em segundos (padrao: %(default)s)")
+
+    validate = comandos.add_parser("validate", help="confere mapeamentos, arquivos gerados e cache "
+                                                    "sem abrir a planilha")
+    validate.add_argument("--manifesto", type=Path, default=CACHE_DIR / "manifest.json",
+                          help="manifesto com os hashes dos arquivos gerados (padrao: %(default)s)")
+    validate.add_argument("--cache", action="store_true",
+                          help="confere tambem as entradas de .cache/extract-excel/planilhas")
+
+    diff = comandos.add_parser("diff", help="compara duas extracoes (snapshots ou ArquivoPrecos)")
+    diff.add_argument("anterior", type=Path, help="snapshot ou data/precos-*.json anterior")
+    diff.add_argument("atual", type=Path, nargs="?", default=SNAPSHOT_FILE,
+                      help="snapshot ou ArquivoPrecos atual (padrao: %(default)s)")
+    diff.add_argument("--saida", type=Path, help="grava o diff em JSON (formato em scripts/diff_precos.py)")
+    diff.add_argument("--limite", type=int, default=20,
+                      help="precos alterados listados por aba (padrao: %(default)s)")
+
+    emit_types = comandos.add_parser("emit-types", help="regrava types.ts e index.ts sem abrir a planilha")
+    emit_types.add_argument("--destino", type=Path, default=PRICES_DIR,
+                            help="diretorio de saida (padrao: %(default)s)")
+    emit_types.add_argument("--carimbo",
+                            help="texto do cabecalho no lugar da data de geracao (saida deterministica)")
+
+    historico = comandos.add_parser("historico", help="consulta o historico de precos (extract --historico)")
+    historico.add_argument("--arquivo", type=Path, default=HISTORICO_FILE,
+                           help="historico SQLite (padrao: data/historico-precos.sqlite)")
+    consulta = historico.add_mutually_exclusive_group()
+    consulta.add_argument("--em", metavar="AAAA-MM-DD",
+                          help="precos vigentes na data (padrao: hoje)")
+    consulta.add_argument("--serie", metavar="CHAVE",
+                          help="serie de precos de um item (ex.: cobertura.cobertaPadrao)")
+    historico.add_argument("--aba", help="tipo da aba (ex.: mao-obra-casa); padrao: todas")
+    historico.add_argument("--json", action="store_true", help="saida em JSON")
+
+    serve = comandos.add_parser("serve", help="daemon de extracao para o upload de planilhas do admin",
+                                description="Atende POST /extrair (corpo: .xlsx) e devolve o "
+                                            "ArquivoPrecos de cada aba em JSON")
+    endereco = serve.add_mutually_exclusive_group()
+    endereco.add_argument("--socket", metavar="CAMINHO",
+                          help="atende em um socket Unix (ex.: /tmp/extrator.sock) em vez de TCP")
+    endereco.add_argument("--porta", type=int, default=8765,
+                          help="porta TCP em --host (padrao: %(default)s)")
+    serve.add_argument("--host", default="127.0.0.1", help="endereco TCP (padrao: %(default)s)")
+    serve.add_argument("--processos", type=int, default=None,
+                       help="processos de extracao (padrao: nucleos disponiveis)")
+    serve.add_argument("--fila", type=int, default=16,
+                       help="extracoes admitidas ao mesmo tempo; acima disso responde 503 "
+                            "(padrao: %(default)s)")
+    serve.add_argument("--timeout", type=float, default=120.0,
+                       help="segundos por extracao antes de responder 504 (padrao: %(default)s)")
+    serve.add_argument("--cache-respostas", type=int, default=32,
+                       help="resultados guardados por SHA-256 do upload (LRU) (padrao: %(default)s)")
+    serve.add_argument("--limite-upload-mb", type=float, default=50,
+                       help="tamanho maximo da planilha recebida (padrao: %(default)s)")
+    serve.add_argument("--leitor", choices=sorted(LEITORES), default="openpyxl",
+                       help="leitura da planilha, como em extract (padrao: %(default)s)")
+    serve.add_argument("--cobertura-minima", type=float, default=100.0, metavar="PCT",
+                       help="abas abaixo desta cobertura sao listadas em reprovadas e o admin nao "
+                            "grava a importacao; 0 = so o relatorio (padrao: %(default)s)")
+
+    args = parser.parse_args(argv)
+    try:
+        COMANDOS[args.comando](args, comandos.choices[args.comando])
+    except BrokenPipeError:
+        # Saida fechada antes do fim (ex.: historico | head): encerra sem traceback,
+        # com stdout apontando para /dev/null para o flush final nao falhar de novo
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        sys.exit(1)
+
 if __name__ == "__main__":
     main()
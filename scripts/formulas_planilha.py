@@ -0,0 +1,512 @@
+"""
+Avaliador de formulas para planilhas salvas sem valores em cache.
+
+Usado por scripts/extract-excel.py. O Excel grava junto de cada formula o
+ultimo valor calculado, e e esse valor que o extrator le (data_only). Planilhas
+geradas por scripts ou por alguns editores online gravam so a formula: sem o
+avaliador o preco da coluna H viraria 0.0 e o item sumiria da extracao.
+
+Subconjunto suportado (o que as abas de preco usam):
+
+    numeros, textos ("..."), TRUE/FALSE
+    referencias A1, $A$1, intervalos A1:B3 e de outras abas: RESUMO!C3,
+        'MAO DE OBRA - CASA'!H5:H9
+    + - * / ^ & % (pos-fixo), - unario, comparacoes (= <> < > <= >=), parenteses
+    SUM, ROUND (arredondamento do Excel: metade para longe do zero)
+
+Formulas fora do subconjunto (outras funcoes, colunas inteiras, nomes
+definidos) valem #NAME? e sao listadas em AvaliadorFormulas.falhas; o preco
+fica sem valor e a validacao de cobertura do extrator acusa o item.
+
+Erros seguem o Excel: divisao por zero vale #DIV/0!, texto em conta vale
+#VALUE!, referencia circular vale #REF!, e um erro se propaga para as
+formulas que dependem da celula. Celulas vazias valem 0 nas contas.
+
+A avaliacao e sob demanda: so as celulas que alimentam as colunas extraidas
+sao calculadas. As dependencias de cada celula vem da formula compilada (uma
+vez por texto) e sao percorridas em profundidade sem recursao, de modo que
+cadeias longas (H10 = H9 * ...) nao estouram a pilha; cada celula e calculada
+uma unica vez (memorizada).
+"""
+
+import re
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+
+TOKEN = re.compile(r"""
+    (?P<espaco>\s+)
+  | (?P<texto>"(?:[^"]|"")*")
+  | (?P<aba>(?:'(?:[^']|'')+'|[^\W\d][\w.]*)!)
+  | (?P<funcao>[A-Za-z_][\w.]*(?=\())
+  | (?P<celula>\$?[A-Za-z]{1,3}\$?\d+)
+  | (?P<numero>(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)
+  | (?P<logico>(?:TRUE|FALSE)\b)
+  | (?P<operador><>|<=|>=|[-+*/^&%=<>:(),;])
+""", re.VERBOSE | re.IGNORECASE)
+CELULA = re.compile(r"(\$?)([A-Za-z]{1,3})(\$?)(\d+)")
+
+# Precedencia dos operadores binarios (maior liga mais forte)
+PRECEDENCIA = {"=": 1, "<>": 1, "<": 1, ">": 1, "<=": 1, ">=": 1, "&": 2, "+": 3, "-": 3, "*": 4, "/": 4, "^": 5}
+
+class ErroFormula(Exception):
+    """Formula fora do subconjunto suportado ou mal formada"""
+
+class ErroCelula(str):
+    """Valor de erro do Excel (#DIV/0!, #VALUE!, ...), propagado nas contas"""
+
+class Formula:
+    """Formula sem valor em cache, como lida da planilha (sem o "=")"""
+
+    __slots__ = ("texto",)
+
+    def __init__(self, texto):
+        self.texto = texto
+
+    def __repr__(self):
+        return f"Formula({self.texto!r})"
+
+def indice_coluna(letras):
+    """A -> 1, H -> 8, AA -> 27"""
+    indice = 0
+    for letra in letras.upper():
+        indice = indice * 26 + ord(letra) - 64
+    return indice
+
+def letras_coluna(indice):
+    """1 -> A, 27 -> AA"""
+    letras = ""
+    while indice:
+        indice, resto = divmod(indice - 1, 26)
+        letras = chr(65 + resto) + letras
+    return letras
+
+def tokens(texto):
+    """[(tipo, trecho)] da formula, sem espacos"""
+    resultado = []
+    posicao = 0
+    while posicao < len(texto):
+        encontrado = TOKEN.match(texto, posicao)
+        if encontrado is None:
+            raise ErroFormula(f"simbolo inesperado em {texto[posicao:posicao + 10]!r}")
+        if encontrado.lastgroup != "espaco":
+            resultado.append((encontrado.lastgroup, encontrado.group()))
+        posicao = encontrado.end()
+    return resultado
+
+def deslocar_formula(texto, linhas, colunas):
+    """Formula compartilhada (<f t="shared">) transposta para outra celula
+
+    As referencias relativas andam linhas/colunas; as absolutas ($) ficam.
+    """
+    def mover(encontrado):
+        coluna_fixa, letras, linha_fixa, numero = encontrado.groups()
+        coluna = indice_coluna(letras) + (0 if coluna_fixa else colunas)
+        linha = int(numero) + (0 if linha_fixa else linhas)
+        return f"{coluna_fixa}{letras_coluna(coluna)}{linha_fixa}{linha}"
+
+    partes = []
+    for tipo, trecho in tokens(texto):
+        partes.append(CELULA.sub(mover, trecho) if tipo == "celula" else trecho)
+    return "".join(partes)
+
+class _Compilador:
+    """Formula -> arvore de tuplas:
+
+    ("valor", v), ("ref", aba, linha, coluna),
+    ("intervalo", aba, linha1, coluna1, linha2, coluna2),
+    ("op", operador, a, b), ("neg", a), ("pct", a), ("funcao", nome, [args])
+    """
+
+    def __init__(self, texto, aba):
+        self.tokens = tokens(texto)
+        self.posicao = 0
+        self.aba = aba
+
+    def compilar(self):
+        arvore = self.expressao(0)
+        if self.posicao != len(self.tokens):
+            raise ErroFormula(f"sobra na formula: {self.tokens[self.posicao][1]!r}")
+        return arvore
+
+    def proximo(self):
+        return self.tokens[self.posicao] if self.posicao < len(self.tokens) else (None, None)
+
+    def consumir(self, esperado=None):
+        tipo, trecho = self.proximo()
+        if tipo is None or (esperado is not None and trecho != esperado):
+            raise ErroFormula(f"esperado {esperado or 'operando'}, encontrado {trecho!r}")
+        self.posicao += 1
+        return tipo, trecho
+
+    def expressao(self, minima):
+        esquerda = self.unario()
+        while True:
+            tipo, trecho = self.proximo()
+            if tipo != "operador" or PRECEDENCIA.get(trecho, 0) <= minima:
+                return esquerda
+            self.posicao += 1
+            # ^ e associativo a esquerda no Excel, como os demais
+            direita = self.expressao(PRECEDENCIA[trecho])
+            esquerda = ("op", trecho, esquerda, direita)
+
+    def unario(self):
+        tipo, trecho = self.proximo()
+        if tipo == "operador" and trecho in "+-":
+            self.posicao += 1
+            operando = self.unario()
+            return ("neg", operando) if trecho == "-" else operando
+        operando = self.primario()
+        while self.proximo() == ("operador", "%"):
+            self.posicao += 1
+            operando = ("pct", operando)
+        return operando
+
+    def primario(self):
+        tipo, trecho = self.consumir()
+        if tipo == "numero":
+            return ("valor", float(trecho))
+        if tipo == "texto":
+            return ("valor", trecho[1:-1].replace('""', '"'))
+        if tipo == "logico":
+            return ("valor", trecho.upper() == "TRUE")
+        if tipo == "aba":
+            nome = trecho[:-1]
+            if nome.startswith("'"):
+                nome = nome[1:-1].replace("''", "'")
+            tipo, trecho = self.consumir()
+            if tipo != "celula":
+                raise ErroFormula(f"referencia invalida apos {nome}!")
+            return self.referencia(nome, trecho)
+        if tipo == "celula":
+            return self.referencia(self.aba, trecho)
+        if tipo == "funcao":
+            return self.funcao(trecho.upper())
+        if trecho == "(":
+            arvore = self.expressao(0)
+            self.consumir(")")
+            return arvore
+        raise ErroFormula(f"operando inesperado: {trecho!r}")
+
+    def referencia(self, aba, trecho):
+        _, letras, _, numero = CELULA.fullmatch(trecho).groups()
+        linha, coluna = int(numero), indice_coluna(letras)
+        if self.proximo() != ("operador", ":"):
+            return ("ref", aba, linha, coluna)
+        self.posicao += 1
+        tipo, trecho = self.consumir()
+        if tipo == "aba":
+            # 'Aba'!A1:'Aba'!B2
+            tipo, trecho = self.consumir()
+        if tipo != "celula":
+            raise ErroFormula(f"intervalo invalido: {trecho!r}")
+        _, letras, _, numero = CELULA.fullmatch(trecho).groups()
+        linha2, coluna2 = int(numero), indice_coluna(letras)
+        return ("intervalo", aba, min(linha, linha2), min(coluna, coluna2), max(linha, linha2), max(coluna, coluna2))
+
+    def funcao(self, nome):
+        if nome.startswith("_XLFN."):
+            nome = nome[6:]
+        if nome not in FUNCOES:
+            raise ErroFormula(f"funcao nao suportada: {nome}")
+        self.consumir("(")
+        argumentos = []
+        if self.proximo() != ("operador", ")"):
+            while True:
+                argumentos.append(self.expressao(0))
+                if self.proximo() not in (("operador", ","), ("operador", ";")):
+                    break
+                self.posicao += 1
+        self.consumir(")")
+        return ("funcao", nome, argumentos)
+
+def compilar(texto, aba):
+    """Arvore da formula (ver _Compilador); aba e a aba da celula, para referencias locais"""
+    return _Compilador(texto.lstrip("="), aba).compilar()
+
+def referencias(arvore):
+    """Celulas (aba, linha, coluna) e intervalos referenciados pela formula"""
+    pendentes = [arvore]
+    while pendentes:
+        no = pendentes.pop()
+        tipo = no[0]
+        if tipo in ("ref", "intervalo"):
+            yield no
+        elif tipo == "op":
+            pendentes += (no[2], no[3])
+        elif tipo in ("neg", "pct"):
+            pendentes.append(no[1])
+        elif tipo == "funcao":
+            pendentes += no[2]
+
+def numero(valor):
+    """Valor como numero nas contas: vazio vale 0, texto numerico e convertido"""
+    if valor is None:
+        return 0.0
+    if isinstance(valor, ErroCelula):
+        return valor
+    if isinstance(valor, (bool, int, float)):
+        return float(valor)
+    try:
+        return float(valor)
+    except (TypeError, ValueError):
+        return ErroCelula("#VALUE!")
+
+def arredondar(valor, casas):
+    """ROUND do Excel: metade para longe do zero, casas negativas arredondam a esquerda"""
+    try:
+        resultado = Decimal(repr(valor)).quantize(Decimal(1).scaleb(-casas), rounding=ROUND_HALF_UP)
+    except InvalidOperation:
+        return valor
+    return float(resultado)
+
+def _soma(argumentos):
+    total = 0.0
+    for argumento, de_intervalo in argumentos:
+        if isinstance(argumento, ErroCelula):
+            return argumento
+        if de_intervalo:
+            # Em intervalos o SUM ignora texto, logicos e vazios
+            if isinstance(argumento, (int, float)) and not isinstance(argumento, bool):
+                total += argumento
+            continue
+        valor = numero(argumento)
+        if isinstance(valor, ErroCelula):
+            return valor
+        total += valor
+    return total
+
+def _round(argumentos):
+    if len(argumentos) != 2:
+        return ErroCelula("#VALUE!")
+    valor, casas = (numero(argumento) for argumento, _ in argumentos)
+    for operando in (valor, casas):
+        if isinstance(operando, ErroCelula):
+            return operando
+    return arredondar(valor, int(casas))
+
+# Funcoes suportadas: recebem [(valor, veio de intervalo)]
+FUNCOES = {"SUM": _soma, "ROUND": _round}
+
+def _ordem(valor):
+    # Excel: numeros < textos < logicos; textos sem diferenciar maiusculas
+    if isinstance(valor, bool):
+        return (2, valor)
+    if isinstance(valor, str):
+        return (1, valor.casefold())
+    return (0, valor)
+
+def _texto(valor):
+    """Valor como texto no operador &"""
+    if valor is None:
+        return ""
+    if isinstance(valor, bool):
+        return "TRUE" if valor else "FALSE"
+    if isinstance(valor, float) and valor.is_integer():
+        return str(int(valor))
+    return str(valor)
+
+def _comparar(operador, a, b):
+    # Vazio compara como 0 ou "", conforme o outro lado
+    if a is None:
+        a = "" if isinstance(b, str) else 0.0
+    if b is None:
+        b = "" if isinstance(a, str) else 0.0
+    a, b = _ordem(a), _ordem(b)
+    if operador == "=":
+        return a == b
+    if operador == "<>":
+        return a != b
+    if operador == "<":
+        return a < b
+    if operador == ">":
+        return a > b
+    if operador == "<=":
+        return a <= b
+    return a >= b
+
+def _operar(operador, a, b):
+    for operando in (a, b):
+        if isinstance(operando, ErroCelula):
+            return operando
+    if operador == "&":
+        return _texto(a) + _texto(b)
+    if PRECEDENCIA[operador] == 1:
+        return _comparar(operador, a, b)
+    a, b = numero(a), numero(b)
+    for operando in (a, b):
+        if isinstance(operando, ErroCelula):
+            return operando
+    if operador == "+":
+        return a + b
+    if operador == "-":
+        return a - b
+    if operador == "*":
+        return a * b
+    if operador == "/":
+        return a / b if b else ErroCelula("#DIV/0!")
+    try:
+        return float(a ** b)
+    except (OverflowError, ZeroDivisionError, TypeError):
+        return ErroCelula("#NUM!")
+
+class AvaliadorFormulas:
+    """Calcula celulas com Formula, sob demanda e memorizado
+
+    celulas(aba) devolve {(linha, coluna): valor ou Formula} da aba (chamado
+    uma vez por aba referenciada). falhas lista (aba, celula, motivo) das
+    formulas que nao puderam ser calculadas.
+    """
+
+    def __init__(self, celulas, abas=()):
+        self._ler_celulas = celulas
+        # Nomes de aba sem diferenciar maiusculas, como no Excel
+        self._abas = {nome.casefold(): nome for nome in abas}
+        self._celulas = {}
+        self._compiladas = {}
+        self._valores = {}
+        self.falhas = []
+        self.calculadas = 0
+
+    def _aba(self, nome):
+        nome = self._abas.get(nome.casefold(), nome)
+        celulas = self._celulas.get(nome)
+        if celulas is None:
+            try:
+                celulas = self._ler_celulas(nome)
+            except KeyError:
+                celulas = None
+            self._celulas[nome] = celulas
+        return celulas
+
+    def conteudo(self, aba, linha, coluna):
+        """Valor ou Formula gravado na celula (None se vazia ou a aba nao existe)"""
+        celulas = self._aba(aba)
+        return celulas.get((linha, coluna)) if celulas is not None else None
+
+    def _compilar(self, aba, texto):
+        chave = (aba, texto)
+        arvore = self._compiladas.get(chave)
+        if arvore is None:
+            try:
+                arvore = compilar(texto, aba)
+            except ErroFormula as e:
+                arvore = ("erro", "#NAME?", str(e))
+            self._compiladas[chave] = arvore
+        return arvore
+
+    def _dependencias(self, arvore):
+        """Celulas com Formula das quais a arvore depende"""
+        for no in referencias(arvore):
+            if no[0] == "ref":
+                _, aba, linha, coluna = no
+                if isinstance(self.conteudo(aba, linha, coluna), Formula):
+                    yield (self._abas.get(aba.casefold(), aba), linha, coluna)
+                continue
+            celulas = self._aba(no[1]) or {}
+            aba = self._abas.get(no[1].casefold(), no[1])
+            for linha, coluna in self._posicoes(celulas, no):
+                if isinstance(celulas[linha, coluna], Formula):
+                    yield (aba, linha, coluna)
+
+    @staticmethod
+    def _posicoes(celulas, intervalo):
+        """Celulas gravadas de um intervalo, em ordem de linha"""
+        _, _, linha1, coluna1, linha2, coluna2 = intervalo
+        if (linha2 - linha1 + 1) * (coluna2 - coluna1 + 1) > len(celulas):
+            # Intervalo maior que a aba (ex.: H1:H1048576): percorre as celulas gravadas
+            return sorted(p for p in celulas if linha1 <= p[0] <= linha2 and coluna1 <= p[1] <= coluna2)
+        return [(linha, coluna) for linha in range(linha1, linha2 + 1)
+                for coluna in range(coluna1, coluna2 + 1) if (linha, coluna) in celulas]
+
+    def valor(self, aba, linha, coluna, formula=None):
+        """Valor da celula, calculando a formula (e as que ela usa) se preciso
+
+        formula e a Formula ja lida da celula (evita consultar a aba inteira
+        quando a formula nao referencia a propria aba).
+        """
+        aba = self._abas.get(aba.casefold(), aba)
+        raiz = (aba, linha, coluna)
+        if raiz in self._valores:
+            return self._valores[raiz]
+        if formula is None:
+            formula = self.conteudo(aba, linha, coluna)
+            if not isinstance(formula, Formula):
+                return formula
+
+        # Ordem topologica das formulas pendentes, em profundidade sem recursao
+        formulas = {raiz: formula}
+        em_andamento = {raiz}
+        pilha = [(raiz, iter(self._dependencias(self._compilar(aba, formula.texto))))]
+        ordem = []
+        while pilha:
+            celula, dependencias = pilha[-1]
+            for dependencia in dependencias:
+                if dependencia in self._valores or dependencia in formulas and dependencia not in em_andamento:
+                    continue
+                if dependencia in em_andamento:
+                    self._falha(dependencia, "referencia circular")
+                    self._valores[dependencia] = ErroCelula("#REF!")
+                    continue
+                conteudo = self.conteudo(*dependencia)
+                formulas[dependencia] = conteudo
+                em_andamento.add(dependencia)
+                arvore = self._compilar(dependencia[0], conteudo.texto)
+                pilha.append((dependencia, iter(self._dependencias(arvore))))
+                break
+            else:
+                pilha.pop()
+                em_andamento.discard(celula)
+                ordem.append(celula)
+
+        for celula in ordem:
+            if celula in self._valores:
+                continue
+            arvore = self._compilar(celula[0], formulas[celula].texto)
+            if arvore[0] == "erro":
+                self._falha(celula, arvore[2])
+                self._valores[celula] = ErroCelula(arvore[1])
+                continue
+            self._valores[celula] = self._avaliar(arvore)
+            self.calculadas += 1
+        return self._valores[raiz]
+
+    def _falha(self, celula, motivo):
+        aba, linha, coluna = celula
+        self.falhas.append((aba, f"{letras_coluna(coluna)}{linha}", motivo))
+
+    def _celula(self, aba, linha, coluna):
+        conteudo = self.conteudo(aba, linha, coluna)
+        if isinstance(conteudo, Formula):
+            return self._valores.get((self._abas.get(aba.casefold(), aba), linha, coluna), ErroCelula("#REF!"))
+        return conteudo
+
+    def _avaliar(self, no):
+        tipo = no[0]
+        if tipo == "valor":
+            return no[1]
+        if tipo == "ref":
+            if self._aba(no[1]) is None:
+                return ErroCelula("#REF!")
+            return self._celula(*no[1:])
+        if tipo == "intervalo":
+            # Intervalo fora de uma funcao: o Excel usaria a intersecao implicita
+            return ErroCelula("#VALUE!")
+        if tipo == "op":
+            return _operar(no[1], self._avaliar(no[2]), self._avaliar(no[3]))
+        if tipo in ("neg", "pct"):
+            valor = numero(self._avaliar(no[1]))
+            if isinstance(valor, ErroCelula):
+                return valor
+            return -valor if tipo == "neg" else valor / 100
+        # Funcao: intervalos viram a lista dos valores das celulas
+        argumentos = []
+        for argumento in no[2]:
+            if argumento[0] == "intervalo":
+                celulas = self._aba(argumento[1])
+                if celulas is None:
+                    argumentos.append((ErroCelula("#REF!"), False))
+                    continue
+                for linha, coluna in self._posicoes(celulas, argumento):
+                    argumentos.append((self._celula(argumento[1], linha, coluna), True))
+            else:
+                argumentos.append((self._avaliar(argumento), False))
+        return FUNCOES[no[1]](argumentos)
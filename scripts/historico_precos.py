@@ -0,0 +1,107 @@
+"""
+Historico de precos extraidos, em SQLite (modo WAL).
+
+Usado por scripts/extract-excel.py: com --historico cada extracao acrescenta
+o catalogo completo de cada aba, com a data de vigencia (--vigencia, padrao
+a data da extracao). Consultas pelo comando historico do extrator ou por
+qualquer cliente SQLite (data/historico-precos.sqlite).
+
+Esquema (versao 1):
+
+    extracoes(id, vigencia, planilha, sha256, registrado_em)
+    precos(aba, vigencia, chave, preco, extracao)
+        PRIMARY KEY (aba, vigencia, chave)   catalogo de uma aba em uma data
+        INDEX precos_serie (chave, aba, vigencia)   serie de um item
+
+aba e o tipo do registro (ex.: "mao-obra-casa"); chave segue o formato
+"secao.campo" ou "secao.subsecao.campo"; vigencia e AAAA-MM-DD. Como cada
+extracao grava o catalogo inteiro, "precos em X" e o catalogo da maior
+vigencia <= X da aba (itens removidos somem a partir dali). Reextrair com a
+mesma vigencia substitui o catalogo daquela data.
+
+As duas consultas sao buscas por prefixo de indice: continuam na casa dos
+milissegundos com anos de snapshots mensais. Cada extracao e gravada em uma
+unica transacao (executemany).
+"""
+
+import sqlite3
+from datetime import datetime
+
+VERSAO_HISTORICO = 1
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS extracoes (
+    id INTEGER PRIMARY KEY,
+    vigencia TEXT NOT NULL,
+    planilha TEXT,
+    sha256 TEXT,
+    registrado_em TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS precos (
+    aba TEXT NOT NULL,
+    vigencia TEXT NOT NULL,
+    chave TEXT NOT NULL,
+    preco REAL NOT NULL,
+    extracao INTEGER NOT NULL REFERENCES extracoes(id),
+    PRIMARY KEY (aba, vigencia, chave)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS precos_serie ON precos (chave, aba, vigencia);
+"""
+
+class HistoricoPrecos:
+    def __init__(self, caminho):
+        self.conexao = sqlite3.connect(caminho)
+        self.conexao.execute("PRAGMA journal_mode=WAL")
+        # Com WAL, NORMAL so perde a ultima transacao em queda de energia, sem corromper
+        self.conexao.execute("PRAGMA synchronous=NORMAL")
+        versao = self.conexao.execute("PRAGMA user_version").fetchone()[0]
+        if versao not in (0, VERSAO_HISTORICO):
+            raise ValueError(f"{caminho}: historico na versao {versao} (esperada {VERSAO_HISTORICO})")
+        with self.conexao:
+            self.conexao.executescript(ESQUEMA)
+            self.conexao.execute(f"PRAGMA user_version={VERSAO_HISTORICO}")
+
+    def registrar(self, vigencia, abas, planilha=None, sha256=None):
+        """Grava {aba: [(chave, preco)]} com a vigencia (AAAA-MM-DD) em uma transacao"""
+        with self.conexao:
+            cursor = self.conexao.execute(
+                "INSERT INTO extracoes (vigencia, planilha, sha256, registrado_em) VALUES (?, ?, ?, ?)",
+                (vigencia, planilha, sha256, datetime.now().isoformat(timespec="seconds")),
+            )
+            extracao = cursor.lastrowid
+            for aba, itens in abas.items():
+                self.conexao.execute("DELETE FROM precos WHERE aba = ? AND vigencia = ?", (aba, vigencia))
+                self.conexao.executemany(
+                    "INSERT INTO precos (aba, vigencia, chave, preco, extracao) VALUES (?, ?, ?, ?, ?)",
+                    ((aba, vigencia, chave, preco, extracao) for chave, preco in itens),
+                )
+        return extracao
+
+    def abas(self):
+        return [linha[0] for linha in self.conexao.execute("SELECT DISTINCT aba FROM precos ORDER BY aba")]
+
+    def precos_em(self, aba, data):
+        """(vigencia, {chave: preco}) do catalogo da aba vigente na data, ou (None, {})"""
+        vigencia = self.conexao.execute(
+            "SELECT MAX(vigencia) FROM precos WHERE aba = ? AND vigencia <= ?", (aba, data)
+        ).fetchone()[0]
+        if vigencia is None:
+            return None, {}
+        linhas = self.conexao.execute(
+            "SELECT chave, preco FROM precos WHERE aba = ? AND vigencia = ? ORDER BY chave", (aba, vigencia)
+        )
+        return vigencia, dict(linhas)
+
+    def serie(self, chave, aba=None):
+        """[(aba, vigencia, preco)] de um item, em ordem de vigencia"""
+        # Sem estatisticas (ANALYZE) o planejador prefere a chave primaria por aba
+        if aba is None:
+            consulta = ("SELECT aba, vigencia, preco FROM precos INDEXED BY precos_serie "
+                        "WHERE chave = ? ORDER BY aba, vigencia")
+            return self.conexao.execute(consulta, (chave,)).fetchall()
+        consulta = ("SELECT aba, vigencia, preco FROM precos INDEXED BY precos_serie "
+                    "WHERE chave = ? AND aba = ? ORDER BY vigencia")
+        return self.conexao.execute(consulta, (chave, aba)).fetchall()
+
+    def close(self):
+        self.conexao.close()
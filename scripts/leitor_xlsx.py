@@ -0,0 +1,305 @@
+"""
+Leitor minimo de XLSX direto do XML, alternativa ao openpyxl no extrator.
+
+Usado por scripts/extract-excel.py (--leitor xml). Um .xlsx e um zip de XML:
+o leitor resolve as abas pedidas por xl/workbook.xml e seus rels, le cada
+xl/worksheets/sheetN.xml em streaming (expat, em blocos de TAMANHO_BLOCO) e
+devolve so as colunas pedidas, como tuplas (linha, valor, valor, ...), sem
+criar elementos XML, objetos de celula, estilos ou formulas: o texto so e
+acumulado nas celulas das colunas pedidas.
+
+Valores iguais aos do openpyxl com data_only=True (valor em cache das
+formulas; None quando nao ha cache):
+
+    t="s"          texto de xl/sharedStrings.xml
+    t="inlineStr"  texto do proprio <is>
+    t="str", "e"   texto de <v> (resultado de formula, erro como "#N/A")
+    t="b"          bool
+    t="d"          datetime (ISO 8601)
+    numero         int se o texto nao tiver ".", "e" ou "E"; senao float
+
+Com formulas=True (ou em celulas()), uma formula sem valor em cache vem como
+Formula, com o texto ja transposto para a celula no caso das formulas
+compartilhadas (<f t="shared">), para o avaliador de scripts/formulas_planilha.py.
+
+Numeros com formato de data continuam numeros (o openpyxl converteria para
+datetime): o extrator so le codigos, descricoes, unidades e precos.
+
+sharedStrings.xml e decodificado sob demanda: na abertura so as posicoes de
+cada <si> sao localizadas (busca em bytes); um texto e convertido quando uma
+celula lida o referencia, e fica memorizado.
+"""
+
+import re
+import zipfile
+from datetime import datetime
+from posixpath import dirname, join, normpath
+from xml.etree.ElementTree import fromstring
+from xml.parsers import expat
+
+from formulas_planilha import Formula, deslocar_formula
+
+REL_DOCUMENTO = "/officeDocument"
+REL_WORKSHEET = "/worksheet"
+REL_SHARED_STRINGS = "/sharedStrings"
+
+INICIO_SI = re.compile(rb"<(?:[A-Za-z_][\w.-]*:)?si[\s>/]")
+DECLARACOES_NS = re.compile(rb"""\sxmlns(?::[\w.-]+)?=("[^"]*"|'[^']*')""")
+COLUNA = re.compile(r"[A-Z]+")
+# Formula sem valor em cache: <f>...</f> ou <f .../> seguido de </c> (ou de <v/> vazio)
+SEM_VALOR = re.compile(rb"""
+    (?:</(?:[\w.-]+:)?f>|<(?:[\w.-]+:)?f\b[^>]*/>)
+    \s*(?:<(?:[\w.-]+:)?v\s*/>|<(?:[\w.-]+:)?v>\s*</(?:[\w.-]+:)?v>)?\s*
+    </(?:[\w.-]+:)?c>
+""", re.VERBOSE)
+TAMANHO_BLOCO = 1 << 16
+
+def local(tag):
+    """Nome sem o namespace: {http://...}row -> row"""
+    return tag.rsplit("}", 1)[-1]
+
+def indice_coluna(letras):
+    """A -> 1, H -> 8, AA -> 27"""
+    indice = 0
+    for letra in letras:
+        indice = indice * 26 + ord(letra) - 64
+    return indice
+
+def numero(texto):
+    """Mesma regra do openpyxl para celulas numericas"""
+    if "." in texto or "E" in texto or "e" in texto:
+        return float(texto)
+    return int(texto)
+
+def texto_rico(elemento):
+    """Texto de um <si> ou <is>: <t> direto ou runs <r><t>, sem a fonetica (<rPh>)"""
+    partes = []
+    for filho in elemento:
+        nome = local(filho.tag)
+        if nome == "t":
+            partes.append(filho.text or "")
+        elif nome == "r":
+            partes += [t.text or "" for t in filho if local(t.tag) == "t"]
+    return "".join(partes)
+
+class TextosCompartilhados:
+    """xl/sharedStrings.xml com decodificacao preguicosa por indice"""
+
+    def __init__(self, dados):
+        self.dados = dados
+        self.inicios = [m.start() for m in INICIO_SI.finditer(dados)]
+        # Fim do ultimo <si>: inicio do </sst>
+        self.fim = dados.rfind(b"</")
+        raiz = dados[:self.inicios[0]] if self.inicios else b""
+        # Declaracoes de namespace da raiz, repetidas em cada trecho decodificado
+        self.declaracoes = b"".join(m.group(0) for m in DECLARACOES_NS.finditer(raiz))
+        self._textos = {}
+
+    def __getitem__(self, indice):
+        texto = self._textos.get(indice)
+        if texto is None:
+            inicio = self.inicios[indice]
+            fim = self.inicios[indice + 1] if indice + 1 < len(self.inicios) else self.fim
+            elemento = fromstring(b"<x" + self.declaracoes + b">" + self.dados[inicio:fim] + b"</x>")
+            # Como o openpyxl, descarta o escape "_x005F_" de "_" literal
+            texto = self._textos[indice] = texto_rico(elemento[0]).replace("x005F_", "")
+        return texto
+
+class LeitorXlsx:
+    """Abas de um .xlsx (caminho ou arquivo binario) lidas direto do XML"""
+
+    def __init__(self, arquivo):
+        self.zip = zipfile.ZipFile(arquivo)
+        try:
+            documento = self._alvo("", "_rels/.rels", REL_DOCUMENTO) or "xl/workbook.xml"
+            rels = join(dirname(documento), "_rels", documento.rsplit("/", 1)[-1] + ".rels")
+            alvos = self._rels(dirname(documento), rels)
+            self.abas = {}
+            for elemento in fromstring(self.zip.read(documento)).iter():
+                if local(elemento.tag) == "sheet":
+                    rid = next((v for k, v in elemento.attrib.items() if local(k) == "id"), None)
+                    tipo, alvo = alvos.get(rid, (None, None))
+                    # Chartsheets e dialogsheets aparecem nos nomes, mas nao tem celulas
+                    self.abas[elemento.get("name")] = alvo if tipo and tipo.endswith(REL_WORKSHEET) else None
+            self.sheetnames = list(self.abas)
+            self._shared = next((alvo for tipo, alvo in alvos.values() if tipo.endswith(REL_SHARED_STRINGS)), None)
+            self._textos = None
+        except BaseException:
+            self.zip.close()
+            raise
+
+    def _rels(self, base, caminho):
+        """{Id: (Type, caminho no zip)} de um arquivo .rels"""
+        try:
+            dados = self.zip.read(caminho)
+        except KeyError:
+            return {}
+        alvos = {}
+        for rel in fromstring(dados):
+            alvo = rel.get("Target", "")
+            caminho_zip = alvo.lstrip("/") if alvo.startswith("/") else normpath(join(base, alvo))
+            alvos[rel.get("Id")] = (rel.get("Type", ""), caminho_zip)
+        return alvos
+
+    def _alvo(self, base, caminho, tipo):
+        return next((alvo for t, alvo in self._rels(base, caminho).values() if t.endswith(tipo)), None)
+
+    @property
+    def textos(self):
+        if self._textos is None:
+            self._textos = TextosCompartilhados(self.zip.read(self._shared) if self._shared else b"")
+        return self._textos
+
+    def linhas(self, aba, colunas, formulas=False):
+        """(linha, *valores) das linhas com algum valor nas colunas pedidas (ex.: ("B", "H"))
+
+        As linhas vem em ordem, numeradas como na planilha (linhas sem valor
+        nessas colunas nao aparecem). Com formulas=True, celulas com formula
+        sem valor em cache vem como Formula (ver scripts/formulas_planilha.py)
+        em vez de None.
+        """
+        posicoes = {indice_coluna(letra): i for i, letra in enumerate(colunas)}
+        return self._percorrer(aba, posicoes, formulas)
+
+    def formulas_sem_valor(self, aba):
+        """True se a aba tem alguma formula sem valor em cache
+
+        Busca direto nos bytes do XML, sem interpretar: bem mais rapido que
+        ler as celulas, para decidir se o avaliador de formulas e necessario.
+        """
+        alvo = self.abas.get(aba)
+        if alvo is None:
+            return False
+        anterior = b""
+        with self.zip.open(alvo) as xml:
+            while bloco := xml.read(TAMANHO_BLOCO):
+                # Sobreposicao: uma ocorrencia pode cair entre dois blocos
+                if SEM_VALOR.search(anterior[-512:] + bloco):
+                    return True
+                anterior = bloco
+        return False
+
+    def celulas(self, aba):
+        """{(linha, coluna): valor ou Formula} de todas as celulas gravadas da aba"""
+        return {(numero_linha, coluna): valor
+                for numero_linha, valores in self._percorrer(aba, None, True)
+                for coluna, valor in valores.items()}
+
+    def _percorrer(self, aba, posicoes, formulas):
+        """Linhas da aba: (linha, *valores) das colunas em posicoes {coluna: posicao},
+        ou (linha, {coluna: valor}) de todas as colunas se posicoes for None"""
+        alvo = self.abas.get(aba)
+        if alvo is None:
+            if aba not in self.abas:
+                raise KeyError(f"aba nao encontrada: {aba}")
+            return
+        todas = posicoes is None
+        vazia = () if todas else (None,) * len(posicoes)
+        prontas = []
+        # Estado da linha e da celula atuais (o expat chama por elemento)
+        numero_linha = coluna = 0
+        valores = posicao = tipo = partes = destino = formula = None
+        fonetica = compartilhada = False
+        # Formulas compartilhadas: si -> (texto, linha, coluna) da celula mestre
+        mestres = {}
+        # "x:row" -> "row"; sao poucos nomes distintos
+        nomes = {}
+
+        def inicio(nome, atributos):
+            nonlocal numero_linha, coluna, valores, posicao, tipo, partes, destino, formula, fonetica, compartilhada
+            nome = nomes.get(nome) or nomes.setdefault(nome, nome.rpartition(":")[2])
+            if nome == "c":
+                referencia = atributos.get("r")
+                coluna = indice_coluna(COLUNA.match(referencia).group()) if referencia else coluna + 1
+                posicao = coluna if todas else posicoes.get(coluna)
+                tipo = atributos.get("t")
+                partes = formula = None
+            elif nome == "row":
+                r = atributos.get("r")
+                numero_linha = int(r) if r else numero_linha + 1
+                coluna = 0
+                valores = None
+            elif nome == "f":
+                # Mestres de formulas compartilhadas sao guardados em qualquer coluna
+                if formulas:
+                    compartilhada = atributos.get("t") == "shared" and atributos.get("si")
+                    formula = destino = []
+            elif posicao is None:
+                return
+            elif tipo == "inlineStr":
+                # Texto dos <t> de <is>, fora da fonetica (<rPh>)
+                if nome == "is":
+                    partes = []
+                elif nome == "rPh":
+                    fonetica = True
+                elif nome == "t" and partes is not None and not fonetica:
+                    destino = partes
+            elif nome == "v":
+                partes = destino = []
+
+        def fim(nome):
+            nonlocal valores, posicao, destino, formula, fonetica
+            nome = nomes.get(nome) or nomes.setdefault(nome, nome.rpartition(":")[2])
+            if nome == "c":
+                if posicao is not None:
+                    valor = self._valor(tipo, partes)
+                    if valor is None and formula:
+                        valor = Formula(formula)
+                    if valor is not None:
+                        if valores is None:
+                            valores = {} if todas else list(vazia)
+                        valores[posicao] = valor
+                    posicao = None
+            elif nome == "row":
+                if valores is not None:
+                    prontas.append((numero_linha, valores) if todas else (numero_linha, *valores))
+            elif nome == "f" and formula is not None:
+                destino = None
+                formula = "".join(formula)
+                if compartilhada:
+                    if formula:
+                        mestres[compartilhada] = (formula, numero_linha, coluna)
+                    elif posicao is not None and compartilhada in mestres:
+                        texto, linha_mestre, coluna_mestre = mestres[compartilhada]
+                        formula = deslocar_formula(texto, numero_linha - linha_mestre, coluna - coluna_mestre)
+            elif nome == "rPh":
+                fonetica = False
+            else:
+                destino = None
+
+        def texto(dados):
+            if destino is not None:
+                destino.append(dados)
+
+        parser = expat.ParserCreate()
+        parser.buffer_text = True
+        parser.StartElementHandler = inicio
+        parser.EndElementHandler = fim
+        parser.CharacterDataHandler = texto
+        with self.zip.open(alvo) as xml:
+            while bloco := xml.read(TAMANHO_BLOCO):
+                parser.Parse(bloco, False)
+                yield from prontas
+                prontas.clear()
+            parser.Parse(b"", True)
+            yield from prontas
+
+    def _valor(self, tipo, partes):
+        if tipo == "inlineStr":
+            return "".join(partes) if partes is not None else None
+        # Como no openpyxl, <v></v> conta como celula vazia
+        texto = "".join(partes) if partes else None
+        if not texto:
+            return None
+        if tipo is None or tipo == "n":
+            return numero(texto)
+        if tipo == "s":
+            return self.textos[int(texto)]
+        if tipo == "b":
+            return texto == "1"
+        if tipo == "d":
+            return datetime.fromisoformat(texto.rstrip("Z"))
+        return texto
+
+    def close(self):
+        self.zip.close()
@@ -0,0 +1,632 @@
+"""
+Motor de orcamento em lote (NumPy), equivalente a calcularOrcamentoCompleto.
+
+Usado por scripts/orcamento-lote.py. Cada cenario e uma combinacao
+layout x tipo de telhado x tipo de tijolo x padrao de acabamento x UF; a
+grade inteira e avaliada com arrays, sem laco por cenario.
+
+As formulas sao as de src/lib/calculations (area.ts, estrutura.ts, casa.ts,
+mao-de-obra-casa.ts, muro.ts, piscina.ts e index.ts), na mesma ordem de
+operacoes e com o mesmo arredondamento (Math.round por item e por secao), de
+modo que os totais batem centavo a centavo com o TypeScript. Quem mudar uma
+formula la deve mudar aqui; orcamento-lote.py --paridade compara os dois.
+
+Eixos da grade (nesta ordem): layout, telhado, tijolo, padrao, estado.
+Cada parcela usa so os eixos de que depende e e expandida por broadcasting:
+
+    materiais da casa:   layout x telhado x tijolo x padrao
+    mao de obra da casa: layout x padrao x estado
+    muro e piscina:      layout (materiais), layout x estado (mao de obra)
+
+Dentro de uma parcela, quantidades e precos sao matrizes com um item por
+coluna (Q[..., item] e P[..., item]); o total de cada item e
+round(Q * P) e o subtotal de cada secao e a soma das colunas, na ordem dos
+itens. A mao de obra da casa usa o vetor de precos extraido da planilha
+(data/precos-mao-obra-casa.json); os materiais usam as constantes de
+src/lib/calculations/constants.ts, como o runtime.
+"""
+
+import json
+
+import numpy as np
+
+from tabelas_precos import CUB_BASE_PADRAO
+
+# src/lib/calculations/constants.ts
+PRECOS = {
+    "concretoPorM3": 450.00,
+    "cimentoPorSaco": 38.00,
+    "areiaPorM3": 120.00,
+    "ferroPorKg": 8.50,
+    "aramePorKg": 14.00,
+    "sapataPorUnidade": 180.00,
+    "argamassaPorM2": 25.00,
+    "eletricaPorM2": 85.00,
+    "hidraulicaPorM2": 65.00,
+    "pisoPorM2": 45.00,
+    "azulejoPorM2": 55.00,
+    "esquadriasPorM2": 120.00,
+    "pinturaPorM2": 18.00,
+    "muroMaoObraPorM2": 45.00,
+    "piscinaMaoObraPorM3": 250.00,
+    "piscinaAcabamentoPorM2": 120.00,
+}
+DESPERDICIO = {"materiais": 1.10, "ferro": 1.05, "concreto": 1.08}
+ALTURA_PAREDE = 2.80
+ESTRUTURA_MADEIRA_POR_M2 = 45.00
+BDI_CASA = 14.40
+
+# Campos de PRECOS_MAO_OBRA_CASA (src/lib/prices/mao-obra-casa.ts) que faltam no
+# arquivo extraido saem de precosBaseMaoObra em data/configuracoes.json, com os
+# mesmos valores padrao do TypeScript (None = sem padrao)
+MAO_OBRA_CONFIGURACOES = {
+    "movimentoTerra.escavacaoValasBaldrame": ("movimentoTerra", "escavacaoValas", None),
+    "movimentoTerra.escavacaoFundacao60x60": ("movimentoTerra", "escavacaoFundacao", None),
+    "movimentoTerra.reterroCompactacao": ("movimentoTerra", "reterroCompactacao", None),
+    "movimentoTerra.espalhamentoBase": ("movimentoTerra", "espalhamentoBase", None),
+    "movimentoTerra.apiloamentoFundoVala": ("movimentoTerra", "apiloamentoFundo", None),
+    "baldrameAlvenaria.alvenariaPedraArgamassada": ("baldrame", "alvenariaPedra", None),
+    "baldrameAlvenaria.cintaConcretoArmado": ("baldrame", "cintaConcreto", None),
+    "baldrameAlvenaria.impermeabilizacaoBaldrame": ("baldrame", "impermeabilizacao", None),
+    "baldrameAlvenaria.alvenariaTijoloFurado": ("baldrame", "alvenariaTijolo", None),
+    "fundacoesEstruturas.concretoPilaresVigas": ("estrutura", "concretoPilaresVigas", None),
+    "fundacoesEstruturas.formaDesforma": ("estrutura", "formaDesforma", None),
+    "fundacoesEstruturas.armaduraCA50": ("estrutura", "armaduraCA50", None),
+    "fundacoesEstruturas.lancamentoConcreto": ("estrutura", "lancamentoConcreto", None),
+    "fundacoesEstruturas.lajePrefabricada": ("estrutura", "lajePrefabricada", None),
+    "esquadriasFerragens.portaEntradaDecorativa": ("esquadrias", "portaEntrada", None),
+    "esquadriasFerragens.portaMadeiraLei": ("esquadrias", "portaMadeiraLei", None),
+    "esquadriasFerragens.esquadriaAluminio": ("esquadrias", "esquadriaAluminio", 35.0),
+    "esquadriasFerragens.cobogoAntiChuva": ("esquadrias", "cobogoAntiChuva", None),
+    "cobertura.cobertaPadrao": (None, None, 60.0),
+    "revestimentos.parede.chapiscoCimentoAreia": ("revestimentos", "chapisco", None),
+    "revestimentos.parede.rebocoCimentoAreia": ("revestimentos", "reboco", None),
+    "revestimentos.parede.embocoCimentoAreia": ("revestimentos", "emboco", None),
+    "revestimentos.parede.revestimentoCeramico": ("revestimentos", "ceramicaParede", None),
+    "revestimentos.parede.rejuntamentoPorcelanato": ("revestimentos", "rejuntamento", None),
+    "revestimentos.teto.gessoConvencionalForro": ("revestimentos", "gessoForro", None),
+    "revestimentos.pisos.concretoNaoEstruturalLastro": ("revestimentos", "concretoLastro", None),
+    "revestimentos.pisos.regularizacaoBase": ("revestimentos", "regularizacaoBase", None),
+    "revestimentos.pisos.revestimentoCeramico": ("revestimentos", "ceramicaPiso", None),
+    "revestimentos.pisos.rejuntamentoPorcelanato": ("revestimentos", "rejuntamento", None),
+    "revestimentos.pisos.soleirasGranito": ("revestimentos", "soleirasGranito", None),
+    "instalacaoHidraulica.tuboPVC50mm": ("hidraulica", "tuboPVC50mm", None),
+    "instalacaoHidraulica.tuboPVC32mm": ("hidraulica", "tuboPVC32mm", None),
+    "instalacaoHidraulica.tuboPVC25mm": ("hidraulica", "tuboPVC25mm", None),
+    "instalacaoHidraulica.caixaDagua1500L": ("hidraulica", "caixaDagua", None),
+    "instalacaoHidraulica.flange2pol": ("hidraulica", "flange", None),
+    "instalacaoHidraulica.flange1pol": ("hidraulica", "flange", None),
+    "instalacaoHidraulica.registroGaveta2pol": ("hidraulica", "registro", None),
+    "instalacaoHidraulica.registroGavetaCanopla": ("hidraulica", "registro", None),
+    "instalacaoHidraulica.registroPressaoChuveiro": ("hidraulica", "registro", None),
+    "instalacaoHidraulica.boiaMecanica": ("hidraulica", "boiaMecanica", None),
+    "instalacaoHidraulica.torneiraJardim": ("hidraulica", "torneiraJardim", 30.0),
+    "instalacaoHidraulica.bancadaGranitoLavatorio": ("hidraulica", "bancadaGranito", None),
+    "instalacaoHidraulica.baciaSanitaria": ("hidraulica", "baciaSanitaria", None),
+    "instalacaoHidraulica.chuveiroArticulado": ("hidraulica", "chuveiro", None),
+    "instalacaoHidraulica.bancadaGranitoCozinha": ("hidraulica", "bancadaGranito", None),
+    "instalacaoHidraulica.tanqueInox": ("hidraulica", "tanqueInox", None),
+    "instalacaoHidraulica.duchaHigienica": ("hidraulica", "duchaHigienica", 20.0),
+    "instalacaoSanitaria.caixaInspecao60x60": ("sanitaria", "caixaInspecao", None),
+    "instalacaoSanitaria.tuboPVCEsgoto100mm": ("sanitaria", "tuboPVC100mm", 31.20),
+    "instalacaoSanitaria.tuboPVCEsgoto75mm": ("sanitaria", "tuboPVC75mm", None),
+    "instalacaoSanitaria.tuboPVCEsgoto50mm": ("sanitaria", "tuboPVC50mm", None),
+    "instalacaoSanitaria.raloSifonado": ("sanitaria", "raloSifonado", None),
+    "instalacaoEletrica.quadroDistribuicao12": ("eletrica", "quadroDistribuicao", None),
+    "instalacaoEletrica.eletrodutoRigido32mm": ("eletrica", "eletrodutoRigido", None),
+    "instalacaoEletrica.eletrodutoFlexivel": ("eletrica", "eletrodutoFlexivel", None),
+    "instalacaoEletrica.caixaLigacaoPVC4x4": ("eletrica", "caixaPVC", None),
+    "instalacaoEletrica.caixaLigacaoPVC4x2": ("eletrica", "caixaPVC4x2", 4.50),
+    "instalacaoEletrica.caboIsoladoPVC1_5mm": ("eletrica", "caboPVC1_5mm", None),
+    "instalacaoEletrica.caboIsoladoPVC2_5mm": ("eletrica", "caboPVC2_5mm", None),
+    "instalacaoEletrica.caboIsoladoPVC4mm": ("eletrica", "caboPVC4mm", None),
+    "instalacaoEletrica.caboIsoladoPVC10mm": ("eletrica", "caboPVC10mm", None),
+    "instalacaoEletrica.disjuntor15A": ("eletrica", "disjuntor", None),
+    "instalacaoEletrica.disjuntor20A": ("eletrica", "disjuntor", None),
+    "instalacaoEletrica.disjuntor32A": ("eletrica", "disjuntor", None),
+    "instalacaoEletrica.disjuntor50A": ("eletrica", "disjuntor", None),
+    "instalacaoEletrica.hasteCobre": ("eletrica", "hasteCobre", None),
+    "instalacaoEletrica.interruptorTriplo": ("eletrica", "interruptor", None),
+    "instalacaoEletrica.interruptorDuplo": ("eletrica", "interruptor", None),
+    "instalacaoEletrica.interruptorCampainha": ("eletrica", "interruptor", None),
+    "instalacaoEletrica.tomadaTripla": ("eletrica", "tomada", None),
+    "instalacaoEletrica.pontoLogica": ("eletrica", "pontoLogica", None),
+    "instalacaoEletrica.pontoTV": ("eletrica", "pontoTV", None),
+    "instalacaoEletrica.luminariaLED": ("eletrica", "luminaria", None),
+    "gasGlp.tuboCobre15mm": ("gasGLP", "tuboCobre", None),
+    "gasGlp.testeEstanqueidade": ("gasGLP", "testeEstanqueidade", None),
+    "pintura.texturaExterna": ("pintura", "texturaExterna", None),
+    "pintura.emassamento": ("pintura", "emassamento", None),
+    "pintura.pinturaLatexPVA": ("pintura", "latexInterno", None),
+    "pintura.seladorMadeira": ("pintura", "seladorMadeira", None),
+    "pintura.esmalteSintetico": ("pintura", "esmalteSintetico", None),
+    "limpezaObra.transporteHorizontal": ("limpeza", "transporteHorizontal", None),
+    "limpezaObra.limpezaGeral": ("limpeza", "limpezaGeral", None),
+}
+
+# Campos que o extrator publica com outro nome (mapeamentos-planilha.json):
+# chave do TypeScript -> chave em data/precos-mao-obra-casa.json
+MAO_OBRA_ALIASES = {
+    "esquadriasFerragens.esquadriaAluminio": "esquadriasFerragens.janelaAluminio",
+    "instalacaoHidraulica.registroGaveta2pol": "instalacaoHidraulica.registroGaveta",
+    "instalacaoHidraulica.torneiraJardim": "instalacaoHidraulica.torneiraMetal",
+}
+
+# Colunas de cada cenario, na ordem da saida
+COLUNAS = (
+    "layout", "telhado", "tijolo", "padrao", "estado",
+    "areaTotalConstruida", "areaParedes", "areaTelhado",
+    "casaMateriais", "casaMaoObra", "muroMateriais", "muroMaoObra",
+    "piscinaMateriais", "piscinaMaoObra",
+    "totalMateriais", "totalMaoObra", "totalGeral",
+)
+
+# Cenarios por bloco: limita a memoria das matrizes intermediarias
+CENARIOS_POR_BLOCO = 65536
+
+def arredondar(valor):
+    """Math.round(valor * 100) / 100 do JavaScript (meio centavo arredonda para cima)"""
+    x = np.asarray(valor, dtype=np.float64) * 100
+    piso = np.floor(x)
+    return (piso + (x - piso >= 0.5)) / 100
+
+def achatar_arquivo_precos(dados):
+    """{chave: preco} de um ArquivoPrecos (data/precos-*.json) ou de tabelas-*.json
+
+    Chaves no formato "secao.campo" ou "secao.subsecao.campo", como em
+    achatar_precos do extrator.
+    """
+    if "chaves" in dados:
+        return dict(zip(dados["chaves"], dados["base"]))
+    precos = {}
+    for secao, conteudo in (dados.get("secoes") or {}).items():
+        for campo, item in (conteudo.get("itens") or {}).items():
+            precos[f"{secao}.{campo}"] = item["preco"]
+        for subsecao, sub in (conteudo.get("subSecoes") or {}).items():
+            for campo, item in (sub.get("itens") or {}).items():
+                precos[f"{secao}.{subsecao}.{campo}"] = item["preco"]
+    return precos
+
+def resolver_precos_mao_obra(extraidos, configuracoes):
+    """Vetor de precos da mao de obra da casa: {chave: preco} e {chave: origem}
+
+    Cada campo vem do arquivo extraido (pelo nome do TypeScript ou pelo de
+    MAO_OBRA_ALIASES); na falta, de precosBaseMaoObra ou do valor padrao de
+    src/lib/prices/mao-obra-casa.ts.
+    """
+    base = (configuracoes or {}).get("precosBaseMaoObra") or {}
+    precos, origens, faltando = {}, {}, []
+    for chave, (grupo, campo, padrao) in MAO_OBRA_CONFIGURACOES.items():
+        extraido = extraidos.get(chave) or extraidos.get(MAO_OBRA_ALIASES.get(chave))
+        if extraido:
+            precos[chave], origens[chave] = float(extraido), "planilha"
+        elif grupo and (base.get(grupo) or {}).get(campo):
+            precos[chave], origens[chave] = float(base[grupo][campo]), "configuracoes"
+        elif padrao is not None:
+            precos[chave], origens[chave] = padrao, "padrao"
+        else:
+            faltando.append(chave)
+    if faltando:
+        raise ValueError(f"precos de mao de obra ausentes: {', '.join(faltando)}")
+    return precos, origens
+
+def chaves_ignoradas(extraidos):
+    """Chaves do arquivo extraido que o motor nao usa (nem por alias)"""
+    usadas = set(MAO_OBRA_CONFIGURACOES) | set(MAO_OBRA_ALIASES.values())
+    return sorted(chave for chave in extraidos if chave not in usadas)
+
+class Catalogo:
+    """Tipos de telhado, tijolo, acabamento e UFs de data/configuracoes.json
+
+    Mesmas adaptacoes de src/lib/static-data.ts (preco por unidade do tijolo,
+    preco de material do telhado) e CUB de SP como base do fator de UF.
+    """
+
+    def __init__(self, configuracoes):
+        self.telhados = [(t["id"], t["nome"], t["precoMaterial"]) for t in configuracoes["tiposTelhado"]]
+        self.tijolos = [(t["id"], t["nome"], t["preco"] / t["consumoPorM2"], t["consumoPorM2"])
+                        for t in configuracoes["tiposTijolo"]]
+        self.padroes = [(p["id"], p["nome"], p["multiplicador"]) for p in configuracoes["padroesAcabamento"]]
+        self.estados = [(e["id"], e["sigla"], e["cub"]) for e in configuracoes["estados"]]
+        self.cub_base = next((cub for _, sigla, cub in self.estados if sigla == "SP" and cub), CUB_BASE_PADRAO)
+
+    def selecionar(self, grade):
+        """Filtra os eixos pelos ids (siglas, nas UFs) listados na grade; ausente = todos"""
+        def filtrar(itens, chave, por):
+            escolhidos = grade.get(chave)
+            if escolhidos is None:
+                return itens
+            indice = {item[por]: item for item in itens}
+            desconhecidos = [e for e in escolhidos if e not in indice]
+            if desconhecidos:
+                raise ValueError(f"{chave}: valores desconhecidos: {desconhecidos}")
+            return [indice[e] for e in escolhidos]
+
+        return (filtrar(self.telhados, "tiposTelhado", 0), filtrar(self.tijolos, "tiposTijolo", 0),
+                filtrar(self.padroes, "padroesAcabamento", 0), filtrar(self.estados, "estados", 1))
+
+class Layouts:
+    """Geometria e contagens de cada layout (area.ts e contarComodos de casa.ts)
+
+    layouts: [{"nome", "comodos": [{nome, largura, comprimento, peDireito}],
+               "reboco": {externo, interno}, "muro": {...}, "piscina": {...}}]
+    (os mesmos campos de DadosSimulacao).
+    """
+
+    def __init__(self, layouts):
+        self.nomes = []
+        colunas = {nome: [] for nome in (
+            "area", "paredes", "banheiros", "quartos", "comodos", "portas", "externo", "interno",
+            "muro", "frente", "fundo", "direita", "esquerda", "alturaMuro",
+            "piscina", "largura", "comprimento", "profundidade")}
+        for i, layout in enumerate(layouts):
+            comodos = layout.get("comodos") or []
+            if not comodos:
+                raise ValueError(f"layout {layout.get('nome', i)}: pelo menos um comodo e obrigatorio")
+            self.nomes.append(str(layout.get("nome", i)))
+            area = paredes = 0.0
+            banheiros = quartos = 0
+            for comodo in comodos:
+                largura, comprimento = comodo["largura"], comodo["comprimento"]
+                area = area + largura * comprimento
+                paredes = paredes + 2 * (largura + comprimento) * (comodo.get("peDireito") or ALTURA_PAREDE)
+                nome = str(comodo.get("nome", "")).lower()
+                if "banheiro" in nome or "lavabo" in nome or "wc" in nome:
+                    banheiros += 1
+                if "quarto" in nome or "dormit" in nome or "suite" in nome:
+                    quartos += 1
+            reboco = layout.get("reboco") or {}
+            muro = layout.get("muro") or {}
+            piscina = layout.get("piscina") or {}
+            valores = {
+                "area": area, "paredes": paredes, "banheiros": banheiros, "quartos": quartos,
+                "comodos": len(comodos), "portas": quartos + banheiros + 2,
+                "externo": bool(reboco.get("externo")), "interno": bool(reboco.get("interno")),
+                "muro": bool(muro.get("incluir")),
+                "piscina": bool(piscina.get("incluir")),
+                "alturaMuro": muro.get("altura", 0),
+            }
+            for campo in ("frente", "fundo", "direita", "esquerda"):
+                valores[campo] = muro.get(campo, 0)
+            for campo in ("largura", "comprimento", "profundidade"):
+                valores[campo] = piscina.get(campo, 0)
+            for nome, valor in valores.items():
+                colunas[nome].append(valor)
+        for nome, valores in colunas.items():
+            tipo = bool if nome in ("externo", "interno", "muro", "piscina") else np.float64
+            setattr(self, nome, np.array(valores, dtype=tipo))
+
+    def __len__(self):
+        return len(self.nomes)
+
+    def fatia(self, inicio, fim):
+        """Layouts [inicio, fim) como arrays com o eixo de layout (L, 1, 1, 1, 1)"""
+        return {nome: getattr(self, nome)[inicio:fim].reshape(-1, 1, 1, 1, 1)
+                for nome in vars(self) if nome != "nomes"}
+
+def _eixo(valores, eixo):
+    """Array 1D colocado no eixo indicado de (layout, telhado, tijolo, padrao, estado)"""
+    forma = [1] * 5
+    forma[eixo] = -1
+    return np.asarray(valores, dtype=np.float64).reshape(forma)
+
+def _matriz(colunas):
+    """Empilha colunas (broadcast entre si) em uma matriz [..., item]"""
+    return np.stack(np.broadcast_arrays(*colunas), axis=-1)
+
+def _subtotais(Q, P, tamanhos):
+    """criarSecao de cada secao: soma, na ordem, dos itens arredondados de round(Q * P)"""
+    totais = arredondar(Q * P)
+    subtotais, inicio = [], 0
+    for tamanho in tamanhos:
+        soma = 0.0
+        for coluna in range(inicio, inicio + tamanho):
+            soma = soma + totais[..., coluna]
+        subtotais.append(arredondar(soma))
+        inicio += tamanho
+    return subtotais
+
+def _secoes(secoes):
+    """Separa [[(quantidade, preco), ...], ...] em Q, P e tamanhos das secoes"""
+    itens = [item for secao in secoes for item in secao]
+    return (_matriz([q for q, _ in itens]), _matriz([p for _, p in itens]),
+            [len(secao) for secao in secoes])
+
+def materiais_casa(g, telhados, tijolos, padroes):
+    """totalMateriais de calcularOrcamentoCasa: (L, telhado, tijolo, padrao, 1)"""
+    area, paredes = g["area"], g["paredes"]
+    perimetro = 4 * np.sqrt(area)
+    area_telhado = area * 1.15 * 1.15
+    preco_telha = _eixo([t[2] for t in telhados], 1)
+    preco_tijolo = _eixo([t[2] for t in tijolos], 2)
+    tijolos_m2 = _eixo([t[3] for t in tijolos], 2)
+    mult = _eixo([p[2] for p in padroes], 3)
+    D = DESPERDICIO
+
+    # calcularEstrutura (estrutura.ts); multiplicadorFerro e sempre 1.0
+    pilares = np.maximum(4, np.ceil(area * 0.08))
+    ferro_total = (pilares * 24.0 * 1.0 * D["ferro"] + perimetro * 3.0 * 1.0 * D["ferro"]
+                   + area * 4.5 * D["ferro"] + perimetro * 2.5 * D["ferro"])
+    argamassa = paredes * 0.02 * D["materiais"]
+    area_telhado_desp = area_telhado * D["materiais"]
+
+    Q, P, tamanhos = _secoes([
+        [(perimetro * 0.4 * 0.6 * D["concreto"], PRECOS["concretoPorM3"]),
+         (np.ceil(area / 12), PRECOS["sapataPorUnidade"]),
+         (perimetro * 2.5 * D["ferro"], PRECOS["ferroPorKg"])],
+        [(pilares * 0.054 * D["concreto"], PRECOS["concretoPorM3"]),
+         (perimetro * 0.30 * 0.15 * D["concreto"], PRECOS["concretoPorM3"]),
+         (area * 0.12 * D["concreto"], PRECOS["concretoPorM3"]),
+         (ferro_total, PRECOS["ferroPorKg"]),
+         (ferro_total * 0.05, PRECOS["aramePorKg"])],
+        [(paredes * D["materiais"] * tijolos_m2, preco_tijolo),
+         (argamassa, PRECOS["concretoPorM3"] * 0.8),
+         (np.ceil(paredes / 10), PRECOS["cimentoPorSaco"]),
+         (argamassa * 3, PRECOS["areiaPorM3"])],
+        [(area_telhado_desp, preco_telha),
+         (area_telhado_desp, ESTRUTURA_MADEIRA_POR_M2),
+         (area_telhado * 0.1, preco_telha * 1.5)],
+        # Sem reboco o item zerado nao altera a soma
+        [(np.where(g["externo"], paredes * 0.4, 0.0), PRECOS["argamassaPorM2"]),
+         (np.where(g["interno"], paredes * 0.6, 0.0), PRECOS["argamassaPorM2"])],
+        [(area, PRECOS["pisoPorM2"] * mult),
+         (area * 0.3, PRECOS["azulejoPorM2"] * mult),
+         (area, PRECOS["esquadriasPorM2"] * mult),
+         (area, PRECOS["eletricaPorM2"] * mult),
+         (area, PRECOS["hidraulicaPorM2"] * mult),
+         (paredes, PRECOS["pinturaPorM2"] * mult)],
+    ])
+    total = 0.0
+    for subtotal in _subtotais(Q, P, tamanhos):
+        total = total + subtotal
+    return arredondar(total)
+
+def quantidades_mao_obra(g, pilares=None, fundos=6.0):
+    """Quantidades de calcularMaoObraCasaDetalhada, por secao: [[(chave, quantidade, usa_padrao)]]
+
+    Parametros como em calcularOrcamentoCasa (sem churrasqueira nem porta
+    decorativa, profundidade dos fundos de 6 m). A rota relatorio-completo
+    passa outros pilares (minimo 4) e o fundo do muro como profundidade.
+    """
+    area, paredes = g["area"], g["paredes"]
+    lado = np.sqrt(area)
+    perimetro = 4 * lado
+    area_telhado = area * 1.15 * 1.15
+    if pilares is None:
+        pilares = np.ceil(area / 12)
+    banheiros = np.where(g["banheiros"] > 0, g["banheiros"], 1)
+    quartos = np.where(g["quartos"] > 0, g["quartos"], 1)
+    comodos = np.where(g["comodos"] > 0, g["comodos"], 5)
+    portas = np.where(g["portas"] > 0, g["portas"], 5)
+    zero = np.zeros_like(area)
+
+    base_hidraulica = 2 + banheiros + 0
+    caixas = np.where(area > 100, 2.0, 1.0)
+    escavacao_fundacao = pilares * 0.6 * 0.6 * 0.6
+    concreto = (pilares * 0.15 * 0.15 * 2.8) + (perimetro * 0.12 * 0.3) + (area * 0.08)
+    ceramica_parede = (banheiros * 20) + 22
+    chapisco = paredes * 2
+    eletroduto = area * 2.5
+    triplo = comodos - banheiros
+    caixas_4x2 = 6 * comodos
+    pintura_externa = (2 * (lado + lado)) * 3.5
+    emassamento = chapisco - ceramica_parede + area - pintura_externa
+    madeira = portas * 4.1
+
+    return [
+        [("movimentoTerra.escavacaoValasBaldrame", perimetro * 0.4 * 0.4, False),
+         ("movimentoTerra.escavacaoFundacao60x60", escavacao_fundacao, False),
+         ("movimentoTerra.reterroCompactacao", escavacao_fundacao * 0.5, False),
+         ("movimentoTerra.espalhamentoBase", area * 0.15, False),
+         ("movimentoTerra.apiloamentoFundoVala", perimetro * 0.08, False)],
+        [("baldrameAlvenaria.alvenariaPedraArgamassada", perimetro * 0.3 * 0.7, False),
+         ("baldrameAlvenaria.cintaConcretoArmado", perimetro * 0.1 * 0.15 * 2.5, False),
+         ("baldrameAlvenaria.impermeabilizacaoBaldrame", perimetro * 1.0, False),
+         ("baldrameAlvenaria.alvenariaTijoloFurado", paredes, False)],
+        [("fundacoesEstruturas.concretoPilaresVigas", concreto, False),
+         ("fundacoesEstruturas.formaDesforma",
+          (pilares * 0.15 * 4 * 2.8) + (perimetro * 0.3 * 2) + (area * 0.3), False),
+         ("fundacoesEstruturas.armaduraCA50", (pilares * 25) + (perimetro * 3) + (area * 4.0), False),
+         ("fundacoesEstruturas.lancamentoConcreto", concreto, False),
+         ("fundacoesEstruturas.lajePrefabricada", area, False)],
+        [("esquadriasFerragens.portaEntradaDecorativa", zero, False),
+         ("esquadriasFerragens.portaMadeiraLei", portas, False),
+         ("esquadriasFerragens.esquadriaAluminio", (quartos + banheiros + 2) * 1.5, False),
+         ("esquadriasFerragens.cobogoAntiChuva", zero + 3, False)],
+        [("cobertura.cobertaPadrao", area_telhado, False)],
+        # 3.6 consolidada: parede, teto e pisos somados em uma secao
+        [("revestimentos.parede.chapiscoCimentoAreia", chapisco, False),
+         ("revestimentos.parede.rebocoCimentoAreia", paredes * 1.5, False),
+         ("revestimentos.parede.embocoCimentoAreia", ceramica_parede, False),
+         ("revestimentos.parede.revestimentoCeramico", ceramica_parede, True),
+         ("revestimentos.parede.rejuntamentoPorcelanato", ceramica_parede, False),
+         ("revestimentos.teto.gessoConvencionalForro", area, True),
+         ("revestimentos.pisos.concretoNaoEstruturalLastro", area * 0.05, False),
+         ("revestimentos.pisos.regularizacaoBase", area, False),
+         ("revestimentos.pisos.revestimentoCeramico", area, True),
+         ("revestimentos.pisos.rejuntamentoPorcelanato", area, False),
+         ("revestimentos.pisos.soleirasGranito", portas * 0.9, False)],
+        [("instalacaoHidraulica.tuboPVC50mm", zero + 9, False),
+         ("instalacaoHidraulica.tuboPVC32mm", base_hidraulica * 6, False),
+         ("instalacaoHidraulica.tuboPVC25mm", base_hidraulica * 9, False),
+         ("instalacaoHidraulica.caixaDagua1500L", caixas, False),
+         ("instalacaoHidraulica.flange2pol", caixas * 2, False),
+         ("instalacaoHidraulica.flange1pol", caixas, False),
+         ("instalacaoHidraulica.registroGaveta2pol", zero + 3, False),
+         ("instalacaoHidraulica.registroGavetaCanopla", base_hidraulica, False),
+         ("instalacaoHidraulica.registroPressaoChuveiro", banheiros, False),
+         ("instalacaoHidraulica.boiaMecanica", caixas, False),
+         ("instalacaoHidraulica.torneiraJardim", zero + 2, False),
+         ("instalacaoHidraulica.bancadaGranitoLavatorio", banheiros, True),
+         ("instalacaoHidraulica.baciaSanitaria", banheiros, False),
+         ("instalacaoHidraulica.chuveiroArticulado", banheiros, False),
+         ("instalacaoHidraulica.bancadaGranitoCozinha", zero + 1, True),
+         ("instalacaoHidraulica.tanqueInox", zero + 1, False),
+         ("instalacaoHidraulica.duchaHigienica", banheiros, False)],
+        [("instalacaoSanitaria.caixaInspecao60x60", zero + 4, False),
+         ("instalacaoSanitaria.tuboPVCEsgoto100mm", zero + fundos, False),
+         ("instalacaoSanitaria.tuboPVCEsgoto75mm", base_hidraulica * 6, False),
+         ("instalacaoSanitaria.tuboPVCEsgoto50mm", base_hidraulica * 9, False),
+         ("instalacaoSanitaria.raloSifonado", base_hidraulica, False)],
+        [("instalacaoEletrica.quadroDistribuicao12", zero + 1, False),
+         ("instalacaoEletrica.eletrodutoRigido32mm", lado, False),
+         ("instalacaoEletrica.eletrodutoFlexivel", eletroduto, False),
+         ("instalacaoEletrica.caixaLigacaoPVC4x4", zero + 5, False),
+         ("instalacaoEletrica.caixaLigacaoPVC4x2", caixas_4x2, False),
+         ("instalacaoEletrica.caboIsoladoPVC1_5mm", eletroduto, False),
+         ("instalacaoEletrica.caboIsoladoPVC2_5mm", eletroduto * 2, False),
+         ("instalacaoEletrica.caboIsoladoPVC4mm", eletroduto * 0.5, False),
+         ("instalacaoEletrica.caboIsoladoPVC10mm", zero + fundos * 3, False),
+         ("instalacaoEletrica.disjuntor15A", zero + 6, False),
+         ("instalacaoEletrica.disjuntor20A", zero + 6, False),
+         ("instalacaoEletrica.disjuntor32A", zero + 4, False),
+         ("instalacaoEletrica.disjuntor50A", zero + 2, False),
+         ("instalacaoEletrica.hasteCobre", zero + 3, False),
+         ("instalacaoEletrica.interruptorTriplo", triplo, False),
+         ("instalacaoEletrica.interruptorDuplo", portas, False),
+         ("instalacaoEletrica.interruptorCampainha", zero + 1, False),
+         ("instalacaoEletrica.tomadaTripla", caixas_4x2 - (triplo + portas + 1), False),
+         ("instalacaoEletrica.pontoLogica", zero + 2, False),
+         ("instalacaoEletrica.pontoTV", quartos + 1, False),
+         ("instalacaoEletrica.luminariaLED", comodos * 3, True)],
+        [("gasGlp.tuboCobre15mm", banheiros * 4, False),
+         ("gasGlp.testeEstanqueidade", zero + 1, False)],
+        [("pintura.texturaExterna", pintura_externa, True),
+         ("pintura.emassamento", emassamento, False),
+         ("pintura.pinturaLatexPVA", emassamento, True),
+         ("pintura.seladorMadeira", madeira, False),
+         ("pintura.esmalteSintetico", madeira, True)],
+        # 3.12 churrasqueira: vazia (subtotal 0)
+        [("limpezaObra.transporteHorizontal", zero + 20, False),
+         ("limpezaObra.limpezaGeral", zero + 1, False)],
+    ]
+
+def mao_obra_casa(g, precos, bdi_percentual, padroes, fatores):
+    """totalMaoObra de calcularOrcamentoCasa (com BDI): (L, 1, 1, padrao, estado)
+
+    Q: quantidades (L, ..., item); P: vetor de precos x fator da UF x
+    multiplicador do padrao nos itens de acabamento (..., padrao, estado, item).
+    """
+    secoes = quantidades_mao_obra(g)
+    itens = [item for secao in secoes for item in secao]
+    Q = _matriz([quantidade for _, quantidade, _ in itens])
+    vetor = np.array([precos[chave] for chave, _, _ in itens])
+    usa_padrao = np.array([usa for _, _, usa in itens])
+    mult = np.where(usa_padrao, _eixo([p[2] for p in padroes], 3)[..., None], 1.0)
+    P = vetor * fatores[..., None] * mult
+    subtotal = 0.0
+    for valor in _subtotais(Q, P, [len(secao) for secao in secoes]):
+        subtotal = subtotal + valor
+    total_geral = arredondar(subtotal + subtotal * (bdi_percentual / 100))
+    return arredondar(total_geral)
+
+def muro(g, fatores):
+    """Totais de calcularOrcamentoMuro: materiais (L, ...) e mao de obra (L, ..., estado)"""
+    comprimento = g["frente"] + g["fundo"] + g["direita"] + g["esquerda"]
+    altura = g["alturaMuro"]
+    area = comprimento * altura
+    area_desp = area * DESPERDICIO["materiais"]
+    pilares = np.ceil(comprimento / 3)
+    argamassa = area_desp * 0.015
+    Q, P, tamanhos = _secoes([[
+        (area_desp * 13, 3.50),
+        (comprimento * 0.3 * 0.4 * DESPERDICIO["concreto"], PRECOS["concretoPorM3"]),
+        (pilares * 0.2 * 0.2 * altura * DESPERDICIO["concreto"], PRECOS["concretoPorM3"]),
+        ((comprimento * 1.5 + pilares * 8) * DESPERDICIO["ferro"], PRECOS["ferroPorKg"]),
+        (argamassa, PRECOS["concretoPorM3"] * 0.8),
+        (area * 2, PRECOS["argamassaPorM2"]),
+        (np.ceil(comprimento / 5), PRECOS["cimentoPorSaco"]),
+        (argamassa * 3, PRECOS["areiaPorM3"]),
+    ]])
+    # O total de materiais do muro nao e arredondado por secao, so no fim
+    totais = arredondar(Q * P)
+    soma = 0.0
+    for coluna in range(tamanhos[0]):
+        soma = soma + totais[..., coluna]
+    materiais = np.where(g["muro"], arredondar(soma), 0.0)
+    mao_obra = np.where(g["muro"], arredondar(area * (PRECOS["muroMaoObraPorM2"] * fatores)), 0.0)
+    return materiais, mao_obra
+
+def piscina(g, fatores):
+    """Totais de calcularOrcamentoPiscina: materiais (L, ...) e mao de obra (L, ..., estado)"""
+    largura, comprimento, profundidade = g["largura"], g["comprimento"], g["profundidade"]
+    volume = largura * comprimento * profundidade
+    superficie = largura * comprimento + (2 * (largura * profundidade) + 2 * (comprimento * profundidade))
+    perimetro = 2 * (largura + comprimento)
+    Q, P, tamanhos = _secoes([[
+        ((largura + 1) * (comprimento + 1) * (profundidade + 0.3), 45.00),
+        (superficie * 0.15 * DESPERDICIO["concreto"], PRECOS["concretoPorM3"]),
+        (superficie * 5 * DESPERDICIO["ferro"], PRECOS["ferroPorKg"]),
+        (superficie * DESPERDICIO["materiais"], 85.00),
+        (superficie * DESPERDICIO["materiais"], PRECOS["piscinaAcabamentoPorM2"]),
+        (perimetro * 1.0, 95.00),
+        (np.ones_like(volume), volume * 150),
+        (np.ceil(volume / 15), 450.00),
+    ]])
+    totais = arredondar(Q * P)
+    soma = 0.0
+    for coluna in range(tamanhos[0]):
+        soma = soma + totais[..., coluna]
+    materiais = np.where(g["piscina"], arredondar(soma), 0.0)
+    mao_obra = np.where(g["piscina"], arredondar(volume * (PRECOS["piscinaMaoObraPorM3"] * fatores)), 0.0)
+    return materiais, mao_obra
+
+def avaliar_grade(layouts, eixos, precos, bdi_percentual, cub_base, cenarios_por_bloco=CENARIOS_POR_BLOCO):
+    """Gera blocos {coluna: array 1D} com os cenarios da grade, na ordem dos eixos
+
+    eixos: (telhados, tijolos, padroes, estados) de Catalogo.selecionar.
+    """
+    telhados, tijolos, padroes, estados = eixos
+    forma = (len(telhados), len(tijolos), len(padroes), len(estados))
+    por_layout = int(np.prod(forma))
+    fatores = _eixo([cub for _, _, cub in estados], 4) / cub_base
+    rotulos = (
+        _eixo(np.arange(len(telhados)), 1), _eixo(np.arange(len(tijolos)), 2),
+        _eixo(np.arange(len(padroes)), 3), _eixo(np.arange(len(estados)), 4),
+    )
+    nomes_eixos = (
+        np.array([t[1] for t in telhados], dtype=object), np.array([t[1] for t in tijolos], dtype=object),
+        np.array([p[1] for p in padroes], dtype=object), np.array([e[1] for e in estados], dtype=object),
+    )
+    nomes_layouts = np.array(layouts.nomes, dtype=object)
+    passo = max(1, cenarios_por_bloco // max(por_layout, 1))
+
+    for inicio in range(0, len(layouts), passo):
+        fim = min(inicio + passo, len(layouts))
+        g = layouts.fatia(inicio, fim)
+        cheia = (fim - inicio,) + forma
+
+        casa_materiais = materiais_casa(g, telhados, tijolos, padroes)
+        casa_mao_obra = mao_obra_casa(g, precos, bdi_percentual, padroes, fatores)
+        muro_materiais, muro_mao_obra = muro(g, fatores)
+        piscina_materiais, piscina_mao_obra = piscina(g, fatores)
+
+        # calcularOrcamentoCompleto (index.ts)
+        total_materiais = casa_materiais + muro_materiais + piscina_materiais
+        total_mao_obra = casa_mao_obra + muro_mao_obra + piscina_mao_obra
+        colunas = {
+            "layout": nomes_layouts[inicio:fim].reshape(-1, 1, 1, 1, 1),
+            "areaTotalConstruida": arredondar(g["area"]),
+            "areaParedes": arredondar(g["paredes"]),
+            "areaTelhado": arredondar(g["area"] * 1.15 * 1.15),
+            "casaMateriais": casa_materiais,
+            "casaMaoObra": casa_mao_obra,
+            "muroMateriais": muro_materiais,
+            "muroMaoObra": muro_mao_obra,
+            "piscinaMateriais": piscina_materiais,
+            "piscinaMaoObra": piscina_mao_obra,
+            "totalMateriais": arredondar(total_materiais),
+            "totalMaoObra": arredondar(total_mao_obra),
+            "totalGeral": arredondar(total_materiais + total_mao_obra),
+        }
+        for nome, rotulo, valores in zip(("telhado", "tijolo", "padrao", "estado"), rotulos, nomes_eixos):
+            colunas[nome] = valores[rotulo.astype(np.intp)]
+        yield {nome: np.broadcast_to(colunas[nome], cheia).ravel() for nome in COLUNAS}
+
+def carregar_grade(caminho):
+    """Le a grade de cenarios (JSON): {"layouts": [...], "tiposTelhado": [ids], ...}"""
+    with open(caminho, encoding="utf-8") as f:
+        grade = json.load(f)
+    if not grade.get("layouts"):
+        raise ValueError(f"{caminho}: a grade precisa de pelo menos um layout")
+    return grade
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Orcamentos em lote: avalia uma grade de cenarios com os precos extraidos.
+
+Uso: python3 scripts/orcamento-lote.py [--grade grade.json] [--saida orcamentos.csv]
+     python3 scripts/orcamento-lote.py --aleatorios 31 --saida orcamentos.parquet
+     python3 scripts/orcamento-lote.py --paridade [--amostras 200]
+
+Cada cenario combina um layout (comodos, reboco, muro e piscina, nos campos
+de DadosSimulacao) com um tipo de telhado, um tipo de tijolo, um padrao de
+acabamento e uma UF de data/configuracoes.json. A grade (padrao
+scripts/grade-orcamento.json) lista os layouts e, opcionalmente, os ids de
+tiposTelhado/tiposTijolo/padroesAcabamento e as siglas de estados; eixo
+ausente = todos. 37 layouts x todos os tipos e UFs dao ~100 mil cenarios.
+
+Os totais sao os de calcularOrcamentoCompleto (src/lib/calculations),
+calculados em bloco com NumPy (ver scripts/motor_orcamento.py). A mao de
+obra da casa usa os precos extraidos da planilha (--precos, padrao
+data/precos-mao-obra-casa.json; aceita tambem data/tabelas-mao-obra-casa.json).
+
+A saida e gravada em blocos, sem manter a grade inteira em memoria: CSV
+(padrao) ou Parquet (--formato parquet, requer pyarrow).
+
+Com --paridade uma amostra de cenarios e calculada tambem pelo TypeScript
+(scripts/paridade-orcamento.js, requer node e o typescript do projeto) com os
+mesmos precos de mao de obra; qualquer diferenca de centavo faz o script
+sair com erro.
+"""
+
+import argparse
+import csv
+import importlib.util
+import json
+import random
+import shutil
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+try:
+    import numpy as np
+except ImportError:
+    print("ERRO: numpy nao encontrado. Instale com: pip install numpy")
+    sys.exit(1)
+
+from motor_orcamento import (
+    BDI_CASA, COLUNAS, Catalogo, Layouts, achatar_arquivo_precos, avaliar_grade,
+    carregar_grade, chaves_ignoradas, resolver_precos_mao_obra,
+)
+
+# Caminhos
+SCRIPT_DIR = Path(__file__).parent
+DATA_DIR = SCRIPT_DIR.parent / "data"
+CONFIGURACOES_FILE = DATA_DIR / "configuracoes.json"
+PRECOS_MAO_OBRA_FILE = DATA_DIR / "precos-mao-obra-casa.json"
+GRADE_FILE = SCRIPT_DIR / "grade-orcamento.json"
+PARIDADE_JS = SCRIPT_DIR / "paridade-orcamento.js"
+TYPESCRIPT_DIR = SCRIPT_DIR.parent / "node_modules" / "typescript"
+
+COLUNAS_TEXTO = ("layout", "telhado", "tijolo", "padrao", "estado")
+COMODOS_ALEATORIOS = ("Sala", "Cozinha", "Quarto", "Suite", "Banheiro", "Lavabo",
+                      "Area de servico", "Escritorio", "Varanda")
+
+def carregar_json(caminho):
+    with open(caminho, encoding="utf-8") as f:
+        return json.load(f)
+
+def layouts_aleatorios(quantidade, semente):
+    """Layouts sinteticos para estudos e medicao de desempenho"""
+    aleatorio = random.Random(semente)
+    layouts = []
+    for i in range(quantidade):
+        comodos = [{"nome": aleatorio.choice(COMODOS_ALEATORIOS),
+                    "largura": round(aleatorio.uniform(1.5, 6), 1),
+                    "comprimento": round(aleatorio.uniform(1.5, 6), 1),
+                    "peDireito": aleatorio.choice((2.6, 2.8, 3.0))}
+                   for _ in range(aleatorio.randint(3, 12))]
+        muro = aleatorio.random() < 0.5
+        piscina = aleatorio.random() < 0.3
+        layouts.append({
+            "nome": f"aleatorio-{i + 1}",
+            "comodos": comodos,
+            "reboco": {"externo": aleatorio.random() < 0.8, "interno": aleatorio.random() < 0.7},
+            "muro": {"incluir": muro, "frente": round(aleatorio.uniform(8, 15), 1),
+                     "fundo": round(aleatorio.uniform(8, 15), 1),
+                     "direita": round(aleatorio.uniform(20, 35), 1),
+                     "esquerda": round(aleatorio.uniform(20, 35), 1),
+                     "altura": aleatorio.choice((1.8, 2.0, 2.2, 2.5))},
+            "piscina": {"incluir": piscina, "largura": round(aleatorio.uniform(2, 5), 1),
+                        "comprimento": round(aleatorio.uniform(4, 10), 1),
+                        "profundidade": aleatorio.choice((1.2, 1.4, 1.6))},
+        })
+    return layouts
+
+class SaidaCSV:
+    def __init__(self, caminho):
+        self.arquivo = open(caminho, "w", encoding="utf-8", newline="")
+        self.escritor = csv.writer(self.arquivo)
+        self.escritor.writerow(COLUNAS)
+
+    def gravar(self, bloco):
+        self.escritor.writerows(zip(*(bloco[nome].tolist() for nome in COLUNAS)))
+
+    def fechar(self):
+        self.arquivo.close()
+
+class SaidaParquet:
+    def __init__(self, caminho):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self.pa = pa
+        self.esquema = pa.schema([(nome, pa.string() if nome in COLUNAS_TEXTO else pa.float64())
+                                  for nome in COLUNAS])
+        self.escritor = pq.ParquetWriter(caminho, self.esquema)
+
+    def gravar(self, bloco):
+        colunas = [self.pa.array(bloco[nome].tolist() if nome in COLUNAS_TEXTO else bloco[nome])
+                   for nome in COLUNAS]
+        self.escritor.write_table(self.pa.Table.from_arrays(colunas, schema=self.esquema))
+
+    def fechar(self):
+        self.escritor.close()
+
+def preparar(grade, precos_arquivo):
+    """Catalogo, layouts, eixos e vetor de precos da grade"""
+    configuracoes = carregar_json(CONFIGURACOES_FILE)
+    catalogo = Catalogo(configuracoes)
+    layouts = Layouts(grade["layouts"])
+    eixos = catalogo.selecionar(grade)
+    extraidos = carregar_json(precos_arquivo)
+    achatados = achatar_arquivo_precos(extraidos)
+    precos, origens = resolver_precos_mao_obra(achatados, configuracoes)
+    bdi = extraidos.get("bdiPercentual", BDI_CASA)
+    return catalogo, layouts, eixos, precos, origens, bdi, chaves_ignoradas(achatados)
+
+def gerar(args, grade):
+    catalogo, layouts, eixos, precos, origens, bdi, ignoradas = preparar(grade, args.precos)
+    total = len(layouts) * int(np.prod([len(eixo) for eixo in eixos]))
+    contagem = {origem: list(origens.values()).count(origem) for origem in sorted(set(origens.values()))}
+
+    print(f"\nPrecos de mao de obra: {args.precos} (BDI {bdi}%)")
+    print("  " + ", ".join(f"{n} de {origem}" for origem, n in contagem.items()))
+    # Pelo nome: um campo renomeado na planilha aparece aqui em vez de sumir na contagem
+    for origem in sorted(set(origens.values()) - {"planilha"}):
+        print(f"  Fora da planilha ({origem}): {', '.join(c for c, o in origens.items() if o == origem)}")
+    if ignoradas:
+        print(f"  Extraidos e nao usados: {', '.join(ignoradas)}")
+    print(f"Cenarios: {len(layouts)} layouts x {' x '.join(str(len(e)) for e in eixos)} = {total}")
+
+    if args.formato == "parquet":
+        saida = SaidaParquet(args.saida)
+    else:
+        saida = SaidaCSV(args.saida)
+    inicio = time.perf_counter()
+    gravados = 0
+    try:
+        for bloco in avaliar_grade(layouts, eixos, precos, bdi, catalogo.cub_base):
+            saida.gravar(bloco)
+            gravados += len(bloco["layout"])
+    finally:
+        saida.fechar()
+    segundos = time.perf_counter() - inicio
+    print(f"  {gravados} cenarios em {segundos:.2f}s ({gravados / max(segundos, 1e-9):,.0f}/s) -> {args.saida}")
+
+def paridade(args, grade):
+    """Compara uma amostra da grade com calcularOrcamentoCompleto (TypeScript)"""
+    if shutil.which("node") is None:
+        print("ERRO: node nao encontrado; --paridade precisa do Node.js")
+        sys.exit(1)
+    if not (TYPESCRIPT_DIR / "package.json").exists():
+        print(f"ERRO: typescript nao instalado em {TYPESCRIPT_DIR.parent}; rode npm install")
+        sys.exit(1)
+    configuracoes = carregar_json(CONFIGURACOES_FILE)
+    catalogo = Catalogo(configuracoes)
+    telhados, tijolos, padroes, estados = catalogo.selecionar(grade)
+    aleatorio = random.Random(args.semente)
+    cenarios, chaves = [], []
+    for _ in range(args.amostras):
+        layout = aleatorio.randrange(len(grade["layouts"]))
+        escolha = (aleatorio.choice(telhados), aleatorio.choice(tijolos),
+                   aleatorio.choice(padroes), aleatorio.choice(estados))
+        dados = dict(grade["layouts"][layout])
+        dados.update(tipoTelhadoId=escolha[0][0], tipoTijoloId=escolha[1][0],
+                     padraoAcabamentoId=escolha[2][0], estadoId=escolha[3][0],
+                     incluirChurrasqueira=False)
+        cenarios.append(dados)
+        chaves.append((layout, escolha))
+
+    try:
+        execucao = subprocess.run(["node", str(PARIDADE_JS)], input=json.dumps({"cenarios": cenarios}),
+                                  capture_output=True, text=True)
+    except OSError as e:
+        print(f"ERRO: nao foi possivel executar node: {e}")
+        sys.exit(1)
+    if execucao.returncode != 0:
+        print(f"ERRO: {PARIDADE_JS.name} falhou\n{execucao.stderr}")
+        sys.exit(1)
+    referencia = json.loads(execucao.stdout)
+
+    # Mesmos precos do TypeScript: a comparacao e das formulas
+    precos = {}
+    for secao, campos in referencia["precosMaoObra"].items():
+        for campo, valor in campos.items():
+            if isinstance(valor, dict):
+                precos.update({f"{secao}.{campo}.{k}": v for k, v in valor.items()})
+            else:
+                precos[f"{secao}.{campo}"] = valor
+
+    divergencias = 0
+    for dados, (layout, escolha), esperado in zip(cenarios, chaves, referencia["resultados"]):
+        eixos = tuple([item] for item in escolha)
+        bloco = next(avaliar_grade(Layouts([grade["layouts"][layout]]), eixos, precos,
+                                   referencia["bdiPercentual"], catalogo.cub_base))
+        for coluna, valor in esperado.items():
+            calculado = float(bloco[coluna][0])
+            if calculado != valor:
+                divergencias += 1
+                print(f"  DIFERENCA {bloco['layout'][0]} / {' / '.join(str(e[1]) for e in escolha)}: "
+                      f"{coluna} TypeScript={valor} Python={calculado}")
+
+    print(f"\nParidade: {len(cenarios)} cenarios, {len(COLUNAS) - len(COLUNAS_TEXTO)} valores cada, "
+          f"{divergencias} diferencas")
+    if divergencias:
+        sys.exit(1)
+
+def main():
+    parser = argparse.ArgumentParser(description="Avalia uma grade de orcamentos em lote com os precos extraidos")
+    parser.add_argument("--grade", type=Path, default=GRADE_FILE,
+                        help="JSON com os layouts e os eixos da grade (padrao: %(default)s)")
+    parser.add_argument("--aleatorios", type=int, metavar="N",
+                        help="usa N layouts aleatorios em vez dos layouts da grade")
+    parser.add_argument("--semente", type=int, default=42,
+                        help="semente de --aleatorios e da amostra de --paridade (padrao: %(default)s)")
+    parser.add_argument("--precos", type=Path, default=PRECOS_MAO_OBRA_FILE,
+                        help="precos de mao de obra da casa extraidos (padrao: %(default)s)")
+    parser.add_argument("--saida", default="orcamentos.csv",
+                        help="arquivo de saida (padrao: %(default)s)")
+    parser.add_argument("--formato", choices=["csv", "parquet"],
+                        help="formato da saida (padrao: pela extensao de --saida, senao csv)")
+    parser.add_argument("--paridade", action="store_true",
+                        help="compara uma amostra da grade com o calculo em TypeScript")
+    parser.add_argument("--amostras", type=int, default=200,
+                        help="cenarios comparados em --paridade (padrao: %(default)s)")
+    args = parser.parse_args()
+    if args.formato is None:
+        args.formato = "parquet" if str(args.saida).endswith(".parquet") else "csv"
+    if args.formato == "parquet" and importlib.util.find_spec("pyarrow") is None:
+        print("ERRO: pyarrow nao encontrado (necessario para --formato parquet). Instale com: pip install pyarrow")
+        sys.exit(1)
+
+    print("=" * 60)
+    print("Orcamentos em Lote")
+    print("=" * 60)
+
+    try:
+        grade = carregar_grade(args.grade)
+        if args.aleatorios:
+            grade["layouts"] = layouts_aleatorios(args.aleatorios, args.semente)
+        if args.paridade:
+            paridade(args, grade)
+        else:
+            gerar(args, grade)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"ERRO: {e}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
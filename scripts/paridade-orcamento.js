@@ -0,0 +1,82 @@
+// Calcula orcamentos com o motor TypeScript (src/lib/calculations) para
+// conferencia com o motor em lote: python3 scripts/orcamento-lote.py --paridade
+//
+// Uso: node scripts/paridade-orcamento.js < cenarios.json
+//   entrada: {"cenarios": [DadosSimulacao, ...]}
+//   saida:   {"precosMaoObra": PRECOS_MAO_OBRA_CASA, "bdiPercentual": ..., "resultados": [...]}
+//
+// Os arquivos .ts sao transpilados em memoria com o typescript do projeto
+// (devDependency, npm install); o alias "@/" aponta para src/.
+
+const fs = require('fs');
+const path = require('path');
+const Module = require('module');
+
+const raiz = path.join(__dirname, '..');
+const ts = require(require.resolve('typescript', { paths: [raiz] }));
+
+const resolverOriginal = Module._resolveFilename;
+Module._resolveFilename = function (pedido, ...resto) {
+  if (pedido.startsWith('@/')) {
+    pedido = path.join(raiz, 'src', pedido.slice(2));
+  }
+  return resolverOriginal.call(this, pedido, ...resto);
+};
+
+require.extensions['.ts'] = (modulo, arquivo) => {
+  const { outputText } = ts.transpileModule(fs.readFileSync(arquivo, 'utf8'), {
+    compilerOptions: {
+      module: ts.ModuleKind.CommonJS,
+      target: ts.ScriptTarget.ES2020,
+      esModuleInterop: true,
+    },
+    fileName: arquivo,
+  });
+  modulo._compile(outputText, arquivo);
+};
+
+const { calcularOrcamentoCompleto } = require('@/lib/calculations');
+const { PRECOS_MAO_OBRA_CASA, BDI_PERCENTUAL } = require('@/lib/prices/mao-obra-casa');
+const {
+  getEstadoById,
+  getTipoTelhadoById,
+  getTipoTijoloById,
+  getPadraoAcabamentoById,
+} = require('@/lib/static-data');
+
+const { cenarios } = JSON.parse(fs.readFileSync(0, 'utf8'));
+
+const resultados = cenarios.map((dados) => {
+  const resultado = calcularOrcamentoCompleto({
+    dados,
+    tipoTelhado: getTipoTelhadoById(dados.tipoTelhadoId),
+    tipoTijolo: getTipoTijoloById(dados.tipoTijoloId),
+    padraoAcabamento: getPadraoAcabamentoById(dados.padraoAcabamentoId),
+    estado: getEstadoById(dados.estadoId),
+  });
+  const { breakdown } = resultado;
+  return {
+    areaTotalConstruida: resultado.areaTotalConstruida,
+    areaParedes: resultado.areaParedes,
+    areaTelhado: resultado.areaTelhado,
+    // Mesmo arredondamento de totalMateriais em calcularOrcamentoCasa
+    casaMateriais: Math.round(
+      ['fundacao', 'estrutura', 'alvenaria', 'telhado', 'reboco', 'acabamento']
+        .reduce((soma, secao) => soma + breakdown[secao].subtotal, 0) * 100
+    ) / 100,
+    casaMaoObra: breakdown.maoObraCasa.subtotal,
+    muroMateriais: resultado.muro ? resultado.muro.totalMateriais : 0,
+    muroMaoObra: resultado.muro ? resultado.muro.totalMaoObra : 0,
+    piscinaMateriais: resultado.piscina ? resultado.piscina.totalMateriais : 0,
+    piscinaMaoObra: resultado.piscina ? resultado.piscina.totalMaoObra : 0,
+    totalMateriais: resultado.totalMateriais,
+    totalMaoObra: resultado.totalMaoObra,
+    totalGeral: resultado.totalGeral,
+  };
+});
+
+process.stdout.write(JSON.stringify({
+  precosMaoObra: PRECOS_MAO_OBRA_CASA,
+  bdiPercentual: BDI_PERCENTUAL,
+  resultados,
+}));
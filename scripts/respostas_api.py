@@ -0,0 +1,145 @@
+"""
+Respostas pre-computadas das rotas de catalogo da API.
+
+Usado por scripts/extract-excel.py (--formato api), como ultima etapa da
+extracao, e lido por src/lib/api-estatica.ts. As rotas /api/estados,
+/api/tipos e /api/admin/precos?tipo=... servem dados que so mudam com a
+planilha ou com data/configuracoes.json: em vez de montar o JSON a cada
+requisicao, a rota devolve o arquivo pronto (ou 304).
+
+Layout (em data/api):
+
+    manifesto.json      {"versao": 2, "respostas": {nome: {
+                            "origens": {"configuracoes.json": sha256,  (relativos a data/)
+                                        "../src/lib/static-data.ts": sha256},
+                            "variantes": {"identity" | "gzip" | "br":
+                                          {"arquivo": ..., "etag": "\"...\"", "bytes": ...}}}}}
+    <nome>.json         corpo minificado, identico ao NextResponse.json da rota
+    <nome>.json.gz      gzip nivel 9 (mtime 0: mesmo corpo, mesmos bytes)
+    <nome>.json.br      brotli qualidade 11 (so com o pacote brotli instalado)
+
+Nomes: "estados", "tipos" e "precos-<tipo>" (ex.: precos-materiais-casa).
+O ETag e forte: 32 primeiros hex do SHA-256 dos bytes de cada variante
+(cada codificacao tem o seu). origens tem o hash de cada arquivo de que o
+corpo depende quando a resposta foi gerada: os dados (edicao pelo admin) e,
+em estados e tipos, src/lib/static-data.ts, cujo mapeamento corpo_estados e
+corpo_tipos reproduzem. A rota confere (memorizando por tamanho e mtime) e,
+se algum mudou depois, volta a montar a resposta como antes.
+
+Os numeros seguem o JSON.stringify: floats inteiros sem ".0" (1.0 -> 1).
+"""
+
+import gzip
+import hashlib
+import importlib.util
+import json
+import math
+import os
+from pathlib import Path
+
+from escrita_atomica import escrever_atomico
+
+VERSAO_RESPOSTAS = 2
+
+# Mesmo texto de getDescricaoPadrao (src/lib/static-data.ts)
+DESCRICOES_PADRAO = {
+    "LUXO": "Acabamento premium, materiais importados e de alta qualidade",
+    "ALTO PADRÃO": "Acabamento superior, materiais de qualidade",
+    "MÉDIO PADRÃO": "Acabamento médio, boa relação custo-benefício",
+    "BAIXO PADRÃO": "Acabamento básico, materiais econômicos",
+}
+
+def _como_js(valor):
+    """Floats inteiros viram int, como o JSON.stringify os escreve"""
+    if isinstance(valor, float) and valor.is_integer() and abs(valor) < 1e21:
+        return int(valor)
+    if isinstance(valor, dict):
+        return {chave: _como_js(item) for chave, item in valor.items()}
+    if isinstance(valor, list):
+        return [_como_js(item) for item in valor]
+    return valor
+
+def json_minificado(dados):
+    """Bytes do JSON sem espacos, como o corpo de NextResponse.json(dados)"""
+    return json.dumps(_como_js(dados), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def _arredondar_js(valor):
+    # Math.round: metade para cima (para +infinito)
+    return math.floor(valor + 0.5)
+
+def corpo_estados(config):
+    """GET /api/estados (estados de src/lib/static-data.ts)"""
+    return {"success": True, "data": [
+        {"id": e["id"], "sigla": e["sigla"], "nome": e["nome"], "cub": e["cub"],
+         "custoMaoObraPorM2": _arredondar_js(e["cub"] * 0.48)}
+        for e in config["estados"]
+    ]}
+
+def corpo_tipos(config):
+    """GET /api/tipos (tiposTelhado, tiposTijolo e padroesAcabamento de src/lib/static-data.ts)"""
+    return {"success": True, "data": {
+        "tiposTelhado": [
+            {"id": t["id"], "nome": t["nome"], "precoPorM2": t["precoMaterial"],
+             "precoMaoObraPorM2": t["precoMaoObra"]}
+            for t in config["tiposTelhado"]
+        ],
+        "tiposTijolo": [
+            {"id": t["id"], "nome": t["nome"], "precoUnidade": t["preco"] / t["consumoPorM2"],
+             "tijolosPorM2": t["consumoPorM2"], "multiplicadorFerro": 1.0}
+            for t in config["tiposTijolo"]
+        ],
+        "padroesAcabamento": [
+            {"id": p["id"], "nome": p["nome"], "multiplicadorPreco": p["multiplicador"],
+             "descricao": DESCRICOES_PADRAO.get(p["nome"], "")}
+            for p in config["padroesAcabamento"]
+        ],
+    }}
+
+def variantes(corpo):
+    """{codificacao: bytes} do corpo: identity, gzip e, com o pacote brotli, br"""
+    resultado = {"identity": corpo, "gzip": gzip.compress(corpo, compresslevel=9, mtime=0)}
+    if importlib.util.find_spec("brotli") is not None:
+        import brotli
+
+        resultado["br"] = brotli.compress(corpo, quality=11)
+    return resultado
+
+def gerar_respostas(destino, respostas):
+    """Grava as respostas e o manifesto em destino (data/api)
+
+    respostas: {nome: (caminhos das origens, dados da resposta)}; as origens
+    ficam no manifesto relativas ao diretorio pai de destino (data/). Arquivos com
+    o mesmo conteudo nao sao regravados. Retorna os nomes dos arquivos escritos.
+    """
+    destino.mkdir(parents=True, exist_ok=True)
+    escritos = []
+    manifesto = {"versao": VERSAO_RESPOSTAS, "respostas": {}}
+    for nome, (origens, dados) in sorted(respostas.items()):
+        entrada = {
+            "origens": {
+                Path(os.path.relpath(origem, destino.parent)).as_posix():
+                    hashlib.sha256(origem.read_bytes()).hexdigest()
+                for origem in origens
+            },
+            "variantes": {},
+        }
+        sufixos = {"identity": ".json", "gzip": ".json.gz", "br": ".json.br"}
+        for codificacao, conteudo in variantes(json_minificado(dados)).items():
+            arquivo = destino / f"{nome}{sufixos[codificacao]}"
+            entrada["variantes"][codificacao] = {
+                "arquivo": arquivo.name,
+                "etag": f'"{hashlib.sha256(conteudo).hexdigest()[:32]}"',
+                "bytes": len(conteudo),
+            }
+            if not arquivo.exists() or arquivo.read_bytes() != conteudo:
+                escrever_atomico(arquivo, conteudo)
+                escritos.append(arquivo.name)
+        manifesto["respostas"][nome] = entrada
+
+    # Manifesto por ultimo: a rota nunca aponta para um arquivo ainda nao gravado
+    caminho = destino / "manifesto.json"
+    conteudo = (json.dumps(manifesto, ensure_ascii=False, indent=2) + "\n").encode("utf-8")
+    if not caminho.exists() or caminho.read_bytes() != conteudo:
+        escrever_atomico(caminho, conteudo)
+        escritos.append(caminho.name)
+    return escritos
@@ -0,0 +1,370 @@
+"""
+Sensibilidade de precos e risco de custo (Monte Carlo) de uma casa de referencia.
+
+Usado por scripts/analise-risco.py. Sem o arredondamento por item, o
+orcamento da casa e linear nos precos do catalogo:
+
+    total = soma_i q_i * p_i
+
+p_i e o preco extraido (data/precos-materiais-casa.json e
+data/precos-mao-obra-casa.json; tijolo e telhado vem de
+data/configuracoes.json) e q_i a quantidade efetiva do item: a quantidade
+de calcularOrcamentoCasaDetalhado (materiais) ou calcularMaoObraCasaDetalhada
+(mao de obra), com os parametros da rota relatorio-completo, vezes os fatores
+que o TypeScript aplica ao preco (INCC nos materiais, fator da UF e BDI na mao
+de obra, multiplicador do padrao nos itens de acabamento). Sem churrasqueira,
+muro ou piscina. O total difere do relatorio so pelos centavos de
+arredondamento.
+
+Elasticidade de um item: q_i * p_i / total (+1% no preco -> +e% no total).
+
+Monte Carlo: cada secao de cada parcela ("materiais:pintura",
+"maoObra:pintura", ...) recebe um choque lognormal de media 1, correlacionado
+entre secoes (correlacao_secoes na mesma parcela, correlacao_parcelas entre
+materiais e mao de obra); opcionalmente cada item recebe ainda um choque
+independente. Os cenarios sao sorteados em blocos de matrizes
+(cenario x secao, cenario x item), sem laco por cenario.
+
+Seletores (choques e volatilidades): "parcela", "[parcela:]secao" ou
+"[parcela:]secao.campo" (prefixo da chave, ex.: fundacoesEstruturas.armaduraCA50);
+sem parcela, vale para as duas.
+"""
+
+import numpy as np
+
+from motor_orcamento import ALTURA_PAREDE, quantidades_mao_obra
+
+PARCELAS = ("materiais", "maoObra")
+
+# src/lib/prices/types.ts (FATOR_AJUSTE_MATERIAIS), quando o arquivo extraido nao traz fatorAjuste
+FATOR_AJUSTE_PADRAO = 0.0079
+
+# Chaves dos itens cujo preco vem do catalogo de data/configuracoes.json
+CHAVE_TIJOLO = "baldrameAlvenaria.tipoTijolo"
+CHAVE_TELHADO = "cobertura.tipoTelhado"
+
+PERCENTIS = (5, 10, 25, 50, 75, 90, 95)
+
+# Cenarios por bloco: limita a memoria das matrizes cenario x item
+CENARIOS_POR_BLOCO = 65536
+
+def parametros_relatorio(g):
+    """Parametros de calcularOrcamentoCasaDetalhado como a rota relatorio-completo os calcula
+
+    g: um layout de motor_orcamento.Layouts, {campo: escalar}.
+    """
+    area = float(g["area"])
+    banheiros = float(g["banheiros"]) or 1.0
+    quartos = float(g["quartos"]) or 1.0
+    return {
+        "area": area,
+        "paredes": float(g["paredes"]),
+        "perimetro": 4 * np.sqrt(area),
+        "areaTelhado": area * 1.15 * 1.15,
+        "pilares": max(4.0, np.ceil(area / 12)),
+        "banheiros": banheiros,
+        "quartos": quartos,
+        "portas": quartos + banheiros + 2,
+        "fundos": float(g["fundo"]) or 6.0,
+        "externo": bool(g["externo"]),
+        "interno": bool(g["interno"]),
+    }
+
+def quantidades_materiais(r):
+    """Quantidades de calcularOrcamentoCasaDetalhado: [(chave, quantidade, com_incc, usa_padrao)]
+
+    r: parametros_relatorio. A secao 3.6 fica consolidada (parede, teto e
+    pisos), como em revestimentos.
+    """
+    area, paredes, perimetro, pilares = r["area"], r["paredes"], r["perimetro"], r["pilares"]
+    banheiros, quartos = r["banheiros"], r["quartos"]
+
+    escavacao_baldrame = perimetro * 0.4 * 0.4
+    concreto = (pilares * 0.15 * 0.15 * ALTURA_PAREDE) + (perimetro * 0.15 * 0.3) + (area * 0.1)
+    janelas = quartos + banheiros + 2
+    reboco = (paredes * 0.4 if r["externo"] else 0.0) + (paredes * 0.6 if r["interno"] else 0.0)
+    ceramica_parede = (banheiros * 12) + 8
+    circuitos = max(6.0, np.ceil(area / 15))
+    interruptores = quartos + banheiros + 4
+    pintura_interna = paredes * 0.6 + area
+    entulho = area * 0.15
+
+    return [
+        ("movimentoTerra.escavacaoValasBaldrame", escavacao_baldrame, True, False),
+        ("movimentoTerra.escavacaoFundacao60x60", pilares * 0.6 * 0.6 * 0.6, True, False),
+        ("movimentoTerra.reterroCompactacao", escavacao_baldrame * 0.3, True, False),
+        ("movimentoTerra.espalhamentoBase", area * 0.5, True, False),
+        ("movimentoTerra.apiloamentoFundoVala", perimetro * 0.4, True, False),
+        ("baldrameAlvenaria.alvenariaPedraArgamassada", perimetro * 0.3 * 0.3, True, False),
+        ("baldrameAlvenaria.cintaConcretoArmado", perimetro * 0.1 * 0.1, True, False),
+        ("baldrameAlvenaria.impermeabilizacaoBaldrame", perimetro * 0.5, True, False),
+        (CHAVE_TIJOLO, paredes, False, False),
+        ("fundacoesEstruturas.concretoPilaresVigas", concreto, True, False),
+        ("fundacoesEstruturas.formaDesforma",
+         (pilares * 0.15 * 4 * ALTURA_PAREDE) + (perimetro * 0.3 * 2), True, False),
+        ("fundacoesEstruturas.armaduraCA50", (pilares * 35) + (perimetro * 4) + (area * 4.5), True, False),
+        ("fundacoesEstruturas.lancamentoConcreto", concreto, True, False),
+        ("fundacoesEstruturas.lajePrefabricada", area, True, False),
+        ("esquadriasFerragens.portaEntradaDecorativa", 1.0, True, True),
+        ("esquadriasFerragens.portaMadeiraLei", quartos + banheiros + 2, True, True),
+        ("esquadriasFerragens.janelaAluminio", janelas * 1.5, True, True),
+        ("esquadriasFerragens.cobogoAntiChuva", 3.0, True, False),
+        (CHAVE_TELHADO, r["areaTelhado"] * 1.1, False, False),
+        ("revestimentos.parede.chapiscoCimentoAreia", reboco, True, False),
+        ("revestimentos.parede.rebocoCimentoAreia", reboco, True, False),
+        ("revestimentos.parede.embocoCimentoAreia", ceramica_parede, True, False),
+        ("revestimentos.parede.revestimentoCeramico", ceramica_parede, True, True),
+        ("revestimentos.parede.rejuntamentoPorcelanato", ceramica_parede, True, False),
+        ("revestimentos.parede.bancadaCozinhaPorcelanato", 1.0, True, True),
+        ("revestimentos.teto.gessoConvencionalForro", area, True, True),
+        ("revestimentos.pisos.concretoNaoEstruturalLastro", area, True, False),
+        ("revestimentos.pisos.regularizacaoBase", area, True, False),
+        ("revestimentos.pisos.revestimentoCeramico", area, True, True),
+        ("revestimentos.pisos.rejuntamentoPorcelanato", area, True, False),
+        ("revestimentos.pisos.soleirasGranito", (quartos + banheiros + 3) * 0.9, True, True),
+        ("instalacaoHidraulica.tuboPVC50mm", area * 0.15, True, False),
+        ("instalacaoHidraulica.tuboPVC32mm", area * 0.2, True, False),
+        ("instalacaoHidraulica.tuboPVC25mm", area * 0.3, True, False),
+        ("instalacaoHidraulica.caixaDagua1500L", 1.0, True, False),
+        ("instalacaoHidraulica.flange2pol", 2.0, True, False),
+        ("instalacaoHidraulica.flange1pol", 2.0, True, False),
+        ("instalacaoHidraulica.registroGaveta", 3.0, True, False),
+        ("instalacaoHidraulica.registroGavetaCanopla", banheiros * 2, True, False),
+        ("instalacaoHidraulica.registroPressaoChuveiro", banheiros, True, False),
+        ("instalacaoHidraulica.boiaMecanica", 1.0, True, False),
+        ("instalacaoHidraulica.torneiraMetal", 2.0, True, False),
+        ("instalacaoHidraulica.bancadaGranitoLavatorio", banheiros, True, True),
+        ("instalacaoHidraulica.baciaSanitaria", banheiros, True, True),
+        ("instalacaoHidraulica.chuveiroArticulado", banheiros, True, True),
+        ("instalacaoHidraulica.bancadaGranitoCozinha", 1.0, True, True),
+        ("instalacaoHidraulica.tanqueInox", 1.0, True, True),
+        ("instalacaoSanitaria.caixaInspecao60x60", 3.0, True, False),
+        ("instalacaoSanitaria.tuboPVCEsgoto100mm", area * 0.5, True, False),
+        ("instalacaoSanitaria.tuboPVCEsgoto75mm", area * 0.4, True, False),
+        ("instalacaoSanitaria.tuboPVCEsgoto50mm", area * 0.6, True, False),
+        ("instalacaoSanitaria.raloSifonado", banheiros * 2 + 2, True, False),
+        ("instalacaoEletrica.quadroDistribuicao12", 1.0, True, False),
+        ("instalacaoEletrica.eletrodutoRigido32mm", area * 0.35, True, False),
+        ("instalacaoEletrica.eletrodutoFlexivel", area * 4, True, False),
+        ("instalacaoEletrica.caixaLigacaoPVC4x4", np.ceil(area / 10), True, False),
+        ("instalacaoEletrica.caixaLigacaoPVC4x2", np.ceil(area * 1.5), True, False),
+        ("instalacaoEletrica.caboIsoladoPVC1_5mm", area * 4, True, False),
+        ("instalacaoEletrica.caboIsoladoPVC2_5mm", area * 6, True, False),
+        ("instalacaoEletrica.caboIsoladoPVC4mm", area * 2, True, False),
+        ("instalacaoEletrica.caboIsoladoPVC10mm", area * 0.4, True, False),
+        ("instalacaoEletrica.disjuntor15A", np.ceil(circuitos * 0.3), True, False),
+        ("instalacaoEletrica.disjuntor20A", np.ceil(circuitos * 0.3), True, False),
+        ("instalacaoEletrica.disjuntor32A", np.ceil(circuitos * 0.2), True, False),
+        ("instalacaoEletrica.disjuntor50A", 1.0, True, False),
+        ("instalacaoEletrica.hasteCobre", 1.0, True, False),
+        ("instalacaoEletrica.interruptorTriplo", np.ceil(interruptores * 0.3), True, False),
+        ("instalacaoEletrica.interruptorDuplo", np.ceil(interruptores * 0.7), True, False),
+        ("instalacaoEletrica.interruptorCampainha", 1.0, True, False),
+        ("instalacaoEletrica.tomadaTripla", np.ceil(area * 0.8), True, False),
+        ("instalacaoEletrica.pontoLogica", max(2.0, np.ceil(area / 30)), True, False),
+        ("instalacaoEletrica.pontoTV", max(2.0, np.ceil(area / 40)), True, False),
+        ("instalacaoEletrica.luminariaLED", quartos + banheiros + 4, True, True),
+        ("gasGlp.tuboCobre15mm", 8 + (banheiros * 2), True, False),
+        ("gasGlp.testeEstanqueidade", 1.0, True, False),
+        ("pintura.texturaExterna", paredes * 0.4, True, True),
+        ("pintura.emassamento", pintura_interna, True, False),
+        ("pintura.pinturaLatexPVA", pintura_interna, True, True),
+        ("pintura.seladorMadeira", area * 0.05, True, False),
+        ("pintura.esmalteSintetico", area * 0.05, True, True),
+        ("limpezaObra.containers", max(2.0, np.ceil(entulho / 5)), True, False),
+        ("limpezaObra.transporteHorizontal", entulho, True, False),
+        ("limpezaObra.limpezaGeral", area, True, False),
+    ]
+
+class ModeloLinear:
+    """Orcamento da casa de referencia como vetores: q (quantidades efetivas) e p (precos)
+
+    itens: [(parcela, chave, quantidade efetiva, preco, origem)]. Cada item
+    pertence a um grupo (parcela, secao); a secao e o primeiro campo da chave.
+    """
+
+    def __init__(self, itens):
+        self.parcelas = [parcela for parcela, _, _, _, _ in itens]
+        self.chaves = [chave for _, chave, _, _, _ in itens]
+        self.origens = [origem for _, _, _, _, origem in itens]
+        self.q = np.array([q for _, _, q, _, _ in itens], dtype=np.float64)
+        self.p = np.array([p for _, _, _, p, _ in itens], dtype=np.float64)
+        self.grupos = []
+        indice, grupo_item = {}, []
+        for parcela, chave in zip(self.parcelas, self.chaves):
+            grupo = (parcela, chave.split(".")[0])
+            if grupo not in indice:
+                indice[grupo] = len(self.grupos)
+                self.grupos.append(grupo)
+            grupo_item.append(indice[grupo])
+        self.grupo_item = np.array(grupo_item, dtype=np.intp)
+        self.parcela_grupo = np.array([PARCELAS.index(parcela) for parcela, _ in self.grupos], dtype=np.intp)
+
+    def __len__(self):
+        return len(self.chaves)
+
+    @property
+    def custos(self):
+        return self.q * self.p
+
+    def total(self):
+        return float(self.custos.sum())
+
+    def elasticidades(self):
+        """d(total)/total por d(p_i)/p_i, para cada item"""
+        return self.custos / self.total()
+
+    def por_grupo(self, valores):
+        """Soma valores por item em cada grupo (parcela, secao)"""
+        return np.bincount(self.grupo_item, weights=valores, minlength=len(self.grupos))
+
+    def selecionar(self, seletor):
+        """Mascara dos itens do seletor ("maoObra", "pintura", "materiais:fundacoesEstruturas.armaduraCA50")"""
+        parcela, _, prefixo = seletor.rpartition(":")
+        if not parcela and prefixo in PARCELAS:
+            parcela, prefixo = prefixo, ""
+        if parcela and parcela not in PARCELAS:
+            raise ValueError(f"{seletor}: parcela desconhecida (use {' ou '.join(PARCELAS)})")
+        mascara = np.array([
+            (not parcela or p == parcela)
+            and (not prefixo or chave == prefixo or chave.startswith(prefixo + "."))
+            for p, chave in zip(self.parcelas, self.chaves)
+        ], dtype=bool)
+        if not mascara.any():
+            raise ValueError(f"{seletor}: nenhum item corresponde")
+        return mascara
+
+    def choque(self, variacoes):
+        """Total com os precos variados: variacoes [(seletor, fracao)], ex.: [("maoObra", 0.10)]
+
+        Variacoes que atingem o mesmo item se compoem (1.1 x 1.05).
+        """
+        fator = np.ones(len(self))
+        for seletor, fracao in variacoes:
+            fator[self.selecionar(seletor)] *= 1 + fracao
+        return float((self.custos * fator).sum())
+
+def montar_modelo(g, precos_materiais, fator_ajuste, precos_mao_obra, bdi_percentual,
+                  telhado, tijolo, padrao, estado, cub_base):
+    """ModeloLinear da casa g (um layout) com os tipos escolhidos do Catalogo
+
+    precos_materiais: achatar_arquivo_precos de data/precos-materiais-casa.json;
+    precos_mao_obra: resolver_precos_mao_obra (ja completado); telhado,
+    tijolo, padrao e estado: tuplas de Catalogo.selecionar.
+    """
+    r = parametros_relatorio(g)
+    mult = padrao[2]
+    itens = []
+
+    catalogo = {CHAVE_TIJOLO: tijolo[2] * tijolo[3], CHAVE_TELHADO: telhado[2]}
+    materiais = quantidades_materiais(r)
+    faltando = [chave for chave, _, _, _ in materiais if chave not in catalogo and chave not in precos_materiais]
+    if faltando:
+        raise ValueError(f"precos de materiais ausentes: {', '.join(faltando)}")
+    for chave, quantidade, com_incc, usa_padrao in materiais:
+        fator = (1 + fator_ajuste if com_incc else 1.0) * (mult if usa_padrao else 1.0)
+        if chave in catalogo:
+            itens.append(("materiais", chave, quantidade * fator, catalogo[chave], "configuracoes"))
+        else:
+            itens.append(("materiais", chave, quantidade * fator, float(precos_materiais[chave]), "planilha"))
+
+    # calcularMaoObraCasaDetalhada: preco x fator da UF (x padrao); BDI sobre o subtotal
+    fator_estado = estado[2] / cub_base
+    bdi = 1 + bdi_percentual / 100
+    # Portas com banheiros e quartos ja minimos em 1, como na rota
+    secoes = quantidades_mao_obra(dict(g, portas=r["portas"]), pilares=r["pilares"], fundos=r["fundos"])
+    for chave, quantidade, usa_padrao in (item for secao in secoes for item in secao):
+        fator = fator_estado * (mult if usa_padrao else 1.0) * bdi
+        itens.append(("maoObra", chave, float(quantidade) * fator, precos_mao_obra[chave], "planilha"))
+
+    # Itens de quantidade zero (porta decorativa da mao de obra) nao pesam em nada
+    return ModeloLinear([item for item in itens if item[2] != 0])
+
+def volatilidades_grupos(modelo, padrao, especificas=()):
+    """Desvio do log-choque de cada grupo: {parcela: desvio} e [(seletor, desvio)]
+
+    O seletor de uma volatilidade especifica e "[parcela:]secao"; a ultima
+    que atinge um grupo vale.
+    """
+    sigma = np.array([padrao[parcela] for parcela, _ in modelo.grupos], dtype=np.float64)
+    for seletor, desvio in especificas:
+        parcela, _, secao = seletor.rpartition(":")
+        if not parcela and secao in PARCELAS:
+            parcela, secao = secao, ""
+        if "." in secao:
+            raise ValueError(f"{seletor}: volatilidade e por secao, nao por item")
+        atingidos = [i for i, (p, s) in enumerate(modelo.grupos)
+                     if (not parcela or p == parcela) and (not secao or s == secao)]
+        if not atingidos:
+            raise ValueError(f"{seletor}: nenhuma secao corresponde")
+        sigma[atingidos] = desvio
+    return sigma
+
+def matriz_correlacao(modelo, correlacao_secoes, correlacao_parcelas):
+    """Correlacao entre grupos: correlacao_secoes na mesma parcela, correlacao_parcelas entre parcelas"""
+    mesma = modelo.parcela_grupo[:, None] == modelo.parcela_grupo[None, :]
+    correlacao = np.where(mesma, correlacao_secoes, correlacao_parcelas)
+    np.fill_diagonal(correlacao, 1.0)
+    return correlacao
+
+def simular(modelo, sigma, correlacao, cenarios, semente=None, volatilidade_item=0.0,
+            cenarios_por_bloco=CENARIOS_POR_BLOCO):
+    """Monte Carlo dos precos: totais por parcela (cenarios, 2) e contribuicao de cada grupo a variancia
+
+    Choque do grupo: exp(sigma * z - sigma^2 / 2), z normal com a correlacao
+    dada (Cholesky); choque do item, se volatilidade_item > 0, independente,
+    com a mesma forma. A contribuicao de um grupo e cov(custo do grupo, total)
+    / var(total): as contribuicoes somam 1.
+    """
+    try:
+        cholesky = np.linalg.cholesky(correlacao)
+    except np.linalg.LinAlgError:
+        raise ValueError("matriz de correlacao nao e positiva definida "
+                         "(use correlacao entre parcelas <= correlacao entre secoes)") from None
+    gerador = np.random.default_rng(semente)
+    custos = modelo.custos
+    custos_grupo = modelo.por_grupo(custos)
+    # Soma dos custos dos itens de cada grupo: (item, grupo) x (cenario, item)
+    pertence = np.zeros((len(modelo), len(modelo.grupos)))
+    pertence[np.arange(len(modelo)), modelo.grupo_item] = 1.0
+    soma_grupos = np.zeros((len(modelo.grupos), len(PARCELAS)))
+    soma_grupos[np.arange(len(modelo.grupos)), modelo.parcela_grupo] = 1.0
+
+    totais = np.empty((cenarios, len(PARCELAS)))
+    soma_total = soma_quadrados = 0.0
+    soma_grupo = np.zeros(len(modelo.grupos))
+    soma_cruzada = np.zeros(len(modelo.grupos))
+    for inicio in range(0, cenarios, cenarios_por_bloco):
+        n = min(cenarios_por_bloco, cenarios - inicio)
+        z = gerador.standard_normal((n, len(modelo.grupos))) @ cholesky.T
+        choques = np.exp(z * sigma - sigma * sigma / 2)
+        if volatilidade_item > 0:
+            ruido = gerador.standard_normal((n, len(modelo)))
+            ruido *= volatilidade_item
+            ruido -= volatilidade_item * volatilidade_item / 2
+            np.exp(ruido, out=ruido)
+            ruido *= choques[:, modelo.grupo_item]
+            ruido *= custos
+            bloco = ruido @ pertence
+        else:
+            bloco = choques * custos_grupo
+        por_parcela = bloco @ soma_grupos
+        total = por_parcela.sum(axis=1)
+        totais[inicio:inicio + n] = por_parcela
+        soma_total += total.sum()
+        soma_quadrados += total @ total
+        soma_grupo += bloco.sum(axis=0)
+        soma_cruzada += total @ bloco
+
+    media = soma_total / cenarios
+    variancia = soma_quadrados / cenarios - media * media
+    covariancias = soma_cruzada / cenarios - media * (soma_grupo / cenarios)
+    contribuicoes = covariancias / variancia if variancia > 0 else np.zeros_like(covariancias)
+    return totais, contribuicoes
+
+def faixas(valores, percentis=PERCENTIS):
+    """{"P5": ..., "P50": ..., "media": ..., "desvio": ...} de um vetor de totais"""
+    resultado = {f"P{p}": float(v) for p, v in zip(percentis, np.percentile(valores, percentis))}
+    resultado["media"] = float(valores.mean())
+    resultado["desvio"] = float(valores.std())
+    return resultado
@@ -0,0 +1,239 @@
+"""
+Daemon local de extracao, para o upload de planilhas do painel admin.
+
+Usado por scripts/extract-excel.py (comando serve) e, quando EXTRATOR_SOCKET
+ou EXTRATOR_URL estao definidas, por src/app/api/admin/importar-excel.
+Um processo de longa duracao atende HTTP/1.1 em um socket Unix ou em
+localhost: a recepcao e asyncio (uma thread) e as extracoes rodam em um pool
+de processos, de modo que uploads simultaneos nao esperam uns pelos outros
+nem bloqueiam o servidor Next.js.
+
+    POST /extrair   corpo: o .xlsx (Content-Length obrigatorio)
+        200  {"sha256": ..., "cache": false, "segundos": 0.41, "resultado": {...}}
+        411  sem Content-Length
+        413  planilha acima do limite de upload
+        422  planilha invalida (erro na leitura ou na extracao)
+        503  fila cheia, com Retry-After
+        504  extracao acima do timeout
+    GET /saude
+        200  {"processos": 4, "emAndamento": 1, "limiteFila": 16, "cache": 3, ...}
+
+Erros tem o corpo {"erro": "mensagem"}. resultado e o que a funcao de
+trabalho devolve (em extract-excel.py, extrair_upload). Cada conexao atende
+uma requisicao (Connection: close).
+
+Fila e backpressure: no maximo limite_fila extracoes admitidas (em andamento
+ou aguardando um processo livre); acima disso a resposta e 503 imediata.
+Uploads identicos (mesmo SHA-256) simultaneos compartilham a mesma extracao,
+e os resultados ficam em um cache LRU: reenviar a mesma planilha responde sem
+extrair de novo.
+
+Timeout: o proprio processo de trabalho interrompe a extracao (SIGALRM) ao
+estourar o limite e fica livre para o proximo job. Sem SIGALRM (Windows) ou
+com o processo preso em codigo nativo, o servidor responde 504 apos uma
+margem, mas o processo so e liberado quando a extracao termina.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import signal
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from http import HTTPStatus
+
+# Espera extra do servidor alem do timeout do processo de trabalho
+MARGEM_TIMEOUT = 5.0
+# Tempo maximo para receber a linha de requisicao e os cabecalhos
+TEMPO_CABECALHO = 10.0
+
+class TempoEsgotado(Exception):
+    """Extracao interrompida pelo timeout do job"""
+
+def _alarme(signum, frame):
+    raise TempoEsgotado()
+
+def _iniciar_processo():
+    # Ctrl+C encerra o servidor; os processos do pool saem com ele
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+def executar_trabalho(trabalho, conteudo, timeout):
+    """Roda trabalho(conteudo) em um processo do pool, com timeout proprio"""
+    if not hasattr(signal, "setitimer"):
+        return trabalho(conteudo)
+    anterior = signal.signal(signal.SIGALRM, _alarme)
+    signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        return trabalho(conteudo)
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, anterior)
+
+def corpo_json(dados):
+    return json.dumps(dados, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+class ServidorExtracao:
+    """Recepcao asyncio + pool de processos; trabalho deve ser serializavel (pickle)"""
+
+    def __init__(self, trabalho, processos=None, limite_fila=16, timeout=120.0,
+                 limite_cache=32, limite_upload=50 * 1024 * 1024):
+        self.trabalho = trabalho
+        self.processos = processos or os.cpu_count() or 1
+        self.limite_fila = limite_fila
+        self.timeout = timeout
+        self.limite_cache = limite_cache
+        self.limite_upload = limite_upload
+        self.pool = self._novo_pool()
+        self._cache = OrderedDict()
+        self._em_andamento = {}
+        self.contadores = {"extracoes": 0, "acertosCache": 0, "rejeitadas": 0, "tempoEsgotado": 0, "erros": 0}
+
+    def _novo_pool(self):
+        return ProcessPoolExecutor(max_workers=self.processos, initializer=_iniciar_processo)
+
+    def estado(self):
+        return {
+            "processos": self.processos,
+            "emAndamento": len(self._em_andamento),
+            "limiteFila": self.limite_fila,
+            "cache": len(self._cache),
+            "timeout": self.timeout,
+            **self.contadores,
+        }
+
+    async def _executar(self, sha256, conteudo):
+        """(status, resultado serializado ou erro, segundos) de uma extracao"""
+        loop = asyncio.get_running_loop()
+        inicio = time.perf_counter()
+        self.contadores["extracoes"] += 1
+        try:
+            futuro = loop.run_in_executor(self.pool, executar_trabalho, self.trabalho, conteudo, self.timeout)
+            resultado = await asyncio.wait_for(futuro, self.timeout + MARGEM_TIMEOUT)
+        except (TempoEsgotado, asyncio.TimeoutError):
+            self.contadores["tempoEsgotado"] += 1
+            return 504, corpo_json({"erro": f"extracao acima de {self.timeout:g}s"}), None
+        except BrokenProcessPool:
+            # Processo do pool morto (ex.: pelo OOM killer): recria o pool para os proximos jobs
+            self.contadores["erros"] += 1
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = self._novo_pool()
+            return 500, corpo_json({"erro": "processo de extracao encerrado inesperadamente"}), None
+        except Exception as e:
+            self.contadores["erros"] += 1
+            return 422, corpo_json({"erro": f"{type(e).__name__}: {e}"}), None
+
+        serializado = corpo_json(resultado)
+        self._cache[sha256] = serializado
+        while len(self._cache) > self.limite_cache:
+            self._cache.popitem(last=False)
+        return 200, serializado, round(time.perf_counter() - inicio, 3)
+
+    async def _extrair(self, cabecalhos, reader):
+        tamanho = cabecalhos.get("content-length", "")
+        if not tamanho.isdigit():
+            return 411, corpo_json({"erro": "Content-Length obrigatorio"}), {}
+        if int(tamanho) > self.limite_upload:
+            return 413, corpo_json({"erro": f"planilha acima de {self.limite_upload // (1024 * 1024)} MB"}), {}
+        conteudo = await asyncio.wait_for(reader.readexactly(int(tamanho)), self.timeout)
+        # Hash fora do loop: uploads grandes nao travam as outras conexoes
+        sha256 = (await asyncio.to_thread(hashlib.sha256, conteudo)).hexdigest()
+
+        serializado = self._cache.get(sha256)
+        if serializado is not None:
+            self._cache.move_to_end(sha256)
+            self.contadores["acertosCache"] += 1
+            return 200, self._envelope(sha256, True, 0.0, serializado), {}
+
+        tarefa = self._em_andamento.get(sha256)
+        if tarefa is None:
+            if len(self._em_andamento) >= self.limite_fila:
+                self.contadores["rejeitadas"] += 1
+                return 503, corpo_json({"erro": "fila de extracao cheia"}), {"Retry-After": "1"}
+            tarefa = asyncio.ensure_future(self._executar(sha256, conteudo))
+            self._em_andamento[sha256] = tarefa
+            tarefa.add_done_callback(lambda _: self._em_andamento.pop(sha256, None))
+        # shield: um cliente que desconecta nao cancela a extracao compartilhada
+        status, corpo, segundos = await asyncio.shield(tarefa)
+        if status != 200:
+            return status, corpo, {}
+        return 200, self._envelope(sha256, False, segundos, corpo), {}
+
+    @staticmethod
+    def _envelope(sha256, cache, segundos, serializado):
+        prefixo = corpo_json({"sha256": sha256, "cache": cache, "segundos": segundos})[:-1]
+        return prefixo + b',"resultado":' + serializado + b"}"
+
+    async def _rotear(self, metodo, caminho, cabecalhos, reader):
+        caminho = caminho.split("?", 1)[0]
+        if caminho == "/saude":
+            if metodo != "GET":
+                return 405, corpo_json({"erro": "use GET"}), {"Allow": "GET"}
+            return 200, corpo_json(self.estado()), {}
+        if caminho == "/extrair":
+            if metodo != "POST":
+                return 405, corpo_json({"erro": "use POST"}), {"Allow": "POST"}
+            return await self._extrair(cabecalhos, reader)
+        return 404, corpo_json({"erro": f"rota desconhecida: {caminho}"}), {}
+
+    async def _atender(self, reader, writer):
+        try:
+            try:
+                bruto = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), TEMPO_CABECALHO)
+                linha, *campos = bruto.decode("latin-1").split("\r\n")
+                metodo, caminho, _ = linha.split(" ", 2)
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError, ValueError):
+                return
+            cabecalhos = {}
+            for campo in campos:
+                nome, separador, valor = campo.partition(":")
+                if separador:
+                    cabecalhos[nome.strip().lower()] = valor.strip()
+            try:
+                status, corpo, extras = await self._rotear(metodo, caminho, cabecalhos, reader)
+            except (asyncio.IncompleteReadError, asyncio.TimeoutError):
+                # Corpo incompleto: o cliente desistiu
+                return
+            linhas = [
+                f"HTTP/1.1 {status} {HTTPStatus(status).phrase}",
+                "Content-Type: application/json; charset=utf-8",
+                f"Content-Length: {len(corpo)}",
+                "Connection: close",
+                *(f"{nome}: {valor}" for nome, valor in extras.items()),
+            ]
+            writer.write(("\r\n".join(linhas) + "\r\n\r\n").encode("latin-1") + corpo)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def servir(self, socket=None, host="127.0.0.1", porta=8765, pronto=None):
+        """Atende ate SIGINT/SIGTERM; pronto(endereco) e chamado com o servidor no ar"""
+        if socket:
+            if os.path.exists(socket):
+                os.unlink(socket)
+            servidor = await asyncio.start_unix_server(self._atender, path=socket)
+            endereco = socket
+        else:
+            servidor = await asyncio.start_server(self._atender, host, porta)
+            endereco = "http://{}:{}".format(*servidor.sockets[0].getsockname()[:2])
+
+        parar = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sinal in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sinal, parar.set)
+            except (NotImplementedError, AttributeError):
+                pass
+        if pronto is not None:
+            pronto(endereco)
+        try:
+            async with servidor:
+                await parar.wait()
+        finally:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            if socket and os.path.exists(socket):
+                os.unlink(socket)
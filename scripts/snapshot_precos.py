@@ -0,0 +1,136 @@
+"""
+Snapshot binario de precos, lido via mmap sem parsing.
+
+Gerado por scripts/extract-excel.py (--formato bin) a partir dos precos
+extraidos de cada aba registrada em scripts/mapeamentos-planilha.json: um
+arquivo por aba, com o nome do seu "arquivo" trocando .json por .bin
+(data/precos-<tipo>.bin: materiais e mao de obra da casa, do muro e da
+piscina, ex.: data/precos-mao-obra-muro.bin).
+
+Layout (versao 1, little-endian, offsets em bytes a partir do inicio):
+
+    0   8 bytes   magic "MSCPREC\\0"
+    8   u32       versao do formato (1)
+    12  u32       n = numero de itens
+    16  u64       offset da tabela de chaves
+    24  u64       offset do blob de chaves
+    32  n * f64   precos, na ordem das chaves
+    ..  (n+1) * u32  tabela de chaves: inicio de cada chave no blob
+                     (a entrada n marca o fim da ultima chave)
+    ..  blob      chaves UTF-8 concatenadas, ordenadas por bytes
+
+As chaves seguem o formato "secao.campo" ou "secao.subsecao.campo"
+(ex.: "revestimentos.parede.chapiscoCimentoAreia").
+
+Leitura (Python ou Node): mapear o arquivo, ler o cabecalho, fazer busca
+binaria comparando os bytes da chave procurada com blob[tab[i]:tab[i+1]] e
+ler o f64 em 32 + 8 * i. Cada consulta e O(log n), sem decodificar o arquivo,
+e varios processos compartilham a mesma copia no page cache. Em Node:
+fs.openSync + Buffer (ou um pacote de mmap), readUInt32LE / readBigUInt64LE /
+readDoubleLE e Buffer.compare para a busca.
+
+Como o arquivo e substituido por rename, um leitor com o mapeamento aberto
+continua vendo a versao anterior ate reabrir o arquivo.
+"""
+
+import mmap
+import struct
+
+MAGIC = b"MSCPREC\0"
+VERSAO_FORMATO = 1
+CABECALHO = struct.Struct("<8sIIQQ")
+
+def gerar_snapshot(itens):
+    """Serializa [(chave, preco)] no layout acima, retornando bytes"""
+    ordenados = sorted((chave.encode("utf-8"), float(preco)) for chave, preco in itens)
+    n = len(ordenados)
+
+    offset_precos = CABECALHO.size
+    offset_chaves = offset_precos + 8 * n
+    offset_blob = offset_chaves + 4 * (n + 1)
+
+    inicios = []
+    posicao = 0
+    for chave, _ in ordenados:
+        inicios.append(posicao)
+        posicao += len(chave)
+    inicios.append(posicao)
+
+    return b"".join([
+        CABECALHO.pack(MAGIC, VERSAO_FORMATO, n, offset_chaves, offset_blob),
+        struct.pack(f"<{n}d", *(preco for _, preco in ordenados)),
+        struct.pack(f"<{n + 1}I", *inicios),
+        b"".join(chave for chave, _ in ordenados),
+    ])
+
+class SnapshotPrecos:
+    """Leitor do snapshot via mmap: consultas O(log n) sem parsing
+
+    Uso:
+        with SnapshotPrecos("data/precos-materiais-casa.bin") as precos:
+            precos["movimentoTerra.escavacaoValasBaldrame"]
+    """
+
+    def __init__(self, caminho):
+        with open(caminho, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, versao, n, offset_chaves, offset_blob = CABECALHO.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            self._mm.close()
+            raise ValueError(f"Arquivo nao e um snapshot de precos: {caminho}")
+        if versao != VERSAO_FORMATO:
+            self._mm.close()
+            raise ValueError(f"Versao de snapshot nao suportada: {versao}")
+        self.versao = versao
+        self._n = n
+        self._offset_chaves = offset_chaves
+        self._offset_blob = offset_blob
+
+    def _chave(self, i):
+        inicio, fim = struct.unpack_from("<II", self._mm, self._offset_chaves + 4 * i)
+        return self._mm[self._offset_blob + inicio:self._offset_blob + fim]
+
+    def _preco(self, i):
+        return struct.unpack_from("<d", self._mm, CABECALHO.size + 8 * i)[0]
+
+    def _indice(self, chave):
+        alvo = chave.encode("utf-8")
+        baixo, alto = 0, self._n
+        while baixo < alto:
+            meio = (baixo + alto) // 2
+            if self._chave(meio) < alvo:
+                baixo = meio + 1
+            else:
+                alto = meio
+        if baixo < self._n and self._chave(baixo) == alvo:
+            return baixo
+        return -1
+
+    def __getitem__(self, chave):
+        i = self._indice(chave)
+        if i < 0:
+            raise KeyError(chave)
+        return self._preco(i)
+
+    def get(self, chave, padrao=None):
+        i = self._indice(chave)
+        return self._preco(i) if i >= 0 else padrao
+
+    def __contains__(self, chave):
+        return self._indice(chave) >= 0
+
+    def __len__(self):
+        return self._n
+
+    def items(self):
+        for i in range(self._n):
+            yield self._chave(i).decode("utf-8"), self._preco(i)
+
+    def close(self):
+        self._mm.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
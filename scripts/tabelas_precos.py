@@ -0,0 +1,86 @@
+"""
+Tabelas de precos derivados, calculadas em bloco na extracao.
+
+Geradas por scripts/extract-excel.py (--formato tabelas) para cada aba
+extraida: data/tabelas-materiais-casa.json, data/tabelas-mao-obra-casa.json
+e os equivalentes de muro e piscina, com os precos ja ajustados (INCC, BDI,
+CUB por UF). Por enquanto so sao produzidas: nenhuma parte do runtime as le
+ainda (getCUBBase, aplicarAjusteCompleto e as rotas da API continuam
+calculando campo a campo), e passar a usa-las fica para uma mudanca propria.
+
+Formato (JSON, um campo por linha):
+
+    {"versao": 1,
+     "tipo": "mao-obra-casa",
+     "fatorINCC": 0.0079,                 fatorINCC de data/configuracoes.json
+     "bdiPercentual": 14.4,               so nas abas de mao de obra
+     "cubBase": 2040.58,                  CUB de SP (getCUBBase)
+     "chaves": ["cobertura.cobertaPadrao", ...],
+     "base": [...],                       preco da planilha
+     "comINCC": [...],                    base * (1 + fatorINCC)
+     "comBDI": [...],                     base * (1 + bdiPercentual / 100), mao de obra
+     "fatoresEstado": {"AC": 1.0432, ...},  CUB da UF / cubBase
+     "porEstado": {"AC": [...], ...}}
+
+As listas seguem a ordem de "chaves" (ordenadas por bytes, como no snapshot
+.bin). porEstado usa as mesmas formulas do runtime, na mesma ordem de
+operacoes (o resultado e identico ao calculado em TypeScript):
+    materiais:   comINCC * fator   (aplicarAjusteCompleto, src/lib/configuracoes.ts)
+    mao de obra: base * fator      (mao-de-obra-casa.ts, orcamento-detalhado-*.ts)
+O BDI da mao de obra incide sobre o subtotal do orcamento, nao por item;
+comBDI serve para consultas de preco unitario final.
+
+Os calculos sao vetorizados com NumPy: a matriz UF x item inteira sai de
+uma unica multiplicacao (outer), sem lacos por item.
+"""
+
+import json
+
+VERSAO_TABELAS = 1
+# CUB de SP usado quando a UF nao esta cadastrada (mesmo valor de getCUBBase)
+CUB_BASE_PADRAO = 2040.58
+
+def gerar_tabelas(itens, tipo, fator_incc, estados, bdi_percentual=None):
+    """Calcula as tabelas de [(chave, preco)] e retorna o JSON descrito acima
+
+    estados: [(sigla, cub)] na ordem de data/configuracoes.json. Sem
+    bdi_percentual (materiais) a coluna comBDI nao e gerada.
+    """
+    import numpy as np
+
+    ordenados = sorted(itens, key=lambda item: item[0].encode("utf-8"))
+    chaves = [chave for chave, _ in ordenados]
+    base = np.array([preco for _, preco in ordenados], dtype=np.float64)
+
+    siglas = [sigla for sigla, _ in estados]
+    cubs = np.array([cub for _, cub in estados], dtype=np.float64)
+    cub_base = dict(estados).get("SP") or CUB_BASE_PADRAO
+    fatores = cubs / cub_base
+
+    com_incc = base * (1 + fator_incc)
+    referencia = com_incc if tipo.startswith("materiais") else base
+    por_estado = np.outer(fatores, referencia)
+
+    campos = [
+        ("versao", VERSAO_TABELAS),
+        ("tipo", tipo),
+        ("fatorINCC", fator_incc),
+    ]
+    if bdi_percentual is not None:
+        campos.append(("bdiPercentual", bdi_percentual))
+    campos += [
+        ("cubBase", cub_base),
+        ("chaves", chaves),
+        ("base", base.tolist()),
+        ("comINCC", com_incc.tolist()),
+    ]
+    if bdi_percentual is not None:
+        campos.append(("comBDI", (base * (1 + bdi_percentual / 100)).tolist()))
+    campos.append(("fatoresEstado", dict(zip(siglas, fatores.tolist()))))
+
+    # Uma linha por campo (e por UF): legivel em diffs sem ocupar milhares de linhas
+    linhas = [f"  {json.dumps(nome)}: {json.dumps(valor, ensure_ascii=False)}" for nome, valor in campos]
+    linhas_estados = [f"    {json.dumps(sigla)}: {json.dumps(valores)}"
+                      for sigla, valores in zip(siglas, por_estado.tolist())]
+    linhas.append('  "porEstado": {\n' + ",\n".join(linhas_estados) + "\n  }")
+    return "{\n" + ",\n".join(linhas) + "\n}\n"
@@ -0,0 +1,145 @@
+"""
+Deteccao de alteracoes em uma planilha, para o modo --watch do extrator.
+
+Usado por scripts/extract-excel.py (--watch). No Linux usa inotify (via
+ctypes, sem dependencias) no diretorio da planilha: Excel e LibreOffice
+salvam gravando um arquivo temporario e renomeando, entao vigiar o proprio
+arquivo perderia o evento. Sem inotify (macOS, Windows, sistemas de arquivos
+de rede) compara tamanho e mtime em intervalos fixos.
+
+As duas implementacoes tem a mesma interface:
+
+    vigia.esperar(timeout)  True se a planilha mudou dentro do timeout
+                            (None = espera indefinidamente)
+    vigia.close()
+
+A espera entre gravacoes parciais (debounce) fica a cargo de quem chama:
+apos um evento, continuar chamando esperar(intervalo) ate receber False.
+Alem da planilha, a vigia acompanha outros arquivos de que a extracao
+depende (o registro de mapeamentos): qualquer um deles mudando conta como
+alteracao.
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import time
+import zipfile
+from pathlib import Path
+
+# Eventos do inotify (linux/inotify.h)
+IN_MODIFY = 0x002
+IN_ATTRIB = 0x004
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_MOVED_FROM = 0x040
+EVENTOS = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_MOVED_FROM
+CABECALHO_EVENTO = struct.Struct("iIII")
+
+def assinatura(caminho):
+    """(tamanho, mtime) da planilha, ou None se ela nao existir"""
+    try:
+        info = os.stat(caminho)
+    except OSError:
+        return None
+    return info.st_size, info.st_mtime_ns
+
+def planilha_completa(caminho):
+    """Um XLSX e um zip: enquanto a gravacao nao termina o diretorio central nao existe"""
+    try:
+        return zipfile.is_zipfile(caminho)
+    except OSError:
+        return False
+
+class VigiaInotify:
+    """Eventos do inotify nos diretorios dos arquivos, filtrados pelo nome de cada um"""
+
+    metodo = "inotify"
+
+    def __init__(self, caminhos):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or None, use_errno=True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 falhou")
+        # {(descritor do diretorio, nome do arquivo)}
+        self.nomes = set()
+        for caminho in caminhos:
+            diretorio = str(Path(caminho).resolve().parent).encode()
+            descritor = libc.inotify_add_watch(self.fd, diretorio, EVENTOS)
+            if descritor < 0:
+                erro = ctypes.get_errno()
+                os.close(self.fd)
+                raise OSError(erro, "inotify_add_watch falhou")
+            self.nomes.add((descritor, Path(caminho).name.encode()))
+
+    def _ler(self):
+        """Consome os eventos pendentes; True se algum for de um arquivo vigiado"""
+        relevante = False
+        while True:
+            try:
+                dados = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return relevante
+            posicao = 0
+            while posicao < len(dados):
+                descritor, _, _, tamanho = CABECALHO_EVENTO.unpack_from(dados, posicao)
+                inicio = posicao + CABECALHO_EVENTO.size
+                nome = dados[inicio:inicio + tamanho].rstrip(b"\0")
+                relevante = relevante or (descritor, nome) in self.nomes
+                posicao = inicio + tamanho
+
+    def esperar(self, timeout=None):
+        limite = None if timeout is None else time.monotonic() + timeout
+        while True:
+            restante = None if limite is None else max(0.0, limite - time.monotonic())
+            prontos, _, _ = select.select([self.fd], [], [], restante)
+            if prontos and self._ler():
+                return True
+            if limite is not None and time.monotonic() >= limite:
+                return False
+
+    def close(self):
+        os.close(self.fd)
+
+class VigiaPolling:
+    """Compara tamanho e mtime dos arquivos a cada intervalo"""
+
+    metodo = "polling"
+
+    def __init__(self, caminhos, intervalo=0.5):
+        self.caminhos = list(caminhos)
+        self.intervalo = intervalo
+        self.ultima = [assinatura(caminho) for caminho in self.caminhos]
+
+    def esperar(self, timeout=None):
+        limite = None if timeout is None else time.monotonic() + timeout
+        while True:
+            atual = [assinatura(caminho) for caminho in self.caminhos]
+            if atual != self.ultima:
+                self.ultima = atual
+                return True
+            if limite is not None and time.monotonic() >= limite:
+                return False
+            espera = self.intervalo if limite is None else min(self.intervalo, max(0.0, limite - time.monotonic()))
+            time.sleep(espera)
+
+    def close(self):
+        pass
+
+def criar_vigia(caminho, polling=False, intervalo=0.5, dependencias=()):
+    """inotify quando disponivel, senao polling
+
+    dependencias: outros arquivos cuja alteracao tambem acorda a vigia.
+    """
+    caminhos = [caminho, *dependencias]
+    if not polling:
+        try:
+            return VigiaInotify(caminhos)
+        except (OSError, AttributeError):
+            # AttributeError: libc sem inotify (fora do Linux)
+            pass
+    return VigiaPolling(caminhos, intervalo)
@@ -6,6 +6,12 @@ import {
   salvarConfiguracao,
   ArquivoPrecos
 } from '@/lib/admin/precos-json';
+import {
+  extratorConfigurado,
+  extrairNoDaemon,
+  ErroExtrator,
+  RespostaExtrator
+} from '@/lib/admin/extrator';
 import * as XLSX from 'xlsx';
 
 // Mapeamento das abas do Excel para tipos de arquivo
@@ -293,7 +299,6 @@ export async function POST(request: NextRequest) {
 
     // Lê o arquivo
     const buffer = await arquivo.arrayBuffer();
-    const workbook = XLSX.read(buffer, { type: 'array' });
 
     const resultado: ResultadoImportacao = {
       success: true,
@@ -302,13 +307,53 @@ export async function POST(request: NextRequest) {
       preview: []
     };
 
+    // Com o daemon configurado, a planilha é extraída fora do processo do Next.js
+    let extraido: RespostaExtrator | null = null;
+    if (extratorConfigurado()) {
+      try {
+        extraido = await extrairNoDaemon(buffer);
+      } catch (e) {
+        if (e instanceof ErroExtrator) {
+          return NextResponse.json(
+            { error: `Extrator: ${e.message}` },
+            {
+              status: e.status === 422 ? 400 : e.status,
+              headers: e.status === 503 ? { 'Retry-After': '1' } : undefined
+            }
+          );
+        }
+        console.warn('Extrator indisponível, processando com SheetJS:', e);
+      }
+    }
+
+    if (extraido) {
+      const { arquivos, cobertura, reprovadas } = extraido.resultado;
+      for (const aba of reprovadas) {
+        resultado.erros.push(`Aba "${aba}": cobertura de ${cobertura[aba]}% abaixo do mínimo`);
+      }
+      for (const parseado of arquivos) {
+        if (parseado.itensEncontrados > 0) {
+          resultado.preview!.push(parseado);
+
+          // Planilha com aba reprovada não substitui nenhum arquivo
+          if (!apenasPreview && reprovadas.length === 0) {
+            await salvarPrecos(parseado.tipo, parseado.dados);
+            resultado.arquivosProcessados.push(parseado.tipo);
+          }
+        } else {
+          resultado.erros.push(`Tipo "${parseado.tipo}": Nenhum item encontrado`);
+        }
+      }
+    }
+
     // Processa cada aba relevante
-    for (const nomeAba of workbook.SheetNames) {
+    const workbook = extraido ? null : XLSX.read(buffer, { type: 'array' });
+    for (const nomeAba of workbook ? workbook.SheetNames : []) {
       const tipo = ABA_PARA_TIPO[nomeAba];
 
       if (tipo) {
         try {
-          const worksheet = workbook.Sheets[nomeAba];
+          const worksheet = workbook!.Sheets[nomeAba];
           const parseado = parsearAba(worksheet, nomeAba, tipo);
 
           if (parseado.itensEncontrados > 0) {
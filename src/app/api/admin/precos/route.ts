@@ -1,5 +1,6 @@
 import { NextRequest, NextResponse } from 'next/server';
 import { protegerRotaAdmin } from '@/lib/admin/auth';
+import { respostaEstatica } from '@/lib/api-estatica';
 import {
   lerPrecos,
   salvarPrecos,
@@ -29,6 +30,12 @@ export async function GET(request: NextRequest) {
       return NextResponse.json({ tipos });
     }
 
+    // Arquivo pré-computado na extração (data/api); editado desde então, volta a ler o JSON
+    if (listarTiposArquivo().includes(tipo)) {
+      const estatica = await respostaEstatica(request, `precos-${tipo}`, 'private, no-cache');
+      if (estatica) return estatica;
+    }
+
     const dados = await lerPrecos(tipo);
 
     if (!dados) {
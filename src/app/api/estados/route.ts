@@ -1,8 +1,13 @@
-import { NextResponse } from 'next/server';
+import { NextRequest, NextResponse } from 'next/server';
 import { estados } from '@/lib/static-data';
+import { respostaEstatica } from '@/lib/api-estatica';
 
-export async function GET() {
+export async function GET(request: NextRequest) {
   try {
+    // Resposta pré-computada na extração (data/api), se atualizada
+    const estatica = await respostaEstatica(request, 'estados');
+    if (estatica) return estatica;
+
     return NextResponse.json({
       success: true,
       data: estados,
@@ -0,0 +1,88 @@
+import http from 'http';
+import { ArquivoPrecos } from './precos-json';
+
+/**
+ * Cliente do daemon de extração (python3 scripts/extract-excel.py serve).
+ * Ativado por EXTRATOR_SOCKET (socket Unix) ou EXTRATOR_URL
+ * (ex.: http://127.0.0.1:8765); protocolo em scripts/servidor_extracao.py.
+ */
+
+export interface ArquivoExtraido {
+  tipo: string;
+  dados: ArquivoPrecos;
+  itensEncontrados: number;
+}
+
+export interface RespostaExtrator {
+  sha256: string;
+  cache: boolean;
+  segundos: number;
+  resultado: {
+    arquivos: ArquivoExtraido[];
+    cobertura: Record<string, number>;
+    reprovadas: string[];
+    log: string;
+  };
+}
+
+/**
+ * Erro respondido pelo daemon (fila cheia, timeout, planilha inválida)
+ */
+export class ErroExtrator extends Error {
+  constructor(message: string, public status: number) {
+    super(message);
+    this.name = 'ErroExtrator';
+  }
+}
+
+// Limite do lado do cliente; o daemon aplica o próprio timeout por extração
+const TIMEOUT_MS = 180_000;
+
+export function extratorConfigurado(): boolean {
+  return Boolean(process.env.EXTRATOR_SOCKET || process.env.EXTRATOR_URL);
+}
+
+/**
+ * Envia a planilha ao daemon e retorna o ArquivoPrecos de cada aba.
+ * Falhas de conexão são rejeitadas com o erro do Node (ex.: ECONNREFUSED).
+ */
+export function extrairNoDaemon(buffer: ArrayBuffer): Promise<RespostaExtrator> {
+  const corpo = Buffer.from(buffer);
+  const socketPath = process.env.EXTRATOR_SOCKET;
+  const url = new URL('/extrair', process.env.EXTRATOR_URL || 'http://localhost');
+
+  return new Promise((resolve, reject) => {
+    const requisicao = http.request(
+      {
+        method: 'POST',
+        ...(socketPath
+          ? { socketPath, path: '/extrair' }
+          : { hostname: url.hostname, port: url.port, path: url.pathname }),
+        headers: {
+          'Content-Type': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+          'Content-Length': corpo.length,
+        },
+        timeout: TIMEOUT_MS,
+      },
+      (resposta) => {
+        const partes: Buffer[] = [];
+        resposta.on('data', (parte: Buffer) => partes.push(parte));
+        resposta.on('end', () => {
+          try {
+            const dados = JSON.parse(Buffer.concat(partes).toString('utf-8'));
+            if (resposta.statusCode === 200) {
+              resolve(dados as RespostaExtrator);
+            } else {
+              reject(new ErroExtrator(dados.erro || 'Erro no extrator', resposta.statusCode || 500));
+            }
+          } catch (e) {
+            reject(e);
+          }
+        });
+      }
+    );
+    requisicao.on('timeout', () => requisicao.destroy(new ErroExtrator('Extrator não respondeu', 504)));
+    requisicao.on('error', reject);
+    requisicao.end(corpo);
+  });
+}
@@ -0,0 +1,157 @@
+import { createHash } from 'crypto';
+import { promises as fs } from 'fs';
+import path from 'path';
+import { NextResponse } from 'next/server';
+
+/**
+ * Respostas pré-computadas das rotas de catálogo, geradas em data/api por
+ * python3 scripts/extract-excel.py --formato api (formato em
+ * scripts/respostas_api.py). A rota devolve o arquivo pronto, na melhor
+ * codificação aceita pelo cliente, ou 304 quando o ETag confere.
+ */
+
+const DATA_DIR = path.join(process.cwd(), 'data');
+const API_DIR = path.join(DATA_DIR, 'api');
+const VERSAO_MANIFESTO = 2;
+
+type Codificacao = 'br' | 'gzip' | 'identity';
+
+interface Variante {
+  arquivo: string;
+  etag: string;
+  bytes: number;
+}
+
+interface EntradaManifesto {
+  // Arquivos de que o corpo depende (relativos a data/) e seus SHA-256
+  origens: Record<string, string>;
+  variantes: Partial<Record<Codificacao, Variante>>;
+}
+
+interface Manifesto {
+  versao: number;
+  respostas: Record<string, EntradaManifesto>;
+}
+
+// Memória do processo: manifesto e hashes das origens por tamanho+mtime, corpos por ETag
+let manifestoLido: { chave: string; manifesto: Manifesto } | null = null;
+const hashesOrigem = new Map<string, { chave: string; sha256: string }>();
+const corpos = new Map<string, Buffer>();
+
+async function chaveArquivo(caminho: string): Promise<string | null> {
+  try {
+    const stat = await fs.stat(caminho, { bigint: true });
+    return `${stat.size}:${stat.mtimeNs}`;
+  } catch {
+    return null;
+  }
+}
+
+async function lerManifesto(): Promise<Manifesto | null> {
+  const caminho = path.join(API_DIR, 'manifesto.json');
+  const chave = await chaveArquivo(caminho);
+  if (!chave) return null;
+
+  if (manifestoLido?.chave !== chave) {
+    const manifesto = JSON.parse(await fs.readFile(caminho, 'utf-8')) as Manifesto;
+    if (manifesto.versao !== VERSAO_MANIFESTO) return null;
+    manifestoLido = { chave, manifesto };
+    corpos.clear();
+  }
+  return manifestoLido.manifesto;
+}
+
+async function hashOrigem(caminho: string): Promise<string | null> {
+  const chave = await chaveArquivo(caminho);
+  if (!chave) return null;
+
+  let memo = hashesOrigem.get(caminho);
+  if (memo?.chave !== chave) {
+    const sha256 = createHash('sha256').update(await fs.readFile(caminho)).digest('hex');
+    memo = { chave, sha256 };
+    hashesOrigem.set(caminho, memo);
+  }
+  return memo.sha256;
+}
+
+/**
+ * A resposta só vale se nenhuma origem (ex.: data/precos-materiais-casa.json,
+ * ou src/lib/static-data.ts para estados e tipos) mudou desde a extração; o
+ * hash é refeito apenas quando tamanho ou mtime mudam.
+ */
+async function origensIntactas(entrada: EntradaManifesto): Promise<boolean> {
+  const origens = Object.entries(entrada.origens || {});
+  if (origens.length === 0) return false;
+  for (const [origem, sha256] of origens) {
+    if ((await hashOrigem(path.join(DATA_DIR, origem))) !== sha256) return false;
+  }
+  return true;
+}
+
+function escolherCodificacao(
+  acceptEncoding: string | null,
+  variantes: EntradaManifesto['variantes']
+): Codificacao {
+  const aceitas = new Set<string>();
+  for (const parte of (acceptEncoding || '').split(',')) {
+    const [nome, ...parametros] = parte.trim().toLowerCase().split(';');
+    const q = parametros.map((p) => p.trim()).find((p) => p.startsWith('q='));
+    if (nome && (!q || parseFloat(q.slice(2)) > 0)) aceitas.add(nome);
+  }
+  for (const codificacao of ['br', 'gzip'] as const) {
+    if (variantes[codificacao] && (aceitas.has(codificacao) || aceitas.has('*'))) {
+      return codificacao;
+    }
+  }
+  return 'identity';
+}
+
+function etagConfere(ifNoneMatch: string | null, etag: string): boolean {
+  if (!ifNoneMatch) return false;
+  return ifNoneMatch.split(',').some((valor) => {
+    const candidato = valor.trim();
+    return candidato === '*' || candidato === etag || candidato === `W/${etag}`;
+  });
+}
+
+/**
+ * Responde com a resposta pré-computada `nome` (ex.: "estados",
+ * "precos-mao-obra-casa"). Retorna null se ela não existe ou está
+ * desatualizada: a rota monta a resposta como antes.
+ */
+export async function respostaEstatica(
+  request: Request,
+  nome: string,
+  cacheControl = 'public, max-age=0, must-revalidate'
+): Promise<NextResponse | null> {
+  try {
+    const manifesto = await lerManifesto();
+    const entrada = manifesto?.respostas[nome];
+    if (!entrada || !(await origensIntactas(entrada))) return null;
+
+    const codificacao = escolherCodificacao(request.headers.get('accept-encoding'), entrada.variantes);
+    const variante = entrada.variantes[codificacao];
+    if (!variante) return null;
+
+    const headers: Record<string, string> = {
+      ETag: variante.etag,
+      Vary: 'Accept-Encoding',
+      'Cache-Control': cacheControl,
+    };
+    if (etagConfere(request.headers.get('if-none-match'), variante.etag)) {
+      return new NextResponse(null, { status: 304, headers });
+    }
+
+    let corpo = corpos.get(variante.etag);
+    if (!corpo) {
+      corpo = await fs.readFile(path.join(API_DIR, variante.arquivo));
+      corpos.set(variante.etag, corpo);
+    }
+    headers['Content-Type'] = 'application/json';
+    if (codificacao !== 'identity') headers['Content-Encoding'] = codificacao;
+    return new NextResponse(corpo, { headers });
+  } catch (error) {
+    console.error(`Erro ao ler resposta pré-computada ${nome}:`, error);
+    return null;
+  }
+}
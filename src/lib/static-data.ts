@@ -1,5 +1,8 @@
 // Static data for construction budget simulator
 // Dados carregados do configuracoes.json e adaptados para compatibilidade com o sistema
+// Os mapeamentos abaixo são repetidos em scripts/respostas_api.py (respostas pré-computadas
+// de /api/estados e /api/tipos): manter em sincronia. Editar este arquivo invalida essas
+// respostas (o hash dele está em data/api/manifesto.json) até a próxima extração
 
 import { getConfiguracoes, getCUBBase } from './configuracoes';
 